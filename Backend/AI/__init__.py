@@ -1,5 +1,8 @@
-from .ai_coach import get_ai_response
-from .client import get_openai_client
+from .ai_coach import get_ai_response, stream_ai_response, fallback_reply
+from .client import get_openai_client, create_completion, CircuitOpenError
 
-__all__ = ['get_ai_response', 'get_openai_client']
+__all__ = [
+    'get_ai_response', 'stream_ai_response', 'fallback_reply',
+    'get_openai_client', 'create_completion', 'CircuitOpenError',
+]
 
@@ -1,4 +1,7 @@
-from .client import get_openai_client
+from .client import create_completion, CircuitOpenError
+from ai_cache import ai_cache, shared_context
+from chat_history import trim_to_budget
+import random
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,6 +22,54 @@ Guidelines:
 The user is working on building habits through daily challenges. They can check in daily, earn XP, and track streaks. 
 Be their supportive coach and guide them on their habit-building journey."""
 
+# Served when OpenAI is unavailable and nothing better is cached
+FALLBACK_TIPS = [
+    "Start small: pick the easiest version of your habit and do just that today. Consistency beats intensity.",
+    "Tie your habit to something you already do every day, like right after your morning coffee.",
+    "Missed a day? That's normal. The key is not to miss twice - check in today and keep going.",
+    "Make the good habit obvious: put what you need for it where you'll see it first thing.",
+    "Celebrate the small wins. Every check-in is proof you're becoming the person you want to be.",
+]
+
+MODEL = "gpt-5.2"  # Using GPT-5.2 for latest AI capabilities
+MAX_TOKENS = 300
+TEMPERATURE = 0.7
+
+def build_messages(user_message, user_context=None, conversation_history=None, shared=False):
+    """Build the chat messages array: system prompt, history, then the user's message
+
+    A ``shared`` reply may be cached and served to other users, so its
+    prompt only carries the banded context of the cache key (see ai_cache.py).
+    """
+    # Build context message if available
+    if shared:
+        context_parts = shared_context(user_context)
+    else:
+        context = user_context or {}
+        context_parts = []
+        if context.get('level'):
+            context_parts.append(f"Level {context['level']}")
+        if context.get('xp'):
+            context_parts.append(f"{context['xp']} XP")
+        if context.get('active_challenges'):
+            context_parts.append(f"{context['active_challenges']} active challenges")
+        if context.get('current_streak'):
+            context_parts.append(f"{context['current_streak']} day streak")
+    
+    context_text = f"\n\nUser context: {', '.join(context_parts)}" if context_parts else ""
+    
+    # Create messages array
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    
+    # Add conversation history if available: the running summary plus as
+    # many recent messages as fit the token budget (see chat_history.py)
+    if conversation_history:
+        messages.extend(trim_to_budget(conversation_history))
+    
+    # Add current user message with context
+    messages.append({"role": "user", "content": user_message + context_text})
+    return messages
+
 def get_ai_response(user_message, user_context=None, conversation_history=None):
     """
     Get AI response from OpenAI
@@ -31,52 +82,85 @@ def get_ai_response(user_message, user_context=None, conversation_history=None):
     Returns:
         str: AI response message
     """
+    # Common first messages are answered from the cache (see ai_cache.py)
+    cache_key = ai_cache.key(user_message, user_context, conversation_history)
+    cached = ai_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        client = get_openai_client()
-        
-        # Build context message if available
-        context_text = ""
-        if user_context:
-            context_parts = []
-            if user_context.get('level'):
-                context_parts.append(f"Level {user_context['level']}")
-            if user_context.get('xp'):
-                context_parts.append(f"{user_context['xp']} XP")
-            if user_context.get('active_challenges'):
-                context_parts.append(f"{user_context['active_challenges']} active challenges")
-            if user_context.get('current_streak'):
-                context_parts.append(f"{user_context['current_streak']} day streak")
-            
-            if context_parts:
-                context_text = f"\n\nUser context: {', '.join(context_parts)}"
-        
-        # Create messages array
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages = build_messages(user_message, user_context, conversation_history, shared=cache_key is not None)
         
-        # Add conversation history if available (keep last 10 messages for context)
-        if conversation_history:
-            # Filter to keep only last 10 messages to avoid token limits
-            recent_history = conversation_history[-10:] if len(conversation_history) > 10 else conversation_history
-            messages.extend(recent_history)
-        
-        # Add current user message with context
-        messages.append({"role": "user", "content": user_message + context_text})
-        
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-5.2",  # Using GPT-5.2 for latest AI capabilities
+        # Call OpenAI API (timeouts, retries and circuit breaker in client.py)
+        response = create_completion(
+            model=MODEL,
             messages=messages,
-            max_tokens=300,
-            temperature=0.7,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
         )
         
         # Extract and return the response
         ai_message = response.choices[0].message.content.strip()
+        ai_cache.put(cache_key, ai_message)
         return ai_message
         
+    except CircuitOpenError:
+        # Expected while OpenAI is degraded; the caller serves a fallback
+        raise
     except Exception as e:
         # Log error server-side
         logger.error(f"OpenAI API error: {e}", exc_info=True)
         # Re-raise the exception so the endpoint can handle it properly
         raise
 
+def stream_ai_response(user_message, user_context=None, conversation_history=None):
+    """
+    Stream an AI response from OpenAI as it is generated
+    
+    Same arguments as get_ai_response. Yields text fragments as they arrive
+    (a cached reply comes as a single fragment). Closing the generator early
+    (e.g. the client disconnected) closes the upstream HTTP response, so the
+    completion isn't left running.
+    """
+    cache_key = ai_cache.key(user_message, user_context, conversation_history)
+    cached = ai_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    
+    messages = build_messages(user_message, user_context, conversation_history, shared=cache_key is not None)
+    
+    try:
+        stream = create_completion(
+            model=MODEL,
+            messages=messages,
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            stream=True,
+        )
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.error(f"OpenAI API error: {e}", exc_info=True)
+        raise
+    
+    parts = []
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+        # Only complete replies are cached
+        ai_cache.put(cache_key, "".join(parts).strip())
+    except Exception as e:
+        logger.error(f"OpenAI stream error: {e}", exc_info=True)
+        raise
+    finally:
+        stream.close()
+
+def fallback_reply(user_message, user_context=None):
+    """A reply that doesn't need OpenAI: a cached answer to this message, or a general tip"""
+    cached = ai_cache.get(ai_cache.key(user_message, user_context))
+    if cached is not None:
+        return cached
+    return random.choice(FALLBACK_TIPS)
@@ -1,20 +1,184 @@
 import os
+import time
+import random
+import logging
+import threading
+
+import httpx
+import openai
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from config import Config
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv(os.path.join(BASE_DIR, 'database.env'))
 
-# Initialize OpenAI client
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables. Please add it to database.env")
+# Worth another attempt: throttling, upstream errors and network trouble
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,  # includes APITimeoutError
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling OpenAI while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures (per worker).
+
+    After ``threshold`` consecutive failed calls the breaker opens for
+    ``cooldown`` seconds; then one trial call is let through, which closes it
+    on success or reopens it on failure.
+    """
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+        # Metrics
+        self.opened = 0
+        self.short_circuited = 0
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self._opened_at >= self.cooldown:
+                self._trial = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.threshold:
+                if self._opened_at is None or self._trial:
+                    self.opened += 1
+                    logger.warning(f"OpenAI circuit breaker open for {self.cooldown}s")
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._trial else "open"
+
+    def metrics(self):
+        return {
+            "state": self.state(),
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+breaker = CircuitBreaker(
+    threshold=Config.OPENAI_BREAKER_THRESHOLD,
+    cooldown=Config.OPENAI_BREAKER_COOLDOWN,
+)
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
 def get_openai_client():
-    """Get OpenAI client instance"""
-    return client
+    """Get this worker's OpenAI client instance
+
+    Built on first use in each process (connections must not be shared
+    across gunicorn's fork), with timeouts well under the worker timeout and
+    a keep-alive pool so repeat calls skip the TLS handshake. Retries are
+    done by create_completion, not by the library.
+    """
+    global _client, _client_pid
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in environment variables. Please add it to database.env")
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = OpenAI(
+                api_key=OPENAI_API_KEY,
+                max_retries=0,
+                timeout=httpx.Timeout(
+                    Config.OPENAI_READ_TIMEOUT,
+                    connect=Config.OPENAI_CONNECT_TIMEOUT,
+                    pool=Config.OPENAI_CONNECT_TIMEOUT,
+                ),
+                http_client=openai.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=Config.OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=Config.OPENAI_MAX_CONNECTIONS,
+                        keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+                    ),
+                ),
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: Retry-After, else jittered backoff"""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get('retry-after')), Config.OPENAI_RETRY_MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(Config.OPENAI_RETRY_MAX_DELAY, Config.OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def create_completion(**kwargs):
+    """``client.chat.completions.create`` with retries and the circuit breaker
+
+    Retries throttling (429, except an exhausted quota), 5xx and connection
+    errors with jittered exponential backoff, as long as the next attempt can
+    still finish within OPENAI_DEADLINE. Other errors (bad request, authentication) are raised
+    at once and don't count against the breaker. Raises CircuitOpenError
+    without calling OpenAI while the breaker is open.
+
+    With ``stream=True`` only opening the stream is retried.
+    """
+    if not breaker.allow():
+        raise CircuitOpenError("OpenAI circuit breaker is open")
 
+    client = get_openai_client()
+    deadline = time.monotonic() + Config.OPENAI_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            response = client.chat.completions.create(**kwargs)
+        except RETRYABLE_ERRORS as e:
+            delay = _retry_delay(e, attempt)
+            remaining = deadline - time.monotonic()
+            exhausted = getattr(e, 'code', None) == 'insufficient_quota'  # retrying won't help
+            if exhausted or attempt >= Config.OPENAI_MAX_RETRIES or delay + Config.OPENAI_READ_TIMEOUT > remaining:
+                breaker.record_failure()
+                raise
+            attempt += 1
+            logger.warning(f"OpenAI call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        except Exception:
+            breaker.record_success()  # upstream answered; the request itself was bad
+            raise
+        breaker.record_success()
+        return response
@@ -0,0 +1,58 @@
+"""Helpers for the per-year activity bitmaps behind /api/analytics/heatmap.
+
+``activity_bitmaps.days`` stores one bit per day of the year, LSB-first:
+day-of-year ``n`` (1-based) is bit ``(n - 1) % 8`` of byte ``(n - 1) // 8``,
+which is the layout PostgreSQL's ``set_bit(bytea, ...)`` uses. Heatmap
+windows returned to the client use the same layout, indexed from the first
+day of the window.
+"""
+from datetime import timedelta
+
+
+def get_bit(bits, index):
+    return (bits[index >> 3] >> (index & 7)) & 1 if index >> 3 < len(bits) else 0
+
+
+def window(years, end, days):
+    """Bits for the ``days`` days ending on ``end`` (inclusive).
+
+    ``years`` maps year -> bitmap bytes; missing years count as inactive.
+    Returns ``(start, bytearray)``.
+    """
+    start = end - timedelta(days=days - 1)
+    out = bytearray((days + 7) // 8)
+    day = start
+    for i in range(days):
+        bits = years.get(day.year)
+        if bits and get_bit(bits, day.timetuple().tm_yday - 1):
+            out[i >> 3] |= 1 << (i & 7)
+        day += timedelta(days=1)
+    return start, out
+
+
+def summarize(bits, days):
+    """Total active days, current streak and longest streak in a window.
+
+    The current streak counts back from the last day; like check-in streaks,
+    it survives if the last day (today) has no check-in yet.
+    """
+    total = 0
+    longest = 0
+    run = 0
+    for i in range(days):
+        if get_bit(bits, i):
+            total += 1
+            run += 1
+            longest = max(longest, run)
+        else:
+            run = 0
+
+    current = 0
+    i = days - 1
+    if i >= 0 and not get_bit(bits, i):
+        i -= 1
+    while i >= 0 and get_bit(bits, i):
+        current += 1
+        i -= 1
+
+    return {"total_days": total, "current_streak": current, "longest_streak": longest}
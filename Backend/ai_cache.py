@@ -0,0 +1,142 @@
+"""Per-worker cache of AI coach replies to common first messages.
+
+Much of the chat traffic is the same opening question ("how do I stay
+motivated?") from users with no conversation yet. Replies to those are kept
+for ``ttl`` seconds, keyed on the normalised message plus a coarse band of
+the user's stats, so similar users share an answer while a level-2 user
+still gets different advice from a level-30 one. Since a cached reply is
+served to everyone in the band, its prompt only describes the band
+(``shared_context``), never the asking user's exact XP or streak. Messages
+with history are never cached (the reply depends on the conversation), and
+neither are long messages, which rarely repeat.
+
+Entries are evicted least recently used beyond ``max_entries``.
+``AI_CACHE_ENABLED=false`` turns the cache off.
+"""
+import re
+import time
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 200
+
+LEVEL_BANDS = (1, 5, 10, 20, 50)      # lower bounds
+STREAK_BANDS = (0, 1, 7, 30, 100)
+
+
+def _band(value, bounds):
+    value = value or 0
+    band = 0
+    for i, bound in enumerate(bounds):
+        if value >= bound:
+            band = i
+    return band
+
+
+def _band_label(band, bounds):
+    if band + 1 < len(bounds):
+        return f"{bounds[band]}-{bounds[band + 1] - 1}"
+    return f"{bounds[band]}+"
+
+
+def shared_context(user_context):
+    """Prompt context for a cacheable reply: only what the cache key holds."""
+    if not user_context:
+        return []
+    level = _band(user_context.get('level'), LEVEL_BANDS)
+    streak = _band(user_context.get('current_streak'), STREAK_BANDS)
+    parts = [f"Level {_band_label(level, LEVEL_BANDS)}"]
+    if streak:
+        parts.append(f"{_band_label(streak, STREAK_BANDS)} day streak")
+    parts.append("has active challenges" if user_context.get('active_challenges') else "no active challenges")
+    return parts
+
+
+def normalize(message):
+    """Case-, punctuation- and whitespace-insensitive form of a message."""
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (stored_at, reply)
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def key(self, message, user_context=None, conversation_history=None):
+        """Cache key for this request, or None if it shouldn't be cached."""
+        if not Config.AI_CACHE_ENABLED or conversation_history:
+            return None
+        text = normalize(message)
+        if not text or len(text) > MAX_MESSAGE_LENGTH:
+            return None
+        context = user_context or {}
+        return (
+            text,
+            _band(context.get('level'), LEVEL_BANDS),
+            _band(context.get('current_streak'), STREAK_BANDS),
+            bool(context.get('active_challenges')),
+        )
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, reply):
+        if key is None or not reply:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), reply)
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "enabled": Config.AI_CACHE_ENABLED,
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+ai_cache = ResponseCache(max_entries=Config.AI_CACHE_MAX_ENTRIES, ttl=Config.AI_CACHE_TTL)
@@ -0,0 +1,258 @@
+"""Bounded execution of AI coach requests, isolated from the API workers.
+
+An OpenAI round trip takes seconds, and with sync gunicorn workers every
+request waiting on one holds a whole worker. AI chat therefore runs as a job:
+the request records it and returns a job id at once, a small per-worker
+thread pool makes the upstream call, and the client polls for the result.
+Job state lives in SQLite on /dev/shm (see shm_db.py), so any worker can
+answer the poll.
+
+Admission is machine-wide and counted from that table:
+
+- ``max_pending`` queued + running jobs;
+- ``max_inline`` requests that still hold a worker while talking to OpenAI
+  (the streaming endpoint and the old blocking /api/ai/chat), so AI traffic
+  can never occupy more than that many workers.
+
+Jobs run on the submitting worker's pool, so each worker also takes at most
+``WORKER_BACKLOG`` times ``concurrency`` jobs at once; otherwise one worker
+could queue most of ``max_pending`` behind its few threads.
+
+Beyond any limit callers get ``AIJobsBusy`` (the API answers 503). Rows
+stop counting after ``timeout`` seconds, so slots held by a worker that was
+recycled or killed mid-job free themselves, and such jobs read as failed.
+A job that could not finish by then (queued too long to fit an
+``OPENAI_DEADLINE`` call before ``timeout``) is dropped without calling
+OpenAI, since its caller would be told it failed while the tokens were spent.
+"""
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from shm_db import SharedSQLite, default_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        result TEXT,
+        created REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_active ON jobs (kind, status, created);
+"""
+
+ACTIVE = ("queued", "running")
+
+WORKER_BACKLOG = 2      # per-worker jobs (queued + running), in multiples of concurrency
+
+FAILED_RESULT = {
+    "success": False,
+    "message": "Sorry, I encountered an error connecting to OpenAI. Please try again.",
+    "status": 500,
+}
+
+
+class AIJobsBusy(Exception):
+    """Raised when the AI job queue (or the inline slots) are full."""
+
+
+class AIJobQueue:
+    def __init__(self, path, concurrency=4, max_pending=32, max_inline=4, timeout=60, keep=600):
+        self.db = SharedSQLite(path, SCHEMA)
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.max_inline = max_inline
+        self.timeout = timeout
+        self.keep = keep
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._admitted = 0
+        self._local = 0     # this worker's queued + running jobs
+
+        # Metrics (per worker)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # Threads don't survive gunicorn's fork, so each worker builds its own pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ai-job")
+                self._executor_pid = os.getpid()
+                self._local = 0
+            return self._executor
+
+    def _admit(self, user_id, kind, limit, status):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        try:
+            with self.db.transaction() as conn:
+                if kind == "job":
+                    active = conn.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE kind = 'job' AND status IN (?, ?) AND created >= ?;",
+                        (*ACTIVE, now - self.timeout)
+                    ).fetchone()[0]
+                else:
+                    active = conn.execute(
+                        "SELECT COUNT(*) FROM jobs WHERE kind = ? AND status = 'running' AND created >= ?;",
+                        (kind, now - self.timeout)
+                    ).fetchone()[0]
+                if active >= limit:
+                    self.rejected += 1
+                    raise AIJobsBusy(f"{active} {kind} AI requests already in progress")
+                conn.execute(
+                    "INSERT INTO jobs (id, user_id, kind, status, created, updated) VALUES (?, ?, ?, ?, ?, ?);",
+                    (job_id, user_id, kind, status, now, now)
+                )
+
+                self._admitted += 1
+                if self._admitted % 100 == 0:
+                    conn.execute("DELETE FROM jobs WHERE updated < ?;", (now - self.keep,))
+        except sqlite3.Error as e:
+            # Without the shared table there's no way to hand results back
+            logger.error(f"AI job store unavailable: {e}")
+            raise AIJobsBusy("AI job store unavailable") from e
+        return job_id
+
+    def _finish(self, job_id, status, result):
+        try:
+            with self.db.transaction() as conn:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, updated = ? WHERE id = ?;",
+                    (status, json.dumps(result) if result is not None else None, time.time(), job_id)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Could not record AI job {job_id}: {e}")
+
+    def submit(self, user_id, fn, *args):
+        """Queue ``fn(*args)`` and return its job id.
+
+        ``fn`` returns a JSON-serialisable result dict; an exception is
+        recorded as a generic failure.
+        """
+        executor = self._get_executor()
+        with self._lock:
+            if self._local >= self.concurrency * WORKER_BACKLOG:
+                self.rejected += 1
+                raise AIJobsBusy(f"{self._local} AI jobs already queued on this worker")
+            self._local += 1
+        try:
+            job_id = self._admit(user_id, "job", self.max_pending, "queued")
+            executor.submit(self._run, job_id, time.time(), fn, args)
+        except BaseException:
+            with self._lock:
+                self._local -= 1
+            raise
+        self.submitted += 1
+        return job_id
+
+    def _run(self, job_id, queued_at, fn, args):
+        try:
+            if time.time() - queued_at + Config.OPENAI_DEADLINE >= self.timeout:
+                # get() would report it as failed before the call could finish
+                logger.warning(f"AI job {job_id} expired in the queue")
+                self.failed += 1
+                self._finish(job_id, "failed", FAILED_RESULT)
+                return
+            self._finish(job_id, "running", None)
+            try:
+                result = fn(*args)
+            except Exception as e:
+                logger.error(f"AI job {job_id} failed: {e}", exc_info=True)
+                self.failed += 1
+                self._finish(job_id, "failed", FAILED_RESULT)
+                return
+            self.completed += 1
+            self._finish(job_id, "done", result)
+        finally:
+            with self._lock:
+                self._local -= 1
+
+    def get(self, job_id, user_id):
+        """``{"status", "result"}`` for one of the user's jobs, or None."""
+        with self.db.reader() as conn:
+            row = conn.execute(
+                "SELECT status, result, created FROM jobs WHERE id = ? AND user_id = ? AND kind = 'job';",
+                (job_id, user_id)
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, created = row
+        if status in ACTIVE and created < time.time() - self.timeout:
+            # The worker running it went away (recycled or killed)
+            return {"status": "failed", "result": FAILED_RESULT}
+        return {"status": status, "result": json.loads(result) if result else None}
+
+    def inline(self, user_id):
+        """Slot for a request that talks to OpenAI while holding its worker.
+
+        Use as ``with jobs.inline(user_id): ...`` (or call ``release()``);
+        raises AIJobsBusy if all ``max_inline`` slots are taken.
+        """
+        return _InlineSlot(self, self._admit(user_id, "inline", self.max_inline, "running"))
+
+    def metrics(self):
+        now = time.time()
+        try:
+            with self.db.reader() as conn:
+                active = dict(conn.execute(
+                    "SELECT kind, COUNT(*) FROM jobs WHERE status IN (?, ?) AND created >= ? GROUP BY kind;",
+                    (*ACTIVE, now - self.timeout)
+                ).fetchall())
+        except sqlite3.Error:
+            active = {}
+        return {
+            "concurrency": self.concurrency,
+            "max_pending": self.max_pending,
+            "max_inline": self.max_inline,
+            "pending": active.get("job", 0),
+            "inline": active.get("inline", 0),
+            "worker_pending": self._local,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+class _InlineSlot:
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.released = False
+
+    def release(self, status="done"):
+        if not self.released:
+            self.released = True
+            self.queue._finish(self.job_id, status, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release("done" if exc_type is None else "failed")
+        return False
+
+
+ai_jobs = AIJobQueue(
+    Config.AI_JOB_DB or default_path("reclaim-ai-jobs.sqlite3"),
+    concurrency=Config.AI_JOB_CONCURRENCY,
+    max_pending=Config.AI_JOB_MAX_PENDING,
+    max_inline=Config.AI_MAX_INLINE,
+    timeout=Config.AI_JOB_TIMEOUT,
+)
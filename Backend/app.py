@@ -1,15 +1,29 @@
 import os
+import hmac
+import json
+import base64
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, has_request_context
 from flask_cors import CORS
-import psycopg2
-import bcrypt
 import jwt
+import openai
 
 from config import Config
+import db
+from db import get_pool
+from listener import listener
+from leaderboard_index import leaderboard_index
+from catalog_cache import catalog_cache
+import activity_bitmap
+from passwords import hasher, PasswordHasherBusy
+from rate_limit import limiter, LOGIN_PER_IP, LOGIN_PER_USER, SIGNUP_PER_IP, AVAILABILITY_PER_IP
+from availability import availability
+from conversations import conversations
+from ai_jobs import ai_jobs, AIJobsBusy
+from ai_cache import ai_cache
 
 # Validate required environment variables in production
 is_production = os.getenv("FLASK_ENV") == "production" or os.getenv("ENVIRONMENT") == "production"
@@ -35,10 +49,6 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config["SECRET_KEY"] = Config.SECRET_KEY
 
-# Store conversation history per user (in production, use Redis or database)
-# Format: {user_id: [{"role": "user/assistant", "content": "message"}, ...]}
-user_conversations = {}
-
 # Enable CORS for frontend - configurable for production
 FRONTEND_URLS = os.getenv("FRONTEND_URLS", "http://localhost:5173,http://localhost:3000").split(",")
 FRONTEND_URLS = [url.strip() for url in FRONTEND_URLS]  # Clean whitespace
@@ -48,9 +58,54 @@ CORS(app,
      allow_headers=["Content-Type", "Authorization"],
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
+# Cache-Control per read endpoint. Every response listed here also gets a
+# strong ETag (the route's own, or a hash of the body) and a 304 when the
+# client's If-None-Match still matches. "no-cache" means "store it, but
+# revalidate every time", which with ETags costs a tiny 304.
+CACHE_CONTROL = {
+    "get_challenges": "public, max-age=60",
+    "get_all_badges": "public, max-age=60",
+    "get_leaderboard": "no-cache",
+    "get_profile": "private, no-cache",
+    "get_settings": "private, no-cache",
+    "get_user_badges": "private, no-cache",
+    "get_active_user_challenges": "private, no-cache",
+    "get_analytics": "private, no-cache",
+    "get_activity_heatmap": "private, no-cache",
+    "get_dashboard": "private, no-cache",
+}
+
+@app.after_request
+def conditional_get(response):
+    """Add ETag/Cache-Control to cacheable GETs and turn matches into 304s"""
+    policy = CACHE_CONTROL.get(request.endpoint)
+    if policy is None or request.method != "GET" or response.status_code != 200:
+        return response
+    
+    if request.endpoint == "get_leaderboard":
+        # Includes the caller's rank when authenticated
+        policy = "private, no-cache" if request.headers.get('Authorization') else "public, no-cache"
+        response.vary.add('Authorization')
+    response.headers['Cache-Control'] = policy
+    
+    if not response.get_etag()[0]:
+        response.add_etag()
+    return response.make_conditional(request)
+
 def get_db_connection():
-    """Get a database connection"""
-    return psycopg2.connect(**Config.db_dsn())
+    """Borrow a pooled connection.
+
+    Inside a @token_required route, every transaction on it runs with the
+    authenticated user's RLS context (set in the same round-trip as the
+    transaction's first query).
+    """
+    if not has_request_context():
+        return db.get_db_connection()
+    # Sub-requests of /api/batch share the batch's connection
+    batch_conn = g.get('batch_conn')
+    if batch_conn is not None:
+        return db.savepoint(batch_conn)
+    return db.get_db_connection(user_id=g.get('user_id'))
 
 def create_token(user_id, username):
     """Create JWT token for authenticated user"""
@@ -62,6 +117,10 @@ def token_required(f):
     """Decorator to protect routes that require authentication"""
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Sub-requests of /api/batch were authenticated once by the batch itself
+        if g.get('batch_conn') is not None and g.get('user_id'):
+            return f(*args, **kwargs)
+        
         token = request.headers.get('Authorization')
         
         if not token:
@@ -73,6 +132,7 @@ def token_required(f):
                 token = token[7:]
             
             data = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+            # g.user_id also scopes RLS for get_db_connection() in this request
             g.user_id = data['user_id']
             g.username = data['username']
             
@@ -88,6 +148,26 @@ def bad_request(message):
     """Helper function for 400 errors"""
     return jsonify({"success": False, "message": message}), 400
 
+def server_busy():
+    """Helper function for 503 errors when password hashing is saturated"""
+    response = jsonify({"success": False, "message": "Server is busy, please try again in a moment"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def too_many_requests(retry_after):
+    """Helper function for 429 errors from the login/signup rate limiter"""
+    response = jsonify({"success": False, "message": "Too many attempts, please try again later"})
+    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response, 429
+
+def client_ip():
+    """Address of the caller (the first X-Forwarded-For hop behind a trusted proxy)"""
+    if Config.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
 @app.route("/api/health", methods=["GET"])
 def health_check():
     """Check if app and database are working"""
@@ -96,11 +176,42 @@ def health_check():
             with conn.cursor() as cur:
                 cur.execute("SELECT 1;")
                 cur.fetchone()
-        return jsonify({"status": "healthy", "database": "connected"}), 200
+        return jsonify({
+            "status": "healthy",
+            "database": "connected",
+            "pool": get_pool().stats()
+        }), 200
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({"status": "unhealthy", "database": "disconnected"}), 500
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Internal counters for this worker (needs METRICS_TOKEN in X-Metrics-Token)"""
+    token = request.headers.get('X-Metrics-Token', '')
+    if not Config.METRICS_TOKEN or not hmac.compare_digest(token.encode(), Config.METRICS_TOKEN.encode()):
+        # Don't advertise the endpoint to callers without the token
+        return jsonify({"success": False, "message": "Endpoint not found"}), 404
+    return jsonify({
+        "pid": os.getpid(),
+        "pool": get_pool().stats(),
+        "listener": listener.metrics(),
+        "leaderboard_index": leaderboard_index.metrics(),
+        "catalog_cache": catalog_cache.metrics(),
+        "passwords": hasher.metrics(),
+        "rate_limit": limiter.metrics(),
+        "availability": availability.metrics(),
+        "conversations": conversations.metrics(),
+        "ai_jobs": ai_jobs.metrics(),
+        "ai_cache": ai_cache.metrics(),
+        "openai": openai_metrics()
+    }), 200
+
+def openai_metrics():
+    """OpenAI circuit breaker state for this worker"""
+    from AI.client import breaker
+    return breaker.metrics()
+
 @app.route("/api/signup", methods=["POST"])
 def signup():
     """Register a new user"""
@@ -128,87 +239,100 @@ def signup():
     if len(password) < 6:
         return bad_request("Password must be at least 6 characters")
     
+    retry_after = limiter.hit([(f"signup:ip:{client_ip()}", SIGNUP_PER_IP)])
+    if retry_after:
+        return too_many_requests(retry_after)
+    
+    # Hash before borrowing a connection so the pool isn't held during bcrypt
+    try:
+        hashed_password = hasher.hash(password)
+    except PasswordHasherBusy:
+        return server_busy()
+    
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Hash password
-                hashed_password = bcrypt.hashpw(
-                    password.encode('utf-8'), 
-                    bcrypt.gensalt()
-                ).decode('utf-8')
-                
-                # Create user using database function
-                # The function will handle duplicate checking and RLS properly
+                # One statement: create_user returns the whole new user, or
+                # success=false with an error code for duplicates/invalid input
                 cur.execute(
-                    """SELECT create_user(%s, %s, %s, %s, %s) as result;""",
+                    """SELECT create_user(%s, %s, %s, %s, %s);""",
                     (username, hashed_password, email, first_name, last_name)
                 )
                 result = cur.fetchone()[0]
-                
-                # The function returns JSON, so we need to parse it
-                import json
-                if isinstance(result, dict):
-                    result_data = result
-                elif isinstance(result, str):
-                    result_data = json.loads(result)
-                else:
-                    # PostgreSQL returns JSON as a string, parse it
-                    result_data = json.loads(str(result))
-                
-                # Check if function returned an error
-                if not result_data.get('success', True):
-                    error_msg = result_data.get('message', 'Signup failed')
-                    return jsonify({
-                        "success": False,
-                        "message": error_msg
-                    }), 409
-                
-                user_id = result_data['user_id']
-                
-                conn.commit()
-                
-                # Get the created user's first_name and last_name
-                cur.execute(
-                    """SELECT first_name, last_name FROM users WHERE id = %s;""",
-                    (user_id,)
-                )
-                user_name_data = cur.fetchone()
-                user_first_name = user_name_data[0] if user_name_data else None
-                user_last_name = user_name_data[1] if user_name_data else None
-                
-                # Create JWT token
-                token = create_token(user_id, username)
-                
-                return jsonify({
-                    "success": True,
-                    "message": "User created successfully",
-                    "user_id": user_id,
-                    "username": username,
-                    "first_name": user_first_name,
-                    "last_name": user_last_name,
-                    "token": token
-                }), 201
-                
     except Exception as e:
         logger.error(f"Signup error: {e}", exc_info=True)
-        error_message = str(e)
-        
-        # Handle specific database errors
-        if "already exists" in error_message.lower() or "username already" in error_message.lower():
-            return jsonify({
-                "success": False,
-                "message": "Username or email already exists"
-            }), 409
-        elif "email already" in error_message.lower():
-            return jsonify({
-                "success": False,
-                "message": "Email already exists"
-            }), 409
-        
         return jsonify({
             "success": False, 
-            "message": f"Signup failed: {error_message}"
+            "message": f"Signup failed: {e}"
         }), 500
+    
+    if not result['success']:
+        return jsonify({
+            "success": False,
+            "error": result['error'],
+            "message": result['message']
+        }), 400 if result['error'] == 'invalid' else 409
+    
+    availability.add(result['username'], result['email'])
+    token = create_token(result['user_id'], result['username'])
+    
+    return jsonify({
+        "success": True,
+        "message": "User created successfully",
+        "user_id": result['user_id'],
+        "username": result['username'],
+        "first_name": result['first_name'],
+        "last_name": result['last_name'],
+        "created_at": result['created_at'],
+        "token": token
+    }), 201
+
+@app.route("/api/signup/availability", methods=["GET"])
+def signup_availability():
+    """Live check whether a username and/or email is still free"""
+    username = request.args.get('username', '').strip()
+    email = request.args.get('email', '').strip().lower()
+    
+    if not username and not email:
+        return bad_request("username or email is required")
+    
+    # Answers reveal whether an email is registered, so cap how fast one client can ask
+    retry_after = limiter.hit([(f"availability:ip:{client_ip()}", AVAILABILITY_PER_IP)])
+    if retry_after:
+        return too_many_requests(retry_after)
+    
+    # Too-short usernames can never be registered, so don't bother looking them up
+    too_short = bool(username) and len(username) < 3
+    
+    try:
+        available = availability.check(username=None if too_short else username or None, email=email or None)
+    except Exception as e:
+        logger.error(f"Availability check error: {e}", exc_info=True)
+        return jsonify({"success": False, "message": "Could not check availability"}), 500
+    
+    if too_short:
+        available['username'] = False
+    
+    return jsonify({"success": True, **available}), 200
+
+def rehash_password(user_id, password):
+    """Re-hash a password at the configured cost after a successful login.
+    
+    Best effort: if hashing is busy or the update fails, the old hash stays
+    valid and we try again on a later login.
+    """
+    try:
+        new_hash = hasher.hash(password)
+        with db.get_db_connection(user_id=user_id) as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE users SET password_hash = %s WHERE id = %s;
+                """, (new_hash, user_id))
+        hasher.rehashed += 1
+    except PasswordHasherBusy:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not rehash password for user {user_id}: {e}")
 
 @app.route("/api/login", methods=["POST"])
 def login():
@@ -223,6 +347,14 @@ def login():
     if not username or not password:
         return bad_request("Username and password are required")
     
+    # Throttle before the user lookup and bcrypt, so floods cost us almost nothing
+    retry_after = limiter.hit([
+        (f"login:ip:{client_ip()}", LOGIN_PER_IP),
+        (f"login:user:{username.lower()}", LOGIN_PER_USER),
+    ])
+    if retry_after:
+        return too_many_requests(retry_after)
+    
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
@@ -241,27 +373,32 @@ def login():
                     }), 401
                 
                 user_id, db_username, db_password_hash, email, first_name = user
+        
+        # Verify outside the connection block so the pool isn't held during bcrypt
+        if not hasher.verify(password, db_password_hash):
+            return jsonify({
+                "success": False, 
+                "message": "Invalid credentials"
+            }), 401
+        
+        if hasher.needs_rehash(db_password_hash):
+            rehash_password(user_id, password)
+        
+        # Create JWT token
+        token = create_token(user_id, username)
+        
+        return jsonify({
+            "success": True,
+            "message": "Login successful",
+            "user_id": user_id,
+            "username": username,
+            "email": email,
+            "first_name": first_name,
+            "token": token
+        }), 200
                 
-                # Verify password
-                if not bcrypt.checkpw(password.encode('utf-8'), db_password_hash.encode('utf-8')):
-                    return jsonify({
-                        "success": False, 
-                        "message": "Invalid credentials"
-                    }), 401
-                
-                # Create JWT token
-                token = create_token(user_id, username)
-                
-                return jsonify({
-                    "success": True,
-                    "message": "Login successful",
-                    "user_id": user_id,
-                    "username": username,
-                    "email": email,
-                    "first_name": first_name,
-                    "token": token
-                }), 200
-                
+    except PasswordHasherBusy:
+        return server_busy()
     except Exception as e:
         logger.error(f"Login error: {e}", exc_info=True)
         return jsonify({
@@ -269,37 +406,54 @@ def login():
             "message": "Internal server error during login"
         }), 500
 
+def json_body(payload):
+    """Serialise a response payload once, for caching"""
+    return app.json.dumps(payload).encode('utf-8')
+
+def catalog_response(name, loader):
+    """Cached catalog body with an ETag derived from its catalog_version"""
+    version, body = catalog_cache.get(name, loader)
+    response = app.response_class(body, status=200, mimetype='application/json')
+    response.set_etag(f"{name}-v{version}")
+    return response
+
+def load_challenges():
+    """(catalog_version, serialised /api/challenges response)"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            # One statement, so the version and the rows come from the same
+            # snapshot (the ETag must never label a different body)
+            cur.execute("""
+                SELECT v.version, c.id, c.title, c.description, c.difficulty,
+                       c.xp_reward, c.duration_days, c.category
+                FROM catalog_version v
+                LEFT JOIN challenges c ON c.is_active = true
+                ORDER BY c.difficulty, c.title;
+            """)
+            
+            rows = cur.fetchall()
+            version = rows[0][0]
+            challenges = []
+            for row in rows:
+                if row[1] is None:
+                    continue  # no active challenges
+                challenges.append({
+                    "id": row[1],
+                    "title": row[2],
+                    "description": row[3],
+                    "difficulty": row[4],
+                    "xp_reward": row[5],
+                    "duration_days": row[6],
+                    "category": row[7]
+                })
+    
+    return version, json_body({"success": True, "challenges": challenges})
+
 @app.route("/api/challenges", methods=["GET"])
 def get_challenges():
-    """Get all active challenges from database"""
+    """Get all active challenges (served from the catalog cache)"""
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT id, title, description, difficulty, xp_reward, 
-                           duration_days, category 
-                    FROM challenges 
-                    WHERE is_active = true
-                    ORDER BY difficulty, title;
-                """)
-                
-                challenges = []
-                for row in cur.fetchall():
-                    challenges.append({
-                        "id": row[0],
-                        "title": row[1],
-                        "description": row[2],
-                        "difficulty": row[3],
-                        "xp_reward": row[4],
-                        "duration_days": row[5],
-                        "category": row[6]
-                    })
-                
-                return jsonify({
-                    "success": True,
-                    "challenges": challenges
-                }), 200
-                
+        return catalog_response("challenges", load_challenges)
     except Exception as e:
         logger.error(f"Error fetching challenges: {e}")
         return jsonify({
@@ -307,6 +461,7 @@ def get_challenges():
             "message": "Error fetching challenges"
         }), 500
 
+# Active challenges for a user with today's check-in flag and streak info
 @app.route("/api/challenges/active", methods=["GET"])
 @token_required
 def get_active_user_challenges():
@@ -314,60 +469,10 @@ def get_active_user_challenges():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
-                
-                cur.execute("""
-                    SELECT uc.id, c.id, c.title, c.description, c.difficulty, 
-                           c.xp_reward, uc.progress_days, c.duration_days,
-                           uc.started_at, c.category
-                    FROM user_challenges uc
-                    JOIN challenges c ON uc.challenge_id = c.id
-                    WHERE uc.user_id = %s AND uc.status = 'active'
-                    ORDER BY uc.started_at DESC;
-                """, (g.user_id,))
-                
-                challenge_rows = cur.fetchall()
-                active_challenges = []
-                
-                for row in challenge_rows:
-                    user_challenge_id = row[0]
-                    challenge_id = row[1]
-                    progress_percentage = (row[6] / row[7]) * 100 if row[7] > 0 else 0
-                    
-                    # Check if checked in today
-                    cur.execute("""
-                        SELECT id FROM daily_logs 
-                        WHERE user_id = %s AND challenge_id = %s AND log_date = CURRENT_DATE;
-                    """, (g.user_id, challenge_id))
-                    checked_in_today = cur.fetchone() is not None
-                    
-                    # Get streak info
-                    cur.execute("""
-                        SELECT current_streak, longest_streak 
-                        FROM streaks 
-                        WHERE user_id = %s AND challenge_id = %s;
-                    """, (g.user_id, challenge_id))
-                    streak_row = cur.fetchone()
-                    current_streak = streak_row[0] if streak_row else 0
-                    longest_streak = streak_row[1] if streak_row else 0
-                    
-                    active_challenges.append({
-                        "user_challenge_id": user_challenge_id,
-                        "challenge_id": challenge_id,
-                        "title": row[2],
-                        "description": row[3],
-                        "difficulty": row[4],
-                        "xp_reward": row[5],
-                        "progress_days": row[6],
-                        "total_days": row[7],
-                        "progress_percentage": round(progress_percentage, 1),
-                        "started_at": row[8].isoformat() if row[8] else None,
-                        "checked_in_today": checked_in_today,
-                        "current_streak": current_streak,
-                        "longest_streak": longest_streak,
-                        "category": row[9] if len(row) > 9 else None
-                    })
+                # One set-based query, built as JSON by the same function
+                # as the dashboard's active_challenges section
+                cur.execute("SELECT get_active_challenges(%s);", (g.user_id,))
+                active_challenges = cur.fetchone()[0]
                 
                 return jsonify({
                     "success": True,
@@ -397,9 +502,6 @@ def start_challenge():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
-                
                 # Check if user is already participating
                 cur.execute("""
                     SELECT id FROM user_challenges 
@@ -457,114 +559,79 @@ def checkin_challenge():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
-                
-                # Check if user is participating in this challenge
-                cur.execute("""
-                    SELECT id, progress_days 
-                    FROM user_challenges 
-                    WHERE user_id = %s AND challenge_id = %s AND status = 'active';
-                """, (g.user_id, challenge_id))
-                
-                user_challenge = cur.fetchone()
-                if not user_challenge:
-                    return jsonify({
-                        "success": False, 
-                        "message": "You are not participating in this challenge or it's not active"
-                    }), 404
-                
-                user_challenge_id, current_progress = user_challenge
-                
-                # Check if already checked in today
-                cur.execute("""
-                    SELECT id FROM daily_logs 
-                    WHERE user_id = %s AND challenge_id = %s AND log_date = CURRENT_DATE;
-                """, (g.user_id, challenge_id))
+                # The database function does the whole check-in in one round-trip
+                cur.execute("SELECT checkin_challenge(%s, %s);", (g.user_id, challenge_id))
+                result = cur.fetchone()[0]
                 
-                if cur.fetchone():
+                if not result.get('success'):
+                    status = 404 if result.get('error') == 'not_participating' else 409
                     return jsonify({
                         "success": False, 
-                        "message": "You have already checked in for this challenge today"
-                    }), 409
-                
-                # Insert daily log
-                cur.execute("""
-                    INSERT INTO daily_logs (user_id, challenge_id, log_date, completed)
-                    VALUES (%s, %s, CURRENT_DATE, TRUE)
-                    RETURNING id;
-                """, (g.user_id, challenge_id))
-                
-                log_id = cur.fetchone()[0]
-                
-                # Update progress_days
-                new_progress = current_progress + 1
-                cur.execute("""
-                    UPDATE user_challenges 
-                    SET progress_days = %s
-                    WHERE id = %s;
-                """, (new_progress, user_challenge_id))
-                
-                # Handle streak logic
-                cur.execute("""
-                    SELECT id, current_streak, longest_streak, last_active
-                    FROM streaks
-                    WHERE user_id = %s AND challenge_id = %s;
-                """, (g.user_id, challenge_id))
-                
-                streak_record = cur.fetchone()
-                
-                if streak_record:
-                    streak_id, current_streak, longest_streak, last_active = streak_record
-                    # Check if last_active was yesterday (consecutive day)
-                    cur.execute("""
-                        SELECT last_active = CURRENT_DATE - INTERVAL '1 day' as is_consecutive
-                        FROM streaks
-                        WHERE id = %s;
-                    """, (streak_id,))
-                    is_consecutive = cur.fetchone()[0]
-                    
-                    if is_consecutive:
-                        # Consecutive day - increment streak
-                        new_streak = current_streak + 1
-                    else:
-                        # Not consecutive - reset to 1
-                        new_streak = 1
-                    
-                    new_longest = max(longest_streak, new_streak)
-                    
-                    cur.execute("""
-                        UPDATE streaks
-                        SET current_streak = %s,
-                            longest_streak = %s,
-                            last_active = CURRENT_DATE
-                        WHERE id = %s;
-                    """, (new_streak, new_longest, streak_id))
-                else:
-                    # Create new streak record
-                    new_streak = 1
-                    cur.execute("""
-                        INSERT INTO streaks (user_id, challenge_id, current_streak, longest_streak, last_active)
-                        VALUES (%s, %s, %s, %s, CURRENT_DATE);
-                    """, (g.user_id, challenge_id, new_streak, new_streak))
+                        "message": result.get('message')
+                    }), status
                 
                 conn.commit()
                 
                 return jsonify({
                     "success": True,
                     "message": "Check-in successful!",
-                    "progress_days": new_progress,
-                    "current_streak": new_streak
+                    "progress_days": result['progress_days'],
+                    "current_streak": result['current_streak'],
+                    "longest_streak": result['longest_streak']
                 }), 200
                 
     except Exception as e:
         logger.error(f"Error during check-in: {e}", exc_info=True)
-        error_msg = str(e)
-        if "unique" in error_msg.lower() and "daily_logs" in error_msg.lower():
-            return jsonify({
-                "success": False, 
-                "message": "You have already checked in for this challenge today"
-            }), 409
+        return jsonify({
+            "success": False, 
+            "message": "Error during check-in. Please try again."
+        }), 500
+
+# Upper bound on challenge ids per batch check-in
+MAX_BATCH_CHECKINS = 50
+# Largest PostgreSQL INTEGER (ids beyond it would bind as bigint[])
+MAX_INT4 = 2**31 - 1
+
+@app.route("/api/challenges/checkin/batch", methods=["POST"])
+@token_required
+def checkin_challenges_batch():
+    """Check in for several challenges in one request and one transaction.
+    
+    Body: {"challenge_ids": [1, 2, 3]}. Returns one result per distinct id;
+    an id that fails (not participating / already checked in) doesn't stop
+    the others.
+    """
+    if not request.is_json:
+        return bad_request("Expected JSON data")
+    
+    data = request.get_json()
+    challenge_ids = data.get('challenge_ids') if isinstance(data, dict) else None
+    
+    if not isinstance(challenge_ids, list) or not challenge_ids:
+        return bad_request("challenge_ids must be a non-empty list")
+    if len(challenge_ids) > MAX_BATCH_CHECKINS:
+        return bad_request(f"At most {MAX_BATCH_CHECKINS} challenges per batch")
+    if not all(isinstance(cid, int) and not isinstance(cid, bool) and 0 < cid <= MAX_INT4
+               for cid in challenge_ids):
+        return bad_request("challenge_ids must be positive integers")
+    
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # One statement for the whole batch (see checkin_challenges())
+                cur.execute("SELECT checkin_challenges(%s, %s);", (g.user_id, challenge_ids))
+                results = cur.fetchone()[0]
+        
+        checked_in = sum(1 for r in results if r.get('success'))
+        return jsonify({
+            "success": True,
+            "message": f"Checked in to {checked_in} of {len(results)} challenges",
+            "checked_in": checked_in,
+            "results": results
+        }), 200
+                
+    except Exception as e:
+        logger.error(f"Error during batch check-in: {e}", exc_info=True)
         return jsonify({
             "success": False, 
             "message": "Error during check-in. Please try again."
@@ -586,9 +653,6 @@ def complete_challenge():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
-                
                 # Use the database function to complete the challenge
                 cur.execute("SELECT complete_challenge(%s, %s);", (g.user_id, challenge_id))
                 result = cur.fetchone()[0]
@@ -624,43 +688,182 @@ def complete_challenge():
                 "message": "Error completing challenge"
             }), 500
 
+# Leaderboard order is (xp DESC, created_at ASC, user_id ASC), which is
+# idx_leaderboard_stats_rank. Pages are keyset-paginated: a cursor holds the
+# sort key and rank of the row it points at, so each page is an index range
+# scan starting right at the cursor - page 500 costs the same as page 1.
+# Ranks on later pages are carried forward from the cursor, so they can be
+# off by a few if the leaderboard changes between requests.
+LEADERBOARD_COLUMNS = """user_id, username, xp, level,
+           (EXTRACT(EPOCH FROM created_at) * 1000000)::BIGINT as created_us,
+           completed_challenges, badges_earned"""
+
+LEADERBOARD_TOP_SQL = f"""
+    SELECT {LEADERBOARD_COLUMNS}
+    FROM leaderboard_stats
+    WHERE is_active = true
+    ORDER BY xp DESC, created_at ASC, user_id ASC
+    LIMIT %(limit)s;
+"""
+
+# Rows ranked after (below) a position, nearest first
+LEADERBOARD_AFTER_SQL = f"""
+    SELECT {LEADERBOARD_COLUMNS}
+    FROM leaderboard_stats
+    WHERE is_active = true
+      AND xp <= %(xp)s
+      AND (xp < %(xp)s OR (created_at, user_id) > (%(created_at)s, %(user_id)s))
+    ORDER BY xp DESC, created_at ASC, user_id ASC
+    LIMIT %(limit)s;
+"""
+
+# Rows ranked before (above) a position, nearest first
+LEADERBOARD_BEFORE_SQL = f"""
+    SELECT {LEADERBOARD_COLUMNS}
+    FROM leaderboard_stats
+    WHERE is_active = true
+      AND xp >= %(xp)s
+      AND (xp > %(xp)s OR (created_at, user_id) < (%(created_at)s, %(user_id)s))
+    ORDER BY xp ASC, created_at DESC, user_id DESC
+    LIMIT %(limit)s;
+"""
+
+LEADERBOARD_USER_SQL = f"""
+    SELECT {LEADERBOARD_COLUMNS}
+    FROM leaderboard_stats
+    WHERE user_id = %s AND is_active = true;
+"""
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_leaderboard_cursor(xp, created_us, user_id, rank):
+    """Opaque cursor pointing at one leaderboard row"""
+    raw = json.dumps([xp, created_us, user_id, rank], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_leaderboard_cursor(cursor):
+    """Turn a cursor back into query parameters; raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        xp, created_us, user_id, rank = json.loads(base64.urlsafe_b64decode(padded))
+        return {
+            "xp": int(xp),
+            "created_at": EPOCH + timedelta(microseconds=int(created_us)),
+            "user_id": int(user_id),
+            "rank": int(rank)
+        }
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def row_cursor(row, rank):
+    return encode_leaderboard_cursor(row[2], row[4], row[0], rank)
+
+def leaderboard_entry(row, rank):
+    return {
+        "username": row[1] or "",
+        "xp": row[2] or 0,
+        "level": row[3] or 1,
+        "rank": rank,
+        "completed_challenges": row[5] or 0,
+        "badges_earned": row[6] or 0
+    }
+
+def optional_user_id():
+    """User id from the Authorization header, or None (public endpoints)"""
+    if g.get('batch_conn') is not None:
+        return g.get('user_id')
+    token = request.headers.get('Authorization')
+    if not token:
+        return None
+    try:
+        if token.startswith('Bearer '):
+            token = token[7:]
+        data = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        return data['user_id']
+    except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+        # Token invalid/expired, but continue without auth
+        return None
+
 @app.route("/api/leaderboard", methods=["GET"])
 def get_leaderboard():
-    """Get the current leaderboard. Optionally returns user rank if authenticated."""
+    """Get the leaderboard. Optionally returns user rank if authenticated.
+    
+    Query params:
+        limit: page size (default 50, max 100)
+        after / before: cursor from a previous page's next_cursor / prev_cursor
+        around=me: the caller's row with k (default 5, max 25) users above and below
+    """
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    after = request.args.get('after')
+    before = request.args.get('before')
+    around = request.args.get('around')
+    
+    if around is not None and around != 'me':
+        return bad_request("around must be 'me'")
+    if after and before:
+        return bad_request("Use either after or before, not both")
+    
     try:
-        # Try to get authenticated user (optional)
-        user_id = None
-        token = request.headers.get('Authorization')
-        if token:
-            try:
-                if token.startswith('Bearer '):
-                    token = token[7:]
-                data = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-                user_id = data['user_id']
-            except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
-                # Token invalid/expired, but continue without auth (public leaderboard)
-                pass
+        cursor = decode_leaderboard_cursor(after or before) if (after or before) else None
+    except ValueError as e:
+        return bad_request(str(e))
+    
+    try:
+        user_id = optional_user_id()
+        
+        if around == 'me':
+            if not user_id:
+                return jsonify({"success": False, "message": "Log in to see your position"}), 401
+            k = min(max(request.args.get('k', 5, type=int), 1), 25)
+            return leaderboard_around_user(user_id, k)
+        
+        # First page: serve from the in-memory index when it's warm; SQL otherwise
+        if cursor is None and Config.LEADERBOARD_INDEX_ENABLED:
+            leaderboard_index.ensure_started()
+            if leaderboard_index.is_warm():
+                leaderboard = leaderboard_index.top(limit)
+                response = {
+                    "success": True,
+                    "leaderboard": leaderboard,
+                    "next_cursor": None,
+                    "prev_cursor": None
+                }
+                if len(leaderboard) == limit:
+                    last_key = leaderboard_index.key_at(limit)
+                    if last_key is not None and leaderboard_index.key_at(limit + 1) is not None:
+                        neg_xp, created_us, last_user_id = last_key
+                        response["next_cursor"] = encode_leaderboard_cursor(-neg_xp, created_us, last_user_id, limit)
+                user_rank = leaderboard_index.rank(user_id) if user_id else None
+                if user_rank:
+                    response["user_rank"] = user_rank
+                return jsonify(response), 200
         
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Get leaderboard
-                cur.execute("""
-                    SELECT username, xp, level, rank, completed_challenges, badges_earned
-                    FROM leaderboard_view
-                    ORDER BY rank
-                    LIMIT 50;
-                """)
+                # Fetch one extra row to know whether there is another page
+                if cursor is None:
+                    cur.execute(LEADERBOARD_TOP_SQL, {"limit": limit + 1})
+                    rows = cur.fetchall()
+                    first_rank = 1
+                    has_more_below = len(rows) > limit
+                    rows = rows[:limit]
+                    has_more_above = False
+                elif after:
+                    cur.execute(LEADERBOARD_AFTER_SQL, dict(cursor, limit=limit + 1))
+                    rows = cur.fetchall()
+                    first_rank = cursor["rank"] + 1
+                    has_more_below = len(rows) > limit
+                    rows = rows[:limit]
+                    has_more_above = True
+                else:
+                    cur.execute(LEADERBOARD_BEFORE_SQL, dict(cursor, limit=limit + 1))
+                    rows = cur.fetchall()
+                    has_more_above = len(rows) > limit
+                    rows = list(reversed(rows[:limit]))
+                    first_rank = cursor["rank"] - len(rows)
+                    has_more_below = True
                 
-                leaderboard = []
-                for row in cur.fetchall():
-                    leaderboard.append({
-                        "username": row[0] or "",
-                        "xp": row[1] or 0,
-                        "level": row[2] or 1,
-                        "rank": row[3] or 0,
-                        "completed_challenges": row[4] or 0,
-                        "badges_earned": row[5] or 0
-                    })
+                leaderboard = [leaderboard_entry(row, first_rank + i) for i, row in enumerate(rows)]
                 
                 # Get user rank if authenticated
                 user_rank = None
@@ -675,7 +878,11 @@ def get_leaderboard():
                 
                 response = {
                     "success": True,
-                    "leaderboard": leaderboard
+                    "leaderboard": leaderboard,
+                    "next_cursor": row_cursor(rows[-1], first_rank + len(rows) - 1)
+                                   if rows and has_more_below else None,
+                    "prev_cursor": row_cursor(rows[0], first_rank)
+                                   if rows and has_more_above and first_rank > 1 else None
                 }
                 
                 if user_rank is not None:
@@ -690,6 +897,50 @@ def get_leaderboard():
             "message": "Error fetching leaderboard"
         }), 500
 
+def leaderboard_around_user(user_id, k):
+    """The caller's leaderboard row with up to k users above and below"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(LEADERBOARD_USER_SQL, (user_id,))
+            me = cur.fetchone()
+            if not me:
+                return jsonify({
+                    "success": False,
+                    "message": "You are not on the leaderboard yet"
+                }), 404
+            
+            # Rank from the in-memory index if warm, else an index range count
+            user_rank = leaderboard_index.rank(user_id) if leaderboard_index.is_warm() else None
+            if not user_rank:
+                cur.execute("SELECT get_user_rank(%s);", (user_id,))
+                user_rank = cur.fetchone()[0]
+            
+            position = {
+                "xp": me[2],
+                "created_at": EPOCH + timedelta(microseconds=me[4]),
+                "user_id": me[0]
+            }
+            cur.execute(LEADERBOARD_BEFORE_SQL, dict(position, limit=k + 1))
+            above = cur.fetchall()
+            cur.execute(LEADERBOARD_AFTER_SQL, dict(position, limit=k + 1))
+            below = cur.fetchall()
+    
+    rows = list(reversed(above[:k])) + [me] + below[:k]
+    first_rank = user_rank - len(above[:k])
+    leaderboard = []
+    for i, row in enumerate(rows):
+        entry = leaderboard_entry(row, first_rank + i)
+        entry["is_me"] = row[0] == user_id
+        leaderboard.append(entry)
+    
+    return jsonify({
+        "success": True,
+        "leaderboard": leaderboard,
+        "user_rank": user_rank,
+        "next_cursor": row_cursor(rows[-1], first_rank + len(rows) - 1) if len(below) > k else None,
+        "prev_cursor": row_cursor(rows[0], first_rank) if len(above) > k else None
+    }), 200
+
 @app.route("/api/profile", methods=["GET"])
 @token_required
 def get_profile():
@@ -697,9 +948,6 @@ def get_profile():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
-                
                 # Get user stats using database function
                 cur.execute("SELECT get_user_stats(%s);", (g.user_id,))
                 result = cur.fetchone()[0]
@@ -715,6 +963,43 @@ def get_profile():
             "message": "Failed to retrieve profile"
         }), 500
 
+DASHBOARD_FIELDS = ("profile", "active_challenges", "analytics", "badges", "settings")
+
+@app.route("/api/dashboard", methods=["GET"])
+@token_required
+def get_dashboard():
+    """Get profile, active challenges, analytics, badges and settings at once.
+    
+    Query params:
+        fields: comma-separated subset of the sections (default: all)
+    """
+    fields = request.args.get('fields')
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in DASHBOARD_FIELDS]
+        if unknown:
+            return bad_request(f"Unknown fields: {', '.join(unknown)}. Use {', '.join(DASHBOARD_FIELDS)}")
+    else:
+        fields = None
+    
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # One round-trip; the JSON is built in the database
+                cur.execute("SELECT get_dashboard(%s, %s);", (g.user_id, fields))
+                dashboard = cur.fetchone()[0]
+        
+        return jsonify({
+            "success": True,
+            "dashboard": dashboard
+        }), 200
+    except Exception as e:
+        logger.error(f"Get dashboard error: {e}", exc_info=True)
+        return jsonify({
+            "success": False,
+            "message": "Failed to retrieve dashboard"
+        }), 500
+
 @app.route("/api/profile", methods=["PUT"])
 @token_required
 def update_profile():
@@ -729,9 +1014,6 @@ def update_profile():
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
-                
                 # Update user profile
                 update_fields = []
                 params = []
@@ -788,24 +1070,12 @@ def update_profile():
 @app.route("/api/logout", methods=["POST"])
 @token_required
 def logout():
-    """Clear user context (optional server-side cleanup)"""
-    try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT clear_user_context();")
-                conn.commit()
-        
-        return jsonify({
-            "success": True,
-            "message": "Logged out successfully"
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error during logout: {e}")
-        return jsonify({
-            "success": False, 
-            "message": "Error during logout"
-        }), 500
+    """Log out (JWTs are stateless and the RLS context is transaction-scoped,
+    so there is nothing to clean up server-side)"""
+    return jsonify({
+        "success": True,
+        "message": "Logged out successfully"
+    }), 200
 
 @app.route("/api/settings", methods=["GET"])
 @token_required
@@ -921,17 +1191,18 @@ def change_password():
                     }), 404
                 
                 current_password_hash = result[0]
-                
-                # Verify current password
-                if not bcrypt.checkpw(current_password.encode('utf-8'), current_password_hash.encode('utf-8')):
-                    return jsonify({
-                        "success": False,
-                        "message": "Current password is incorrect"
-                    }), 401
-                
-                # Hash new password
-                new_password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-                
+        
+        # bcrypt work happens with no connection borrowed
+        if not hasher.verify(current_password, current_password_hash):
+            return jsonify({
+                "success": False,
+                "message": "Current password is incorrect"
+            }), 401
+        
+        new_password_hash = hasher.hash(new_password)
+        
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
                 # Update password
                 cur.execute("""
                     UPDATE users 
@@ -945,6 +1216,8 @@ def change_password():
                     "message": "Password changed successfully"
                 }), 200
                 
+    except PasswordHasherBusy:
+        return server_busy()
     except Exception as e:
         logger.error(f"Error changing password: {e}")
         return jsonify({
@@ -952,56 +1225,92 @@ def change_password():
             "message": "Error changing password"
         }), 500
 
+# Analytics ranges (days) and bucket sizes accepted by /api/analytics
+ANALYTICS_RANGES = (7, 30, 90, 365)
+ANALYTICS_BUCKETS = ("day", "week", "month")
+
 @app.route("/api/analytics", methods=["GET"])
 @token_required
 def get_analytics():
-    """Get user analytics including weekly activity"""
+    """Get user activity analytics.
+    
+    Query params:
+        range: days of history, one of 7, 30, 90, 365 (default 7)
+        bucket: day, week or month (default day)
+    """
+    days = request.args.get('range', 7, type=int)
+    bucket = request.args.get('bucket', 'day')
+    if days not in ANALYTICS_RANGES:
+        return bad_request(f"range must be one of {', '.join(map(str, ANALYTICS_RANGES))}")
+    if bucket not in ANALYTICS_BUCKETS:
+        return bad_request(f"bucket must be one of {', '.join(ANALYTICS_BUCKETS)}")
+    
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                # Set user context for RLS
-                cur.execute("SELECT set_user_context(%s);", (g.user_id,))
+                # Buckets (including empty ones) and totals from
+                # daily_activity_rollup, built by the same function as the
+                # dashboard's analytics section
+                cur.execute("SELECT get_analytics(%s, %s, %s);", (g.user_id, days, bucket))
+                analytics = cur.fetchone()[0]
+        
+        return jsonify({
+            "success": True,
+            "analytics": analytics
+        }), 200
                 
-                # Get weekly activity (last 7 days)
+    except Exception as e:
+        logger.error(f"Error fetching analytics: {e}")
+        return jsonify({
+            "success": False, 
+            "message": "Error fetching analytics"
+        }), 500
+
+HEATMAP_DAYS = 365
+
+@app.route("/api/analytics/heatmap", methods=["GET"])
+@token_required
+def get_activity_heatmap():
+    """Get a 365-day activity heatmap as a base64 bitmap.
+    
+    Bit i (LSB-first within each byte) is set if the user completed a
+    check-in on start + i days. Streaks and totals come from the same bits.
+    """
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # At most two rows (this year and last), read by primary key
                 cur.execute("""
-                    SELECT 
-                        TO_CHAR(ds.day, 'Dy') as day_name,
-                        COUNT(dl.id) as checkins,
-                        COALESCE(SUM(CASE WHEN dl.completed THEN 1 ELSE 0 END), 0) as completed
-                    FROM (
-                        SELECT generate_series(
-                            CURRENT_DATE - INTERVAL '6 days',
-                            CURRENT_DATE,
-                            '1 day'::interval
-                        )::date as day
-                    ) ds
-                    LEFT JOIN daily_logs dl ON DATE(dl.log_date) = ds.day 
-                        AND dl.user_id = %s
-                    GROUP BY ds.day
-                    ORDER BY ds.day;
+                    SELECT t.today, ab.year, ab.days
+                    FROM (SELECT CURRENT_DATE as today) t
+                    LEFT JOIN activity_bitmaps ab
+                        ON ab.user_id = %s
+                        AND ab.year BETWEEN EXTRACT(YEAR FROM t.today) - 1 AND EXTRACT(YEAR FROM t.today);
                 """, (g.user_id,))
-                
-                weekly_activity = []
-                for row in cur.fetchall():
-                    day_name = row[0][:3].lower()  # Normalize to 3-char lowercase
-                    weekly_activity.append({
-                        "day": day_name,
-                        "checkins": row[1] or 0,
-                        "completed": row[2] or 0
-                    })
-                
-                return jsonify({
-                    "success": True,
-                    "analytics": {
-                        "weeklyActivity": weekly_activity
-                    }
-                }), 200
+                rows = cur.fetchall()
+        
+        today = rows[0][0]
+        years = {row[1]: bytes(row[2]) for row in rows if row[1] is not None}
+        start, bits = activity_bitmap.window(years, today, HEATMAP_DAYS)
+        
+        heatmap = {
+            "start": start.isoformat(),
+            "end": today.isoformat(),
+            "days": HEATMAP_DAYS,
+            "bitmap": base64.b64encode(bytes(bits)).decode('ascii')
+        }
+        heatmap.update(activity_bitmap.summarize(bits, HEATMAP_DAYS))
+        
+        return jsonify({
+            "success": True,
+            "heatmap": heatmap
+        }), 200
                 
     except Exception as e:
-        logger.error(f"Error fetching analytics: {e}")
+        logger.error(f"Error fetching heatmap: {e}")
         return jsonify({
             "success": False, 
-            "message": "Error fetching analytics"
+            "message": "Error fetching heatmap"
         }), 500
 
 def check_and_award_badges(user_id):
@@ -1093,37 +1402,42 @@ def check_and_award_badges(user_id):
         logger.error(f"Error checking badges: {e}")
         return []
 
+def load_badges():
+    """(catalog_version, serialised /api/badges response)"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            # Version and rows from the same snapshot (see load_challenges)
+            cur.execute("""
+                SELECT v.version, b.id, b.name, b.description, b.icon,
+                       b.xp_requirement, b.streak_requirement, b.category
+                FROM catalog_version v
+                LEFT JOIN badges b ON b.is_active = true
+                ORDER BY b.category, b.xp_requirement, b.streak_requirement;
+            """)
+            
+            rows = cur.fetchall()
+            version = rows[0][0]
+            badges = []
+            for row in rows:
+                if row[1] is None:
+                    continue  # no active badges
+                badges.append({
+                    "id": row[1],
+                    "name": row[2],
+                    "description": row[3],
+                    "icon": row[4],
+                    "xp_requirement": row[5],
+                    "streak_requirement": row[6],
+                    "category": row[7]
+                })
+    
+    return version, json_body({"success": True, "badges": badges})
+
 @app.route("/api/badges", methods=["GET"])
 def get_all_badges():
-    """Get all available badges"""
+    """Get all available badges (served from the catalog cache)"""
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT id, name, description, icon, xp_requirement, 
-                           streak_requirement, category
-                    FROM badges
-                    WHERE is_active = true
-                    ORDER BY category, xp_requirement, streak_requirement;
-                """)
-                
-                badges = []
-                for row in cur.fetchall():
-                    badges.append({
-                        "id": row[0],
-                        "name": row[1],
-                        "description": row[2],
-                        "icon": row[3],
-                        "xp_requirement": row[4],
-                        "streak_requirement": row[5],
-                        "category": row[6]
-                    })
-                
-                return jsonify({
-                    "success": True,
-                    "badges": badges
-                }), 200
-                
+        return catalog_response("badges", load_badges)
     except Exception as e:
         logger.error(f"Error fetching badges: {e}")
         return jsonify({
@@ -1169,95 +1483,341 @@ def get_user_badges():
             "message": "Error fetching user badges"
         }), 500
 
-# Error handlers
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({"success": False, "message": "Endpoint not found"}), 404
+# Upper bound on sub-requests per /api/batch call
+MAX_BATCH_REQUESTS = 20
 
-@app.route("/api/ai/chat", methods=["POST"])
+def run_subrequest(item):
+    """Dispatch one /api/batch item in-process and describe its response"""
+    if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+        return {"status": 400, "body": {"success": False, "message": "Each request needs a path"}}
+    
+    path = item['path']
+    method = (item.get('method') or 'GET').upper()
+    if method != 'GET':
+        return {"status": 405, "body": {"success": False, "message": "Only GET requests can be batched"}}
+    if not path.startswith('/api/') or path.split('?', 1)[0].rstrip('/') == '/api/batch':
+        return {"status": 400, "body": {"success": False, "message": "Invalid path"}}
+    
+    headers = {}
+    if item.get('if_none_match'):
+        headers['If-None-Match'] = item['if_none_match']
+    # Same client address as the batch itself, so per-IP rate limits
+    # (client_ip()) apply to the caller rather than a shared 'unknown'
+    if request.headers.get('X-Forwarded-For'):
+        headers['X-Forwarded-For'] = request.headers['X-Forwarded-For']
+    environ = {'REMOTE_ADDR': request.remote_addr}
+    
+    # Reuses the current app context, so g (user, shared connection) carries over
+    with app.test_request_context(path, method=method, headers=headers, environ_base=environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            logger.error(f"Batch sub-request {path} failed: {e}", exc_info=True)
+            return {"status": 500, "body": {"success": False, "message": "Internal server error"}}
+    
+    result = {"status": response.status_code}
+    etag = response.headers.get('ETag')
+    if etag:
+        result["etag"] = etag
+    if response.status_code != 304:
+        result["body"] = response.get_json(silent=True)
+    return result
+
+@app.route("/api/batch", methods=["POST"])
 @token_required
-def ai_chat():
-    """AI coach chat endpoint with OpenAI integration"""
+def batch():
+    """Run several GET requests in one round-trip.
+    
+    Body: {"requests": [{"id": "p", "path": "/api/profile"},
+                        {"id": "lb", "path": "/api/leaderboard?limit=10",
+                         "if_none_match": "\"etag\""}]}
+    Sub-requests share this request's authentication and one database
+    connection (each in its own savepoint). Responses come back in order with
+    their id, status, ETag and JSON body.
+    """
     if not request.is_json:
         return bad_request("Expected JSON data")
     
-    data = request.get_json()
-    message = data.get('message', '').strip()
-    
-    if not message:
-        return bad_request("Message is required")
+    body = request.get_json()
+    items = body.get('requests') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return bad_request("requests must be a non-empty list")
+    if len(items) > MAX_BATCH_REQUESTS:
+        return bad_request(f"At most {MAX_BATCH_REQUESTS} requests per batch")
     
     try:
-        # Optional: Get user context for personalized responses
-        user_context = None
-        try:
-            with get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    # Get user stats for context
-                    cur.execute("""
-                        SELECT level, xp, 
-                               (SELECT COUNT(*) FROM user_challenges 
-                                WHERE user_id = %s AND completed = false) as active_challenges,
-                               (SELECT MAX(current_streak) FROM streaks 
-                                WHERE user_id = %s) as current_streak
-                        FROM users 
-                        WHERE id = %s;
-                    """, (g.user_id, g.user_id, g.user_id))
-                    
-                    result = cur.fetchone()
-                    if result:
-                        user_context = {
-                            'level': result[0],
-                            'xp': result[1],
-                            'active_challenges': result[2] or 0,
-                            'current_streak': result[3] or 0
-                        }
-        except Exception as db_error:
-            logger.warning(f"Could not fetch user context: {db_error}")
-            # Continue without context
+        with db.get_db_connection(user_id=g.user_id) as conn:
+            g.batch_conn = conn
+            try:
+                responses = []
+                for item in items:
+                    result = run_subrequest(item)
+                    if isinstance(item, dict) and 'id' in item:
+                        result = {"id": item['id'], **result}
+                    responses.append(result)
+            finally:
+                g.batch_conn = None
         
-        # Import AI coach function
-        from AI.ai_coach import get_ai_response
+        return jsonify({
+            "success": True,
+            "responses": responses
+        }), 200
+    except Exception as e:
+        logger.error(f"Batch request error: {e}", exc_info=True)
+        return jsonify({
+            "success": False,
+            "message": "Error processing batch request"
+        }), 500
+
+# Error handlers
+@app.errorhandler(404)
+def not_found(error):
+    return jsonify({"success": False, "message": "Endpoint not found"}), 404
+
+def ai_user_context(user_id):
+    """User stats for personalised AI responses (None if unavailable)"""
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Get user stats for context
+                cur.execute("""
+                    SELECT u.level, u.xp, us.active_challenges, us.current_streak
+                    FROM users u
+                    LEFT JOIN user_stats us ON us.user_id = u.id
+                    WHERE u.id = %s;
+                """, (user_id,))
+                
+                result = cur.fetchone()
+                if result:
+                    return {
+                        'level': result[0],
+                        'xp': result[1],
+                        'active_challenges': result[2] or 0,
+                        'current_streak': result[3] or 0
+                    }
+    except Exception as db_error:
+        logger.warning(f"Could not fetch user context: {db_error}")
+        # Continue without context
+    return None
+
+def ai_error(e):
+    """User-facing message and status code for an AI coach failure"""
+    if isinstance(e, openai.RateLimitError):
+        if getattr(e, 'code', None) == 'insufficient_quota':
+            return "OpenAI API quota exceeded. Please check your API key and billing.", 503
+        return "The AI coach is busy right now, please try again in a moment.", 503
+    if isinstance(e, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        return "OpenAI API authentication failed. Please check your API key.", 503
+    if isinstance(e, (openai.APIConnectionError, openai.InternalServerError)):
+        # Includes timeouts
+        return "The AI coach is temporarily unavailable. Please try again shortly.", 503
+    return "Sorry, I encountered an error connecting to OpenAI. Please try again.", 500
+
+def ai_busy():
+    """Helper function for 503 errors when the AI coach is at capacity"""
+    response = jsonify({"success": False, "message": "The AI coach is busy right now, please try again in a moment"})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+def run_ai_chat(user_id, message, user_context):
+    """One chat exchange: history in, OpenAI reply, history out
+    
+    Returns the response payload plus its HTTP status under "status". Runs
+    inline or on the AI job pool, so it must not touch the request context.
+    """
+    try:
+        # Import AI coach functions
+        from AI.ai_coach import get_ai_response, fallback_reply
+        from AI.client import CircuitOpenError
         
-        # Get conversation history for this user (keep last 10 messages)
-        # Create a copy to avoid modifying the original list directly
-        conversation_history = user_conversations.get(g.user_id, [])[:]
+        # Conversation history is shared by all workers (see conversations.py)
+        conversation_history = conversations.get(user_id)
         
         # Get AI response with conversation history
-        ai_response = get_ai_response(message, user_context, conversation_history)
-        
-        # Update conversation history
-        conversation_history.append({"role": "user", "content": message})
-        conversation_history.append({"role": "assistant", "content": ai_response})
+        try:
+            ai_response = get_ai_response(message, user_context, conversation_history)
+        except CircuitOpenError:
+            # OpenAI is degraded: answer at once with a tip, and keep it out of history
+            tip = fallback_reply(message, user_context)
+            return {
+                "success": True,
+                "message": tip,
+                "response": tip,
+                "fallback": True,
+                "status": 200
+            }
         
-        # Keep only last 10 messages (5 exchanges) to manage token usage
-        user_conversations[g.user_id] = conversation_history[-10:]
+        # Update conversation history (older messages are compacted into a summary)
+        conversations.append(
+            user_id,
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": ai_response}
+        )
         
-        return jsonify({
+        return {
             "success": True,
             "message": ai_response,
-            "response": ai_response
-        }), 200
+            "response": ai_response,
+            "status": 200
+        }
         
     except Exception as e:
         logger.error(f"AI chat error: {e}", exc_info=True)
-        # Check if it's an OpenAI API error
-        error_message = str(e)
-        if "quota" in error_message.lower() or "rate limit" in error_message.lower() or "429" in error_message:
-            return jsonify({
-                "success": False,
-                "message": "OpenAI API quota exceeded. Please check your API key and billing."
-            }), 503
-        elif "authentication" in error_message.lower() or "401" in error_message or "invalid" in error_message.lower():
-            return jsonify({
-                "success": False,
-                "message": "OpenAI API authentication failed. Please check your API key."
-            }), 503
-        else:
-            return jsonify({
-                "success": False,
-                "message": "Sorry, I encountered an error connecting to OpenAI. Please try again."
-            }), 500
+        error_message, status = ai_error(e)
+        return {
+            "success": False,
+            "message": error_message,
+            "status": status
+        }
+
+MAX_CHAT_MESSAGE_CHARS = 2000
+
+def chat_message():
+    """The trimmed 'message' from a JSON chat request, or an error response"""
+    if not request.is_json:
+        return None, bad_request("Expected JSON data")
+    
+    message = request.get_json().get('message', '').strip()
+    if not message:
+        return None, bad_request("Message is required")
+    # Keeps the prompt size bounded along with the history budget
+    if len(message) > MAX_CHAT_MESSAGE_CHARS:
+        return None, bad_request(f"Message must be at most {MAX_CHAT_MESSAGE_CHARS} characters")
+    return message, None
+
+@app.route("/api/ai/chat", methods=["POST"])
+@token_required
+def ai_chat():
+    """AI coach chat endpoint with OpenAI integration
+    
+    Holds this worker for the whole OpenAI round trip, so it shares the small
+    machine-wide inline allowance with the streaming endpoint. Prefer
+    /api/ai/chat/jobs, which doesn't block a worker.
+    """
+    message, error = chat_message()
+    if error:
+        return error
+    
+    try:
+        with ai_jobs.inline(g.user_id):
+            result = run_ai_chat(g.user_id, message, ai_user_context(g.user_id))
+    except AIJobsBusy:
+        return ai_busy()
+    
+    status = result.pop("status")
+    return jsonify(result), status
+
+@app.route("/api/ai/chat/jobs", methods=["POST"])
+@token_required
+def submit_ai_chat_job():
+    """Queue an AI coach reply; poll GET /api/ai/chat/jobs/<job_id> for it"""
+    message, error = chat_message()
+    if error:
+        return error
+    
+    # Read in the request: the job thread has no request context
+    user_context = ai_user_context(g.user_id)
+    try:
+        job_id = ai_jobs.submit(g.user_id, run_ai_chat, g.user_id, message, user_context)
+    except AIJobsBusy:
+        return ai_busy()
+    
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued"
+    }), 202
+
+@app.route("/api/ai/chat/jobs/<job_id>", methods=["GET"])
+@token_required
+def get_ai_chat_job(job_id):
+    """Status of a queued AI coach reply, with the reply once it's done"""
+    job = ai_jobs.get(job_id, g.user_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    
+    if job['result'] is None:
+        return jsonify({"success": True, "status": job['status']}), 200
+    
+    result = dict(job['result'])
+    status = result.pop("status", 200)
+    return jsonify({**result, "job_id": job_id, "status": job['status']}), status
+
+def sse_event(event, data):
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/api/ai/chat/stream", methods=["POST"])
+@token_required
+def ai_chat_stream():
+    """AI coach chat, streamed as Server-Sent Events
+    
+    Events:
+        token - {"text": "..."} for each fragment as OpenAI produces it
+        done  - {"message": "..."} the full reply, once saved to history
+        error - {"message": "...", "status": 503}
+    If the client disconnects, the generator is closed, which closes the
+    upstream OpenAI response; nothing is saved to history in that case.
+    """
+    message, error = chat_message()
+    if error:
+        return error
+    
+    from AI.ai_coach import stream_ai_response, fallback_reply
+    from AI.client import CircuitOpenError
+    
+    # The stream holds this worker until it ends, so it needs an inline slot
+    try:
+        slot = ai_jobs.inline(g.user_id)
+    except AIJobsBusy:
+        return ai_busy()
+    
+    # Everything the generator needs is read now: it runs after this
+    # function returns, outside the request context
+    user_id = g.user_id
+    try:
+        user_context = ai_user_context(user_id)
+        conversation_history = conversations.get(user_id)
+    except Exception:
+        slot.release("failed")
+        raise
+    
+    def generate():
+        parts = []
+        fragments = stream_ai_response(message, user_context, conversation_history)
+        try:
+            for text in fragments:
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            
+            ai_response = "".join(parts).strip()
+            conversations.append(
+                user_id,
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": ai_response}
+            )
+            yield sse_event("done", {"message": ai_response})
+        except CircuitOpenError:
+            # OpenAI is degraded: answer at once with a tip, and keep it out of history
+            tip = fallback_reply(message, user_context)
+            yield sse_event("token", {"text": tip})
+            yield sse_event("done", {"message": tip, "fallback": True})
+        except Exception as e:
+            logger.error(f"AI chat stream error: {e}", exc_info=True)
+            error_message, status = ai_error(e)
+            yield sse_event("error", {"message": error_message, "status": status})
+        finally:
+            fragments.close()
+            slot.release()
+    
+    response = app.response_class(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # don't let nginx buffer the stream
+    })
+    # The generator's finally only runs once iteration has started; the
+    # server always closes the response, even if the client left before that
+    response.call_on_close(slot.release)
+    return response
 
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,214 @@
+"""Username/email availability for the signup form's live validation.
+
+Each worker keeps a Bloom filter of every username and email hash (SHA-256
+of the lowercased address, so plaintext emails never leave the database),
+loaded through ``user_identities()`` and kept current from the
+``user_identities`` NOTIFY channel (see schema.sql). A value that is not in
+the filter is definitely free, which answers most keystrokes without a query;
+a hit may be a false positive, so it is confirmed with ``identity_taken()``.
+
+A Bloom filter can't forget, so a deleted user's name keeps costing one
+confirming query until the next rebuild (on listener reconnect, or when the
+filter outgrows its capacity). While the filter is cold every check goes to
+SQL. /api/signup still relies on the unique constraints, not on this.
+"""
+import os
+import math
+import json
+import hashlib
+import logging
+import threading
+
+from config import Config
+from db import get_db_connection
+from listener import listener
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "user_identities"
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def _username_key(username):
+    return f"u:{username}"
+
+
+def email_hash(email):
+    """Hex SHA-256 of the lowercased email, as computed by user_identities()."""
+    return hashlib.sha256(email.lower().encode('utf-8')).hexdigest()
+
+
+def _email_key(hashed):
+    return f"e:{hashed}"
+
+
+class AvailabilityFilter:
+    def __init__(self, error_rate=0.01, min_capacity=10000):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+
+        self._lock = threading.Lock()
+        self._filter = None
+        self._loading = False
+        self._pending = []          # identities announced while loading
+        self._subscribed_pid = None
+
+        # Metrics
+        self.loads = 0
+        self.filter_answers = 0     # "available" straight from the filter
+        self.sql_checks = 0
+        self.false_positives = 0
+
+    def _ensure_subscribed(self):
+        if self._subscribed_pid == os.getpid():
+            return
+        with self._lock:
+            if self._subscribed_pid == os.getpid():
+                return
+            # Anything inherited from the master process is discarded
+            self._filter = None
+            self._loading = False
+            self._subscribed_pid = os.getpid()
+        # The filter is loaded once LISTEN is active (see _on_listen)
+        listener.subscribe(CHANNEL, self._on_notify, on_listen=self._on_listen)
+
+    def is_warm(self):
+        return self._filter is not None and self._subscribed_pid == os.getpid()
+
+    def _on_listen(self):
+        # Identities added while we weren't listening were missed
+        with self._lock:
+            self._filter = None
+        self._start_load()
+
+    def _on_notify(self, payload):
+        change = json.loads(payload)
+        self._add([_username_key(change['username']), _email_key(change['email_hash'])])
+
+    def _start_load(self):
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+            self._pending = []
+        threading.Thread(target=self._load, name="availability-filter", daemon=True).start()
+
+    def _load(self):
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT username, email_hash FROM user_identities();")
+                    rows = cur.fetchall()
+
+            # Two keys per user, with room for the user base to double
+            bloom = BloomFilter(max(self.min_capacity, 4 * len(rows)), self.error_rate)
+            for username, hashed in rows:
+                bloom.add(_username_key(username))
+                bloom.add(_email_key(hashed))
+
+            with self._lock:
+                for key in self._pending:
+                    bloom.add(key)
+                self._filter = bloom
+            self.loads += 1
+            logger.info(f"Availability filter loaded {len(rows)} users")
+        except Exception as e:
+            logger.error(f"Availability filter load failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._loading = False
+                self._pending = []
+
+    def add(self, username, email):
+        """Record a taken username/email after a signup."""
+        self._add([_username_key(username), _email_key(email_hash(email))])
+
+    def _add(self, keys):
+        with self._lock:
+            if self._loading:
+                self._pending.extend(keys)
+            bloom = self._filter
+            if bloom is not None:
+                for key in keys:
+                    bloom.add(key)
+                grow = bloom.count > bloom.capacity
+            else:
+                grow = False
+        if grow:
+            # Past capacity the false-positive rate climbs; rebuild bigger
+            self._start_load()
+
+    def check(self, username=None, email=None):
+        """Return ``{"username": available, "email": available}`` for the given values."""
+        if Config.AVAILABILITY_FILTER_ENABLED:
+            self._ensure_subscribed()
+        bloom = self._filter if Config.AVAILABILITY_FILTER_ENABLED and self.is_warm() else None
+
+        result = {}
+        confirm = {}
+        for field, value, key in (
+            ("username", username, username and _username_key(username)),
+            ("email", email, email and _email_key(email_hash(email))),
+        ):
+            if not value:
+                continue
+            if bloom is not None and key not in bloom:
+                result[field] = True
+                self.filter_answers += 1
+            else:
+                confirm[field] = value
+
+        if confirm:
+            self.sql_checks += 1
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "SELECT identity_taken(%s, %s);",
+                        (confirm.get("username"), confirm.get("email"))
+                    )
+                    taken = cur.fetchone()[0]
+            for field in confirm:
+                result[field] = not taken[field]
+                if bloom is not None and not taken[field]:
+                    self.false_positives += 1
+        return result
+
+    def metrics(self):
+        bloom = self._filter
+        return {
+            "enabled": Config.AVAILABILITY_FILTER_ENABLED,
+            "warm": self.is_warm(),
+            "entries": bloom.count if bloom is not None else 0,
+            "capacity": bloom.capacity if bloom is not None else 0,
+            "bytes": len(bloom.bits) if bloom is not None else 0,
+            "loads": self.loads,
+            "filter_answers": self.filter_answers,
+            "sql_checks": self.sql_checks,
+            "false_positives": self.false_positives,
+        }
+
+
+availability = AvailabilityFilter(error_rate=Config.AVAILABILITY_FILTER_ERROR_RATE)
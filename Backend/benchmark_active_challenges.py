@@ -0,0 +1,141 @@
+"""Benchmark /api/challenges/active: per-row lookups (old) vs one set-based query (new)
+
+Creates a throwaway user with N active challenges inside a transaction, times
+both query strategies for increasing N, then rolls everything back.
+
+Usage: python benchmark_active_challenges.py [iterations]
+"""
+import os
+import sys
+import time
+import statistics
+from dotenv import load_dotenv
+import psycopg2
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, 'database.env'))
+
+# Database configuration - use postgres superuser so RLS doesn't get in the way
+DB_NAME = os.getenv("DB_NAME", "reclaim")
+DB_USER = "postgres"
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+
+CHALLENGE_COUNTS = [1, 5, 10, 20, 40]
+
+
+def old_strategy(cur, user_id):
+    """The previous implementation: 1 query + 2 lookups per active challenge."""
+    cur.execute("""
+        SELECT uc.id, c.id, c.title, c.description, c.difficulty,
+               c.xp_reward, uc.progress_days, c.duration_days,
+               uc.started_at, c.category
+        FROM user_challenges uc
+        JOIN challenges c ON uc.challenge_id = c.id
+        WHERE uc.user_id = %s AND uc.status = 'active'
+        ORDER BY uc.started_at DESC;
+    """, (user_id,))
+    rows = cur.fetchall()
+    for row in rows:
+        cur.execute("""
+            SELECT id FROM daily_logs
+            WHERE user_id = %s AND challenge_id = %s AND log_date = CURRENT_DATE;
+        """, (user_id, row[1]))
+        cur.fetchone()
+        cur.execute("""
+            SELECT current_streak, longest_streak
+            FROM streaks
+            WHERE user_id = %s AND challenge_id = %s;
+        """, (user_id, row[1]))
+        cur.fetchone()
+    return len(rows)
+
+
+def new_strategy(cur, user_id):
+    """The current implementation: a single query (get_active_challenges())."""
+    cur.execute("SELECT get_active_challenges(%s);", (user_id,))
+    return len(cur.fetchone()[0])
+
+
+def time_ms(fn, cur, user_id, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(cur, user_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark(iterations):
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+    )
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT id FROM challenges WHERE is_active = true ORDER BY id LIMIT %s;",
+                    (max(CHALLENGE_COUNTS),))
+        challenge_ids = [row[0] for row in cur.fetchall()]
+        if len(challenge_ids) < max(CHALLENGE_COUNTS):
+            print(f"Need at least {max(CHALLENGE_COUNTS)} active challenges "
+                  f"(found {len(challenge_ids)}). Run seed_challenges.py first.")
+            return False
+
+        cur.execute("""
+            INSERT INTO users (username, email, password_hash)
+            VALUES ('bench_active_user', 'bench_active_user@example.com', 'x')
+            RETURNING id;
+        """)
+        user_id = cur.fetchone()[0]
+
+        print(f"{'N':>4} {'queries old':>12} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+        enrolled = 0
+        for n in CHALLENGE_COUNTS:
+            # Enroll up to N challenges; every other one has a streak and today's log
+            for i, challenge_id in enumerate(challenge_ids[enrolled:n], start=enrolled):
+                cur.execute("""
+                    INSERT INTO user_challenges (user_id, challenge_id, status)
+                    VALUES (%s, %s, 'active');
+                """, (user_id, challenge_id))
+                if i % 2 == 0:
+                    cur.execute("""
+                        INSERT INTO streaks (user_id, challenge_id, current_streak, longest_streak, last_active)
+                        VALUES (%s, %s, 3, 5, CURRENT_DATE);
+                    """, (user_id, challenge_id))
+                    cur.execute("""
+                        INSERT INTO daily_logs (user_id, challenge_id, log_date, completed)
+                        VALUES (%s, %s, CURRENT_DATE, TRUE);
+                    """, (user_id, challenge_id))
+            enrolled = n
+
+            assert old_strategy(cur, user_id) == new_strategy(cur, user_id) == n
+            old_ms = time_ms(old_strategy, cur, user_id, iterations)
+            new_ms = time_ms(new_strategy, cur, user_id, iterations)
+            print(f"{n:>4} {2 * n + 1:>12} {old_ms:>9.2f} {new_ms:>9.2f} {old_ms / new_ms:>7.1f}x")
+
+        return True
+
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+    finally:
+        # Nothing created by the benchmark is kept
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print("=" * 50)
+    print(f"Active challenges benchmark (median of {iterations} runs)")
+    print("=" * 50)
+    success = run_benchmark(iterations)
+    sys.exit(0 if success else 1)
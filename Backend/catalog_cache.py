@@ -0,0 +1,111 @@
+"""Per-worker cache of the challenge and badge catalog.
+
+The catalog only changes when the seed/cleanup scripts run, so each worker
+keeps the fully serialised JSON response for /api/challenges and /api/badges
+and serves it without touching the database.
+
+Every cached body is tagged with the ``catalog_version`` it was read at. A
+trigger bumps that version on any change to ``challenges`` or ``badges`` and
+publishes it on the ``catalog_changes`` channel (see schema.sql); a body
+older than the newest version heard is reloaded on the next request. While
+the listener is disconnected, notifications may be missed, so bodies are
+only trusted for ``ttl`` seconds.
+"""
+import os
+import time
+import logging
+import threading
+
+from config import Config
+from listener import listener
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "catalog_changes"
+
+
+class CatalogCache:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = {}          # name -> (version, loaded_at, body)
+        self._latest_version = 0    # newest version announced by NOTIFY
+        self._subscribed_pid = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _ensure_subscribed(self):
+        if self._subscribed_pid == os.getpid():
+            return
+        with self._lock:
+            if self._subscribed_pid == os.getpid():
+                return
+            # Anything inherited from the master process is discarded
+            self._entries = {}
+            self._latest_version = 0
+            self._subscribed_pid = os.getpid()
+        listener.subscribe(CHANNEL, self._on_notify, on_listen=self._on_listen)
+
+    def _on_notify(self, payload):
+        version = int(payload)
+        with self._lock:
+            if version > self._latest_version:
+                self._latest_version = version
+                self.invalidations += 1
+
+    def _on_listen(self):
+        # Changes made while we weren't listening were missed
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def get(self, name, loader):
+        """Return ``(version, body)`` for ``name``, calling ``loader()`` on a miss.
+
+        ``loader`` returns ``(version, body)`` where ``version`` is the
+        ``catalog_version`` read in the same snapshot as the catalog rows.
+        """
+        if not Config.CATALOG_CACHE_ENABLED:
+            return loader()
+
+        self._ensure_subscribed()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                version, loaded_at, body = entry
+                fresh = version >= self._latest_version and (
+                    listener.is_connected() or time.monotonic() - loaded_at < self.ttl
+                )
+                if fresh:
+                    self.hits += 1
+                    return version, body
+
+        self.misses += 1
+        version, body = loader()
+        with self._lock:
+            # A newer NOTIFY may have landed while loading; the version check
+            # above will reject this body on the next request in that case
+            self._entries[name] = (version, time.monotonic(), body)
+        return version, body
+
+    def metrics(self):
+        with self._lock:
+            entries = {name: entry[0] for name, entry in self._entries.items()}
+            latest = self._latest_version
+        return {
+            "enabled": Config.CATALOG_CACHE_ENABLED,
+            "entries": entries,
+            "latest_version": latest,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog_cache = CatalogCache(ttl=Config.CATALOG_CACHE_TTL)
@@ -0,0 +1,101 @@
+"""Token-budgeted AI coach conversation history.
+
+History is bounded by an estimated token count rather than a message count,
+so a few long messages can't blow up the prompt while many short ones still
+fit. When the budget is exceeded, the oldest messages are folded into a
+single summary message at the start of the history ("Earlier in this
+conversation: ..."), which keeps the gist of the conversation within its own
+smaller budget. The summary quotes the user's own words, so it is sent with
+the assistant role, never as a system message. The summary is extractive (the first sentence of each folded
+message), so compaction costs no extra OpenAI call.
+
+Token counts are estimated at ~4 characters per token plus a small
+per-message overhead, which is close enough for budgeting English chat.
+"""
+import re
+
+from config import Config
+
+SUMMARY_PREFIX = "Earlier in this conversation:"
+MESSAGE_OVERHEAD = 4        # role and separators, per message
+SUMMARY_LINE_CHARS = 160
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message):
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def is_summary(message):
+    # Histories compacted before the summary moved to the assistant role
+    # still start with a system message
+    return message["role"] in ("assistant", "system") and message["content"].startswith(SUMMARY_PREFIX)
+
+
+def _summary_line(message):
+    # First sentence, shortened
+    text = " ".join(message["content"].split())
+    text = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    speaker = "User" if message["role"] == "user" else "Coach"
+    return f"- {speaker}: {text}"
+
+
+def _summary_message(lines, budget):
+    # Oldest lines go first when the summary itself is over budget
+    while lines and estimate_tokens("\n".join([SUMMARY_PREFIX] + lines)) + MESSAGE_OVERHEAD > budget:
+        lines = lines[1:]
+    if not lines:
+        return None
+    return {"role": "assistant", "content": "\n".join([SUMMARY_PREFIX] + lines)}
+
+
+def _split(history):
+    if history and is_summary(history[0]):
+        return {"role": "assistant", "content": history[0]["content"]}, history[1:]
+    return None, list(history)
+
+
+def _newest_within(messages, budget):
+    """Index of the oldest message such that it and all newer ones fit."""
+    used = 0
+    start = len(messages)
+    while start > 0 and used + message_tokens(messages[start - 1]) <= budget:
+        used += message_tokens(messages[start - 1])
+        start -= 1
+    return start
+
+
+def compact(history, budget=None, summary_budget=None):
+    """History with at most ``budget`` estimated tokens of recent messages.
+
+    Older messages are folded into the leading summary message, which is
+    kept within ``summary_budget`` tokens.
+    """
+    budget = budget or Config.CONVERSATION_TOKEN_BUDGET
+    summary_budget = summary_budget or Config.CONVERSATION_SUMMARY_TOKENS
+
+    summary, messages = _split(history)
+    start = _newest_within(messages, budget)
+    if start == 0:
+        return list(history)
+
+    lines = summary["content"].split("\n")[1:] if summary else []
+    lines += [_summary_line(message) for message in messages[:start]]
+    summary = _summary_message(lines, summary_budget)
+    return ([summary] if summary else []) + messages[start:]
+
+
+def trim_to_budget(history, budget=None):
+    """The summary (if any) and the newest messages fitting in ``budget`` tokens.
+
+    For building prompts from history that may predate compaction.
+    """
+    budget = budget or Config.CONVERSATION_TOKEN_BUDGET
+    summary, messages = _split(history or [])
+    start = _newest_within(messages, budget)
+    return ([summary] if summary else []) + messages[start:]
@@ -1,4 +1,5 @@
 import os
+import multiprocessing
 from dotenv import load_dotenv
 
 
@@ -22,6 +23,97 @@ class Config:
     DB_PASSWORD = os.getenv("DB_PASSWORD", "")
     DB_HOST = os.getenv("DB_HOST", "localhost")
 
+    # Connection pool (per gunicorn worker). Each worker also holds one LISTEN
+    # connection (listener.py), so workers * (DB_POOL_MAX + 1) must stay under
+    # DB_CONNECTION_LIMIT; gunicorn.py shrinks the pool when it wouldn't.
+    # Sync workers serve one request at a time, so 2 leaves room for the
+    # background threads (leaderboard index, availability filter).
+    DB_CONNECTION_LIMIT = int(os.getenv("DB_CONNECTION_LIMIT", "50"))  # reclaim_app CONNECTION LIMIT (roles_and_grants.sql)
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "2"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))             # seconds to wait for a free connection
+    DB_POOL_MAX_LIFETIME = int(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # recycle connections after this many seconds
+    DB_POOL_VALIDATE_AFTER = int(os.getenv("DB_POOL_VALIDATE_AFTER", "30"))  # ping connections idle longer than this
+
+    # Gunicorn sync workers (gunicorn.py). Each needs at least two database
+    # connections (pool + LISTEN), so the default stays within the limit.
+    GUNICORN_WORKERS = int(os.getenv(
+        "GUNICORN_WORKERS", str(min(multiprocessing.cpu_count() * 2 + 1, DB_CONNECTION_LIMIT // 2))
+    ))
+
+    # In-memory leaderboard index (falls back to SQL while cold or when disabled)
+    LEADERBOARD_INDEX_ENABLED = os.getenv("LEADERBOARD_INDEX_ENABLED", "true").lower() == "true"
+    LEADERBOARD_INDEX_CHECK_INTERVAL = int(os.getenv("LEADERBOARD_INDEX_CHECK_INTERVAL", "60"))  # seconds between DB consistency checks
+
+    # Per-worker cache of the challenge/badge catalog (invalidated via NOTIFY)
+    CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))  # max age while the listener is disconnected
+
+    # Password hashing (bcrypt). Slots are shared by all gunicorn workers through
+    # SQLite on /dev/shm; requests beyond max_concurrent + queue_limit get a 503 right away.
+    # Running and waiting callers each hold a worker, so by default they may
+    # take at most half of the workers.
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # existing hashes are upgraded on login
+    BCRYPT_MAX_CONCURRENT = int(os.getenv(
+        "BCRYPT_MAX_CONCURRENT", str(max(1, min((os.cpu_count() or 2) // 2, GUNICORN_WORKERS // 2)))
+    ))
+    BCRYPT_QUEUE_LIMIT = int(os.getenv(
+        "BCRYPT_QUEUE_LIMIT", str(max(0, GUNICORN_WORKERS // 2 - BCRYPT_MAX_CONCURRENT))
+    ))
+    BCRYPT_QUEUE_TIMEOUT = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "2"))  # seconds to wait for a slot
+    BCRYPT_SLOT_LEASE = float(os.getenv("BCRYPT_SLOT_LEASE", "10"))       # a slot held longer (dead worker) is reclaimed
+    BCRYPT_SLOT_DB = os.getenv("BCRYPT_SLOT_DB", "")  # default: /dev/shm/reclaim-bcrypt-slots.sqlite3
+
+    # Login/signup rate limiting, shared by all workers through SQLite on /dev/shm.
+    # Limits are token buckets: the number is both the burst size and the refill per period.
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "")  # default: /dev/shm/reclaim-ratelimit.sqlite3
+    RATE_LIMIT_LOGIN_IP = int(os.getenv("RATE_LIMIT_LOGIN_IP", "20"))        # login attempts per IP per minute
+    RATE_LIMIT_LOGIN_USER = int(os.getenv("RATE_LIMIT_LOGIN_USER", "5"))     # login attempts per username per minute
+    RATE_LIMIT_SIGNUP_IP = int(os.getenv("RATE_LIMIT_SIGNUP_IP", "10"))      # signups per IP per hour
+    RATE_LIMIT_AVAILABILITY_IP = int(os.getenv("RATE_LIMIT_AVAILABILITY_IP", "120"))  # availability checks per IP per minute
+    RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"  # use X-Forwarded-For
+
+    # Per-worker Bloom filter behind /api/signup/availability (hits are confirmed in SQL)
+    AVAILABILITY_FILTER_ENABLED = os.getenv("AVAILABILITY_FILTER_ENABLED", "true").lower() == "true"
+    AVAILABILITY_FILTER_ERROR_RATE = float(os.getenv("AVAILABILITY_FILTER_ERROR_RATE", "0.01"))
+
+    # AI coach conversation history, shared by all workers through SQLite on /dev/shm
+    CONVERSATION_DB = os.getenv("CONVERSATION_DB", "")  # default: /dev/shm/reclaim-conversations.sqlite3
+    CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", "86400"))  # forget conversations idle this many seconds
+    CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1200"))   # recent messages kept verbatim (estimated tokens)
+    CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "300"))  # running summary of older messages
+    CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))  # least recently used evicted beyond this
+
+    # AI coach execution. Queued jobs run on a small thread pool in each worker;
+    # the caps below are machine-wide (counted in SQLite on /dev/shm).
+    AI_JOB_DB = os.getenv("AI_JOB_DB", "")  # default: /dev/shm/reclaim-ai-jobs.sqlite3
+    AI_JOB_CONCURRENCY = int(os.getenv("AI_JOB_CONCURRENCY", "4"))    # OpenAI calls in flight per worker
+    AI_JOB_MAX_PENDING = int(os.getenv("AI_JOB_MAX_PENDING", "32"))   # queued + running jobs
+    AI_MAX_INLINE = int(os.getenv("AI_MAX_INLINE", "4"))              # workers that may block on OpenAI (streaming chat)
+    AI_JOB_TIMEOUT = int(os.getenv("AI_JOB_TIMEOUT", "60"))           # seconds before an unfinished job counts as failed
+
+    # Per-worker cache of AI replies to common first messages (no history)
+    AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"  # kill switch
+    AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "3600"))
+    AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000"))
+
+    # OpenAI client. Timeouts keep every call well inside the 30s gunicorn
+    # worker timeout; the breaker fails fast (with a fallback tip) after repeated errors.
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "3"))
+    OPENAI_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "15"))
+    OPENAI_DEADLINE = float(os.getenv("OPENAI_DEADLINE", "25"))             # total seconds including retries
+    OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))          # for 429, 5xx and connection errors
+    OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+    OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "4"))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "10"))  # keep-alive pool per worker
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+    OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))  # consecutive failures to open
+    OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "30"))  # seconds before a trial call
+
+    # /api/metrics is disabled unless a token is set; send it as X-Metrics-Token
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
     # JWT settings
     JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
     JWT_ALG = "HS256"
@@ -0,0 +1,159 @@
+"""AI coach conversation history shared by all gunicorn workers.
+
+History used to live in a per-worker dict, so it grew without bound and a
+user's context depended on which worker served the request. It now lives in
+a SQLite database on /dev/shm (see shm_db.py) with:
+
+- a per-conversation token budget: older messages are folded into a
+  running summary (see chat_history.py);
+- a TTL: conversations idle for ``ttl`` seconds read as empty and are purged;
+- a global cap of ``max_bytes`` of stored JSON, enforced by evicting the
+  least recently used conversations.
+
+History is best effort: if the store is unavailable the coach answers
+without context rather than failing.
+"""
+import json
+import time
+import logging
+import sqlite3
+
+import chat_history
+from config import Config
+from shm_db import SharedSQLite, default_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        user_id INTEGER PRIMARY KEY,
+        messages TEXT NOT NULL,
+        bytes INTEGER NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated);
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO totals (id, bytes) VALUES (1, 0);
+"""
+
+
+class ConversationStore:
+    def __init__(self, path, ttl=86400, token_budget=1200, summary_tokens=300,
+                 max_bytes=64 * 1024 * 1024, purge_every=200):
+        self.db = SharedSQLite(path, SCHEMA)
+        self.ttl = ttl
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.max_bytes = max_bytes
+        self.purge_every = purge_every
+        self._writes = 0
+
+        # Metrics (per worker)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def get(self, user_id):
+        """The user's history (``[{"role", "content"}, ...]``), oldest first.
+
+        May start with a summary message (role "assistant") of older turns.
+        """
+        try:
+            with self.db.reader() as conn:
+                row = conn.execute(
+                    "SELECT messages FROM conversations WHERE user_id = ? AND updated >= ?;",
+                    (user_id, time.time() - self.ttl)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Conversation store unavailable: {e}")
+            return []
+        if row is None:
+            self.misses += 1
+            return []
+        self.hits += 1
+        return json.loads(row[0])
+
+    def append(self, user_id, *messages):
+        """Add messages to the user's history (read-modify-write in one transaction)."""
+        now = time.time()
+        try:
+            with self.db.transaction() as conn:
+                row = conn.execute(
+                    "SELECT messages, bytes, updated FROM conversations WHERE user_id = ?;",
+                    (user_id,)
+                ).fetchone()
+                history = []
+                old_bytes = 0
+                if row is not None:
+                    old_bytes = row[1]
+                    if row[2] >= now - self.ttl:
+                        history = json.loads(row[0])
+
+                history = chat_history.compact(
+                    history + list(messages), self.token_budget, self.summary_tokens
+                )
+                payload = json.dumps(history)
+                conn.execute(
+                    "INSERT OR REPLACE INTO conversations (user_id, messages, bytes, updated) VALUES (?, ?, ?, ?);",
+                    (user_id, payload, len(payload), now)
+                )
+                conn.execute("UPDATE totals SET bytes = bytes + ? WHERE id = 1;", (len(payload) - old_bytes,))
+
+                self._writes += 1
+                if self._writes % self.purge_every == 0:
+                    self._purge_expired(conn, now)
+                self._enforce_cap(conn)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Could not save conversation for user {user_id}: {e}")
+
+    def _purge_expired(self, conn, now):
+        freed = conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM conversations WHERE updated < ?;", (now - self.ttl,)
+        ).fetchone()[0]
+        conn.execute("DELETE FROM conversations WHERE updated < ?;", (now - self.ttl,))
+        conn.execute("UPDATE totals SET bytes = bytes - ? WHERE id = 1;", (freed,))
+
+    def _enforce_cap(self, conn):
+        # Least recently used first, a batch at a time
+        while conn.execute("SELECT bytes FROM totals WHERE id = 1;").fetchone()[0] > self.max_bytes:
+            victims = conn.execute(
+                "SELECT user_id, bytes FROM conversations ORDER BY updated LIMIT 64;"
+            ).fetchall()
+            if not victims:
+                conn.execute("UPDATE totals SET bytes = 0 WHERE id = 1;")
+                break
+            conn.executemany("DELETE FROM conversations WHERE user_id = ?;", [(v[0],) for v in victims])
+            conn.execute("UPDATE totals SET bytes = bytes - ? WHERE id = 1;", (sum(v[1] for v in victims),))
+            self.evictions += len(victims)
+
+    def metrics(self):
+        try:
+            with self.db.reader() as conn:
+                count = conn.execute("SELECT COUNT(*) FROM conversations;").fetchone()[0]
+                stored = conn.execute("SELECT bytes FROM totals WHERE id = 1;").fetchone()[0]
+        except sqlite3.Error:
+            count, stored = None, None
+        return {
+            "conversations": count,
+            "bytes": stored,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+conversations = ConversationStore(
+    Config.CONVERSATION_DB or default_path("reclaim-conversations.sqlite3"),
+    ttl=Config.CONVERSATION_TTL,
+    token_budget=Config.CONVERSATION_TOKEN_BUDGET,
+    summary_tokens=Config.CONVERSATION_SUMMARY_TOKENS,
+    max_bytes=Config.CONVERSATION_MAX_BYTES,
+)
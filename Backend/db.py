@@ -0,0 +1,332 @@
+"""Pooled PostgreSQL connections shared by every route.
+
+Each gunicorn worker gets its own pool. The pool is created lazily on first
+use (and again by the ``post_fork`` hook in gunicorn.py), so connections are
+never opened in the master process and inherited by forked workers.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the wait timeout."""
+
+
+class UserContextCursor(psycopg2.extensions.cursor):
+    """Cursor that sets the RLS user context at the start of each transaction.
+
+    ``set_user_context()`` is transaction-scoped, so it is prepended to the
+    first statement of every transaction and sent in the same batch - no
+    extra round-trip, and nothing survives commit/rollback to leak into the
+    next request that borrows this connection.
+    """
+
+    def execute(self, query, vars=None):
+        conn = self.connection
+        if (conn.rls_user_id is not None
+                and conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+            # int() keeps the prefix free of '%' and safe to inline
+            prefix = f"SELECT set_user_context({int(conn.rls_user_id)}); "
+            if isinstance(query, sql.Composable):
+                query = sql.SQL(prefix) + query
+            elif isinstance(query, bytes):
+                query = prefix.encode() + query
+            else:
+                query = prefix + query
+        return super().execute(query, vars)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers when it was opened and last used."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        # User whose RLS context is applied to each transaction (None = anonymous)
+        self.rls_user_id = None
+        self.cursor_factory = UserContextCursor
+
+
+class ConnectionPool:
+    """Thread-safe pool with validation, max-lifetime recycling and wait timeouts.
+
+    - ``min_size`` connections are opened up front and kept idle.
+    - At most ``max_size`` connections exist at any time; callers wait up to
+      ``timeout`` seconds for one to be returned before ``PoolTimeout``.
+    - Connections older than ``max_lifetime`` seconds are closed on return.
+    - Connections idle longer than ``validate_after`` seconds are checked
+      with ``SELECT 1`` before being handed out.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=3, timeout=5.0,
+                 max_lifetime=1800, validate_after=30):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Stats for /api/metrics
+        self.opened = 0
+        self.recycled = 0
+        self.discarded = 0
+        self.timeouts = 0
+
+        for _ in range(self.min_size):
+            try:
+                self._idle.append(self._connect())
+                self._size += 1
+            except psycopg2.OperationalError as e:
+                # Don't fail worker boot if the DB is briefly unavailable;
+                # connections will be opened on demand instead.
+                logger.warning(f"Could not pre-open pooled connection: {e}")
+                break
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self.dsn)
+        self.opened += 1
+        return conn
+
+    def _expired(self, conn):
+        return self.max_lifetime and time.monotonic() - conn.created_at > self.max_lifetime
+
+    def _is_usable(self, conn):
+        """Cheap local checks first, then a round-trip only if idle for a while."""
+        if conn.closed or self._expired(conn):
+            return False
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - conn.last_used < self.validate_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        # Reserve the slot before releasing the lock to connect
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            # Validate outside the lock so a slow SELECT 1 doesn't block others
+            if self._is_usable(conn):
+                conn.last_used = time.monotonic()
+                return conn
+            self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self.recycled += 1
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, closing it if broken or too old."""
+        if not conn.closed and not discard:
+            status = conn.info.transaction_status
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+        with self._cond:
+            if self._closed or discard or conn.closed or self._expired(conn):
+                self._close_quietly(conn)
+                self._size -= 1
+                if discard or conn.closed:
+                    self.discarded += 1
+                else:
+                    self.recycled += 1
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                self._close_quietly(conn)
+            self._size -= len(self._idle)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "opened": self.opened,
+                "recycled": self.recycled,
+                "discarded": self.discarded,
+                "timeouts": self.timeouts,
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+_max_size = None    # set by init_pool(); defaults to DB_POOL_MAX
+
+
+def _create_pool():
+    global _pool, _pool_pid
+    max_size = _max_size or Config.DB_POOL_MAX
+    _pool = ConnectionPool(
+        Config.db_dsn(),
+        min_size=min(Config.DB_POOL_MIN, max_size),
+        max_size=max_size,
+        timeout=Config.DB_POOL_TIMEOUT,
+        max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+        validate_after=Config.DB_POOL_VALIDATE_AFTER,
+    )
+    _pool_pid = os.getpid()
+    return _pool
+
+
+def init_pool(max_size=None):
+    """(Re)create the pool for the current process.
+
+    Called from gunicorn's ``post_fork`` hook, with a ``max_size`` that fits
+    the worker count under the role's connection limit; anything inherited
+    from the master is dropped without closing, since those sockets belong to it.
+    """
+    global _max_size
+    with _pool_lock:
+        _max_size = max_size
+        return _create_pool()
+
+
+def pool_size_for(workers):
+    """Largest per-worker pool (at most DB_POOL_MAX, at least 1) that keeps
+    ``workers`` pools plus their LISTEN connections under DB_CONNECTION_LIMIT."""
+    fits = Config.DB_CONNECTION_LIMIT // workers - 1
+    return max(1, min(Config.DB_POOL_MAX, fits))
+
+
+def get_pool():
+    """Return this process's pool, creating it on first use after a fork."""
+    pool = _pool
+    if pool is not None and _pool_pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            return _create_pool()
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+@contextmanager
+def get_db_connection(user_id=None):
+    """Borrow a pooled connection for the duration of a ``with`` block.
+
+    Commits on normal exit and rolls back on exception (same as using a
+    psycopg2 connection as a context manager), then returns it to the pool.
+    If ``user_id`` is given, every transaction on the connection runs with
+    that user's RLS context.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    conn.rls_user_id = user_id
+    broken = False
+    try:
+        with conn:
+            yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        conn.rls_user_id = None
+        pool.putconn(conn, discard=broken)
+
+
+@contextmanager
+def savepoint(conn, name="sub_request"):
+    """Run a block inside a SAVEPOINT on a connection that is already borrowed.
+
+    Used when several logical requests share one connection (see /api/batch):
+    an error rolls back only this block, leaving the shared transaction
+    usable for the next one.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SAVEPOINT {name};")
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            with conn.cursor() as cur:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name};")
+        raise
+    else:
+        with conn.cursor() as cur:
+            # The block may have caught a failed statement and carried on;
+            # the savepoint still has to be rolled back before it can go
+            if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name};")
+            cur.execute(f"RELEASE SAVEPOINT {name};")
@@ -1,14 +1,15 @@
 """Gunicorn configuration file for production deployment"""
 
-import multiprocessing
 import os
 
+from config import Config
+
 # Server socket
 bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
 backlog = 2048
 
-# Worker processes
-workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# Worker processes (default: cpu * 2 + 1, capped to fit the database connection limit)
+workers = Config.GUNICORN_WORKERS
 worker_class = "sync"
 worker_connections = 1000
 timeout = 30
@@ -38,6 +39,40 @@ tmp_upload_dir = None
 # Preload app for better performance
 preload_app = True
 
+# Checked once in the master: every worker's pool plus its LISTEN connection
+# has to fit under the reclaim_app connection limit.
+def when_ready(server):
+    from db import pool_size_for
+    size = pool_size_for(server.cfg.workers)
+    if size < Config.DB_POOL_MAX:
+        server.log.warning(
+            f"DB_POOL_MAX={Config.DB_POOL_MAX} with {server.cfg.workers} workers exceeds "
+            f"DB_CONNECTION_LIMIT={Config.DB_CONNECTION_LIMIT}; using pools of {size}"
+        )
+    if server.cfg.workers * (size + 1) > Config.DB_CONNECTION_LIMIT:
+        server.log.warning(
+            f"{server.cfg.workers} workers need {server.cfg.workers * (size + 1)} database connections, "
+            f"over DB_CONNECTION_LIMIT={Config.DB_CONNECTION_LIMIT}; lower GUNICORN_WORKERS"
+        )
+
+# With preload_app the app is imported in the master, so database connections
+# must only be opened after the fork - each worker builds its own pool here.
+def post_fork(server, worker):
+    from db import init_pool, pool_size_for
+    init_pool(max_size=pool_size_for(server.cfg.workers))
+
+
+def worker_exit(server, worker):
+    from db import close_pool
+    close_pool()
+
+
+# Runs in the master after a worker exits, including when it was killed
+# (timeout, OOM) while holding a bcrypt slot.
+def child_exit(server, worker):
+    from passwords import hasher
+    hasher.release_pid(worker.pid)
+
 # Graceful timeout
 graceful_timeout = 30
 
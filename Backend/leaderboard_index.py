@@ -0,0 +1,261 @@
+"""In-process ranked leaderboard with O(log n) rank lookups.
+
+Each worker keeps every active user from ``leaderboard_stats`` in a
+SortedList keyed by ``(-xp, created_at, user_id)`` - the same order as the
+SQL leaderboard - so top-N is a slice and "my rank" is a bisect.
+
+The index is loaded from a snapshot and then kept current from the
+``leaderboard_changes`` NOTIFY channel (see views_and_indexes.sql). Every
+payload carries the row's version, so replaying a change that is already in
+the snapshot is a no-op. A background check compares the top of the index
+with the database and resnapshots on mismatch. Until the first snapshot is
+loaded (or after the listener reconnects) ``is_warm()`` is False and callers
+should fall back to SQL.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+from sortedcontainers import SortedList
+
+from config import Config
+from db import get_db_connection
+from listener import listener
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "leaderboard_changes"
+
+SNAPSHOT_SQL = """
+    SELECT user_id, version, username, xp, level,
+           (EXTRACT(EPOCH FROM created_at) * 1000000)::BIGINT as created_us,
+           completed_challenges, badges_earned, current_streak
+    FROM leaderboard_stats
+    WHERE is_active = true;
+"""
+
+TOP_SQL = """
+    SELECT user_id
+    FROM leaderboard_stats
+    WHERE is_active = true
+    ORDER BY xp DESC, created_at ASC, user_id ASC
+    LIMIT %s;
+"""
+
+
+def _entry_from_row(row):
+    """Map a snapshot row or NOTIFY payload to (key, version, public fields)."""
+    key = (-row['xp'], row['created_us'], row['user_id'])
+    info = {
+        "username": row['username'] or "",
+        "xp": row['xp'] or 0,
+        "level": row['level'] or 1,
+        "completed_challenges": row['completed_challenges'] or 0,
+        "badges_earned": row['badges_earned'] or 0,
+    }
+    return key, row['version'], info
+
+
+class LeaderboardIndex:
+    def __init__(self, check_interval=60, check_size=50):
+        self.check_interval = check_interval
+        self.check_size = check_size
+
+        self._lock = threading.RLock()
+        self._keys = SortedList()
+        self._entries = {}          # user_id -> (key, version, info)
+        self._versions = {}         # user_id -> last version seen (incl. deletions)
+        self._warm = False
+        self._snapshotting = False
+        self._buffer = []           # notifications received during a snapshot
+        self._resync = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+
+        # Metrics
+        self.snapshots = 0
+        self.last_snapshot_ms = None
+        self.changes_applied = 0
+        self.changes_skipped = 0
+        self.checks = 0
+        self.mismatches = 0
+
+    # ----- lifecycle -------------------------------------------------------
+
+    def ensure_started(self):
+        """Start listening and warming in this worker (no-op if already running)."""
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._thread_pid != os.getpid():
+                # Inherited from the master process: start from scratch
+                self._keys = SortedList()
+                self._entries = {}
+                self._versions = {}
+                self._warm = False
+            self._thread = threading.Thread(
+                target=self._run, name="leaderboard-index", daemon=True
+            )
+            self._thread_pid = os.getpid()
+            self._thread.start()
+        # The snapshot is taken once LISTEN is active (see _on_listen)
+        listener.subscribe(CHANNEL, self._on_notify, on_listen=self._on_listen)
+
+    def is_warm(self):
+        return self._warm and self._thread_pid == os.getpid()
+
+    def _on_listen(self):
+        # Anything sent while we weren't listening is lost: serve from SQL
+        # until a fresh snapshot is loaded
+        self._warm = False
+        self._resync.set()
+
+    def _run(self):
+        while True:
+            resync = self._resync.wait(self.check_interval)
+            try:
+                if resync:
+                    self._resync.clear()
+                    self.snapshot()
+                elif self._warm:
+                    self.check_consistency()
+            except Exception as e:
+                logger.error(f"Leaderboard index maintenance failed: {e}", exc_info=True)
+                self._warm = False
+                time.sleep(1)
+                self._resync.set()
+
+    # ----- loading and change application ---------------------------------
+
+    def snapshot(self):
+        """Reload the whole index from the database."""
+        start = time.perf_counter()
+        with self._lock:
+            self._snapshotting = True
+            self._buffer = []
+        try:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(SNAPSHOT_SQL)
+                    columns = [desc[0] for desc in cur.description]
+                    rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+
+            keys = SortedList()
+            entries = {}
+            for row in rows:
+                key, version, info = _entry_from_row(row)
+                keys.add(key)
+                entries[row['user_id']] = (key, version, info)
+
+            with self._lock:
+                self._keys = keys
+                self._entries = entries
+                self._versions = {user_id: entry[1] for user_id, entry in entries.items()}
+                # Replay changes that arrived while the snapshot was running
+                for payload in self._buffer:
+                    self._apply(payload)
+                self._buffer = []
+                self._snapshotting = False
+                self._warm = True
+        finally:
+            with self._lock:
+                self._snapshotting = False
+
+        self.snapshots += 1
+        self.last_snapshot_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(f"Leaderboard index loaded {len(rows)} users in {self.last_snapshot_ms}ms")
+
+    def _on_notify(self, payload):
+        change = json.loads(payload)
+        with self._lock:
+            if self._snapshotting:
+                self._buffer.append(change)
+            else:
+                self._apply(change)
+
+    def _apply(self, change):
+        """Apply one change; callers hold the lock."""
+        user_id = change['user_id']
+        if change['version'] <= self._versions.get(user_id, -1):
+            self.changes_skipped += 1
+            return
+
+        self._versions[user_id] = change['version']
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            self._keys.remove(old[0])
+        if not change.get('deleted') and change.get('is_active', True):
+            key, version, info = _entry_from_row(change)
+            self._keys.add(key)
+            self._entries[user_id] = (key, version, info)
+        self.changes_applied += 1
+
+    # ----- queries ----------------------------------------------------------
+
+    def top(self, limit):
+        """The first ``limit`` leaderboard rows, shaped like the SQL response."""
+        with self._lock:
+            result = []
+            for rank, key in enumerate(self._keys.islice(0, limit), start=1):
+                row = dict(self._entries[key[2]][2])
+                row["rank"] = rank
+                result.append(row)
+            return result
+
+    def key_at(self, rank):
+        """Sort key ``(-xp, created_us, user_id)`` of the row at ``rank``, or None."""
+        with self._lock:
+            if 1 <= rank <= len(self._keys):
+                return self._keys[rank - 1]
+            return None
+
+    def rank(self, user_id):
+        """1-based rank of ``user_id``, or None if not on the leaderboard."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self._keys.index(entry[0]) + 1
+
+    def check_consistency(self):
+        """Compare size and top-N against the database; resnapshot on mismatch."""
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM leaderboard_stats WHERE is_active = true;")
+                db_count = cur.fetchone()[0]
+                cur.execute(TOP_SQL, (self.check_size,))
+                db_top = [row[0] for row in cur.fetchall()]
+
+        with self._lock:
+            index_count = len(self._keys)
+            index_top = [key[2] for key in self._keys.islice(0, self.check_size)]
+
+        self.checks += 1
+        if db_count != index_count or db_top != index_top:
+            self.mismatches += 1
+            logger.warning(
+                f"Leaderboard index out of sync (db={db_count} users, index={index_count}); resnapshotting"
+            )
+            self._resync.set()
+
+    def metrics(self):
+        with self._lock:
+            size = len(self._keys)
+        return {
+            "enabled": Config.LEADERBOARD_INDEX_ENABLED,
+            "warm": self.is_warm(),
+            "size": size,
+            "snapshots": self.snapshots,
+            "last_snapshot_ms": self.last_snapshot_ms,
+            "changes_applied": self.changes_applied,
+            "changes_skipped": self.changes_skipped,
+            "checks": self.checks,
+            "mismatches": self.mismatches,
+        }
+
+
+leaderboard_index = LeaderboardIndex(check_interval=Config.LEADERBOARD_INDEX_CHECK_INTERVAL)
@@ -0,0 +1,148 @@
+"""Per-worker PostgreSQL LISTEN/NOTIFY dispatcher.
+
+One daemon thread per process holds a dedicated (non-pooled) autocommit
+connection, LISTENs on every subscribed channel and calls the registered
+callbacks with each payload. If the connection drops it reconnects with
+backoff; after every (re)LISTEN the subscriber's ``on_listen`` callback runs,
+because notifications sent while we weren't listening are lost and any
+cache built from them must resync.
+"""
+import os
+import time
+import select
+import logging
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationListener:
+    def __init__(self, poll_interval=1.0, max_backoff=30.0):
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._handlers = {}        # channel -> [callback(payload)]
+        self._on_listen = {}       # channel -> [callback()]
+        self._listening = set()    # channels LISTENed on the current connection
+        self._conn = None
+        self._thread = None
+        self._thread_pid = None
+
+        # Metrics
+        self.notifications = 0
+        self.reconnects = 0
+        self.callback_errors = 0
+
+    def subscribe(self, channel, callback, on_listen=None):
+        """Call ``callback(payload)`` for each NOTIFY on ``channel``.
+
+        ``on_listen()`` is called (from the listener thread) once LISTEN is
+        active, and again after every reconnect.
+        """
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(callback)
+            if on_listen is not None:
+                self._on_listen.setdefault(channel, []).append(on_listen)
+        self._ensure_thread()
+
+    def is_connected(self):
+        conn = self._conn
+        return conn is not None and not conn.closed and self._thread_pid == os.getpid()
+
+    def _ensure_thread(self):
+        # Threads don't survive gunicorn's fork, so start one per worker on first use
+        with self._lock:
+            if self._thread is None or self._thread_pid != os.getpid() or not self._thread.is_alive():
+                self._conn = None
+                self._listening = set()
+                self._thread = threading.Thread(
+                    target=self._run, name="pg-listener", daemon=True
+                )
+                self._thread_pid = os.getpid()
+                self._thread.start()
+
+    def _connect(self):
+        conn = psycopg2.connect(**Config.db_dsn())
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def _listen_pending(self):
+        """LISTEN on channels subscribed since the last pass, then notify subscribers."""
+        with self._lock:
+            pending = [ch for ch in self._handlers if ch not in self._listening]
+        if not pending:
+            return
+        with self._conn.cursor() as cur:
+            for channel in pending:
+                # Channel names are our own constants, quote them anyway
+                cur.execute(f'LISTEN "{channel}";')
+        with self._lock:
+            self._listening.update(pending)
+            callbacks = [cb for ch in pending for cb in self._on_listen.get(ch, [])]
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception as e:
+                self.callback_errors += 1
+                logger.error(f"on_listen callback failed: {e}", exc_info=True)
+
+    def _dispatch(self, notify):
+        self.notifications += 1
+        with self._lock:
+            callbacks = list(self._handlers.get(notify.channel, []))
+        for cb in callbacks:
+            try:
+                cb(notify.payload)
+            except Exception as e:
+                self.callback_errors += 1
+                logger.error(f"Notification handler for {notify.channel} failed: {e}", exc_info=True)
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                if self._conn is None or self._conn.closed:
+                    if self._conn is not None:
+                        self.reconnects += 1
+                    self._conn = self._connect()
+                    with self._lock:
+                        self._listening = set()
+                    backoff = 1.0
+
+                self._listen_pending()
+
+                if select.select([self._conn], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                self._conn.poll()
+                while self._conn.notifies:
+                    self._dispatch(self._conn.notifies.pop(0))
+
+            except Exception as e:
+                logger.warning(f"Notification listener error, reconnecting in {backoff:.0f}s: {e}")
+                try:
+                    if self._conn is not None:
+                        self._conn.close()
+                except Exception:
+                    pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def metrics(self):
+        with self._lock:
+            channels = sorted(self._listening)
+        return {
+            "connected": self.is_connected(),
+            "channels": channels,
+            "notifications": self.notifications,
+            "reconnects": self.reconnects,
+            "callback_errors": self.callback_errors,
+        }
+
+
+listener = NotificationListener()
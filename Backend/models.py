@@ -1,14 +1,13 @@
-import psycopg2
 from typing import Optional, Tuple
-from config import Config
+from db import get_db_connection
 
 
 def get_conn():
-    """Open a fresh DB connection using values from Config.
+    """Borrow a pooled DB connection (use it in a ``with`` block).
 
-    We open a connection when needed to keep things simple.
+    The connection goes back to the worker's pool when the block exits.
     """
-    return psycopg2.connect(**Config.db_dsn())
+    return get_db_connection()
 
 
 def user_by_username(username: str) -> Optional[Tuple[int, str, str]]:
@@ -0,0 +1,205 @@
+"""bcrypt hashing with a machine-wide concurrency limit.
+
+Each bcrypt call burns ~250 ms of CPU at the default cost, so a burst of
+logins could otherwise occupy every gunicorn worker. All password work goes
+through a fixed number of slots shared by every worker on the machine:
+
+- at most ``max_concurrent`` hashes run at once across all workers;
+- up to ``queue_limit`` more callers wait, for at most ``queue_timeout`` s;
+- anyone beyond that gets ``PasswordHasherBusy`` immediately (the API
+  answers 503 with Retry-After) instead of tying up a worker.
+
+Slots are leases in a SQLite database on /dev/shm (see shm_db.py), so the
+limit holds with or without ``preload_app``. A lease expires after
+``lease`` seconds, and the gunicorn ``child_exit`` hook drops the leases of
+a worker that died, so slots held by a killed worker can't leak. If the
+store is unavailable, hashing goes ahead without the limit.
+
+Running and waiting callers both block their sync worker, so the defaults
+keep ``max_concurrent + queue_limit`` to half the gunicorn workers (see
+config.py); the rest keep serving check-ins and reads during a login storm.
+"""
+import os
+import time
+import uuid
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+import bcrypt
+
+from config import Config
+from shm_db import SharedSQLite, default_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS leases (
+        id TEXT PRIMARY KEY,
+        pid INTEGER NOT NULL,
+        running INTEGER NOT NULL,
+        created REAL NOT NULL,
+        expires REAL NOT NULL
+    );
+"""
+
+POLL_INTERVAL = 0.005       # first wait for a slot; doubles up to MAX_POLL_INTERVAL
+MAX_POLL_INTERVAL = 0.05
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when no hashing slot is available (queue full or wait timed out)."""
+
+
+class PasswordHasher:
+    def __init__(self, path, rounds=12, max_concurrent=2, queue_limit=8, queue_timeout=2.0, lease=10.0):
+        self.db = SharedSQLite(path, SCHEMA)
+        self.rounds = rounds
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue_limit = max(0, queue_limit)
+        self.queue_timeout = queue_timeout
+        self.lease = lease
+
+        # Metrics (per worker)
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self.errors = 0
+
+    def _admit(self):
+        """Join the queue; returns the lease id."""
+        now = time.time()
+        lease_id = uuid.uuid4().hex
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE expires < ?;", (now,))
+            held = conn.execute("SELECT COUNT(*) FROM leases;").fetchone()[0]
+            if held >= self.max_concurrent + self.queue_limit:
+                self.rejected += 1
+                raise PasswordHasherBusy("Password hashing queue is full")
+            conn.execute(
+                "INSERT INTO leases (id, pid, running, created, expires) VALUES (?, ?, 0, ?, ?);",
+                (lease_id, os.getpid(), now, now + self.queue_timeout + self.lease)
+            )
+        return lease_id
+
+    def _try_run(self, lease_id):
+        """Take a running slot if one is free and no earlier waiter is owed it."""
+        now = time.time()
+        try:
+            with self.db.transaction() as conn:
+                running = conn.execute(
+                    "SELECT COUNT(*) FROM leases WHERE running = 1 AND expires >= ?;", (now,)
+                ).fetchone()[0]
+                ahead = conn.execute(
+                    "SELECT COUNT(*) FROM leases WHERE running = 0 AND expires >= ? "
+                    "AND created < (SELECT created FROM leases WHERE id = ?);",
+                    (now, lease_id)
+                ).fetchone()[0]
+                if running + ahead >= self.max_concurrent:
+                    return False
+                conn.execute(
+                    "UPDATE leases SET running = 1, expires = ? WHERE id = ?;", (now + self.lease, lease_id)
+                )
+                return True
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Password hashing slots unavailable, not limiting: {e}")
+            return True
+
+    def _release(self, lease_id):
+        try:
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM leases WHERE id = ?;", (lease_id,))
+        except sqlite3.Error as e:
+            # The lease expires on its own
+            self.errors += 1
+            logger.warning(f"Could not release password hashing slot: {e}")
+
+    def release_pid(self, pid):
+        """Drop the leases of a worker that exited (gunicorn ``child_exit``)."""
+        try:
+            with self.db.transaction() as conn:
+                freed = conn.execute("DELETE FROM leases WHERE pid = ?;", (pid,)).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Could not release password hashing slots of worker {pid}: {e}")
+            return
+        if freed:
+            logger.warning(f"Released {freed} password hashing slot(s) held by exited worker {pid}")
+
+    @contextmanager
+    def _slot(self):
+        try:
+            lease_id = self._admit()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Password hashing slots unavailable, not limiting: {e}")
+            yield
+            return
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            interval = POLL_INTERVAL
+            while not self._try_run(lease_id):
+                if time.monotonic() + interval > deadline:
+                    self.timeouts += 1
+                    raise PasswordHasherBusy(f"No password hashing slot within {self.queue_timeout}s")
+                time.sleep(interval)
+                interval = min(interval * 2, MAX_POLL_INTERVAL)
+            yield
+        finally:
+            self._release(lease_id)
+
+    def hash(self, password):
+        """bcrypt hash of ``password`` at the configured cost, as a str."""
+        with self._slot():
+            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds))
+        self.hashed += 1
+        return hashed.decode('utf-8')
+
+    def verify(self, password, hashed):
+        with self._slot():
+            ok = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        self.verified += 1
+        return ok
+
+    def needs_rehash(self, hashed):
+        """True if ``hashed`` was made with a different cost than configured."""
+        try:
+            # $2b$12$<salt+hash>
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def metrics(self):
+        try:
+            with self.db.reader() as conn:
+                running, waiting = conn.execute(
+                    "SELECT COALESCE(SUM(running), 0), COUNT(*) - COALESCE(SUM(running), 0) "
+                    "FROM leases WHERE expires >= ?;", (time.time(),)
+                ).fetchone()
+        except sqlite3.Error:
+            running, waiting = None, None
+        return {
+            "rounds": self.rounds,
+            "max_concurrent": self.max_concurrent,
+            "queue_limit": self.queue_limit,
+            "running": running,
+            "waiting": waiting,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rehashed": self.rehashed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+
+hasher = PasswordHasher(
+    Config.BCRYPT_SLOT_DB or default_path("reclaim-bcrypt-slots.sqlite3"),
+    rounds=Config.BCRYPT_ROUNDS,
+    max_concurrent=Config.BCRYPT_MAX_CONCURRENT,
+    queue_limit=Config.BCRYPT_QUEUE_LIMIT,
+    queue_timeout=Config.BCRYPT_QUEUE_TIMEOUT,
+    lease=Config.BCRYPT_SLOT_LEASE,
+)
@@ -0,0 +1,124 @@
+"""Token-bucket rate limiting shared by all gunicorn workers.
+
+Buckets live in a small SQLite database on ``/dev/shm`` (tmpfs), so every
+worker on the machine sees the same counts without a network hop. Each
+check is one ``BEGIN IMMEDIATE`` transaction: refill the buckets involved
+by elapsed time, and consume a token from each only if all of them have one.
+
+Used in front of /api/login, /api/signup and the signup availability check,
+so floods are turned away before any database lookup or bcrypt call. If the
+store is unavailable the limiter fails open and logs a warning.
+"""
+import time
+import logging
+import sqlite3
+
+from config import Config
+from shm_db import SharedSQLite, default_path
+
+logger = logging.getLogger(__name__)
+
+
+class Rule:
+    """``capacity`` requests per ``period`` seconds, refilled continuously."""
+
+    def __init__(self, name, capacity, period):
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / period
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS buckets (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+"""
+
+
+class RateLimiter:
+    def __init__(self, path, cleanup_every=500):
+        self.db = SharedSQLite(path, SCHEMA)
+        self.cleanup_every = cleanup_every
+        self._calls = 0
+
+        # Metrics (per worker); shared totals are in the counters table
+        self.errors = 0
+
+    def hit(self, checks):
+        """Consume one token from each ``(key, rule)`` bucket.
+
+        Returns 0 if allowed, otherwise the number of seconds until the
+        request would be allowed (nothing is consumed in that case).
+        """
+        if not Config.RATE_LIMIT_ENABLED:
+            return 0
+        now = time.time()
+        try:
+            with self.db.transaction() as conn:
+                retry_after = 0
+                limited_by = None
+                levels = []
+                for key, rule in checks:
+                    row = conn.execute(
+                        "SELECT tokens, updated FROM buckets WHERE key = ?;", (key,)
+                    ).fetchone()
+                    if row is None:
+                        tokens = rule.capacity
+                    else:
+                        tokens = min(rule.capacity, row[0] + (now - row[1]) * rule.rate)
+                    levels.append((key, tokens))
+                    if tokens < 1:
+                        wait = (1 - tokens) / rule.rate
+                        if wait > retry_after:
+                            retry_after, limited_by = wait, rule.name
+
+                if limited_by is None:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?);",
+                        [(key, tokens - 1, now) for key, tokens in levels],
+                    )
+                self._count(conn, "allowed" if limited_by is None else f"limited:{limited_by}")
+
+                self._calls += 1
+                if self._calls % self.cleanup_every == 0:
+                    # Buckets untouched for an hour are full again under any of our rules
+                    conn.execute("DELETE FROM buckets WHERE updated < ?;", (now - 3600,))
+            return retry_after
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            return 0
+
+    def _count(self, conn, name):
+        conn.execute("""
+            INSERT INTO counters (name, value) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1;
+        """, (name,))
+
+    def metrics(self):
+        try:
+            with self.db.reader() as conn:
+                counters = dict(conn.execute("SELECT name, value FROM counters;").fetchall())
+                buckets = conn.execute("SELECT COUNT(*) FROM buckets;").fetchone()[0]
+        except sqlite3.Error:
+            counters, buckets = {}, None
+        return {
+            "enabled": Config.RATE_LIMIT_ENABLED,
+            "buckets": buckets,
+            "counters": counters,
+            "errors": self.errors,
+        }
+
+
+LOGIN_PER_IP = Rule("login_ip", Config.RATE_LIMIT_LOGIN_IP, 60)
+LOGIN_PER_USER = Rule("login_user", Config.RATE_LIMIT_LOGIN_USER, 60)
+SIGNUP_PER_IP = Rule("signup_ip", Config.RATE_LIMIT_SIGNUP_IP, 3600)
+AVAILABILITY_PER_IP = Rule("availability_ip", Config.RATE_LIMIT_AVAILABILITY_IP, 60)
+
+limiter = RateLimiter(Config.RATE_LIMIT_DB or default_path("reclaim-ratelimit.sqlite3"))
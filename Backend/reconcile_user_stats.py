@@ -0,0 +1,59 @@
+"""Repair drift in the trigger-maintained user_stats table
+
+Recomputes every user's counters from user_challenges, user_badges and
+streaks and rewrites the rows that differ. Safe to run at any time (e.g.
+nightly from cron); it prints how many rows were repaired.
+
+Usage: python reconcile_user_stats.py
+"""
+import os
+import sys
+from dotenv import load_dotenv
+import psycopg2
+
+# Load environment variables
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(BASE_DIR, 'database.env'))
+
+# Database configuration - use postgres superuser so RLS doesn't get in the way
+DB_NAME = os.getenv("DB_NAME", "reclaim")
+DB_USER = "postgres"
+DB_PASSWORD = os.getenv("DB_PASSWORD", "")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+
+
+def reconcile():
+    try:
+        conn = psycopg2.connect(
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+        )
+        
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT reconcile_user_stats();")
+                repaired = cur.fetchone()[0]
+                cur.execute("SELECT COUNT(*) FROM user_stats;")
+                total = cur.fetchone()[0]
+        conn.close()
+        
+        if repaired:
+            print(f"Repaired {repaired} of {total} user_stats rows")
+        else:
+            print(f"All {total} user_stats rows are consistent")
+        return True
+        
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    print("="*50)
+    print("Reconciling user_stats...")
+    print("="*50)
+    success = reconcile()
+    sys.exit(0 if success else 1)
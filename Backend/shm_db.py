@@ -0,0 +1,66 @@
+"""Small SQLite databases on /dev/shm shared by all gunicorn workers.
+
+Used for state that must be consistent across the workers on one machine
+but doesn't belong in PostgreSQL (rate-limit buckets, AI conversation
+history). tmpfs keeps it in memory; WAL lets readers run alongside the
+single writer, and writes take the lock up front (``BEGIN IMMEDIATE``) so
+read-modify-write sequences are atomic across processes.
+"""
+import os
+import logging
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def default_path(filename):
+    # tmpfs when available (Linux), otherwise the temp directory
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, filename)
+
+
+class SharedSQLite:
+    def __init__(self, path, schema, timeout=1.0):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=OFF;")  # tmpfs: nothing to fsync to
+        conn.executescript(self.schema)
+        return conn
+
+    def _get_conn(self):
+        # SQLite connections must not be shared across fork
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = self._connect()
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction holding the database lock for the whole block."""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK;")
+                raise
+            conn.execute("COMMIT;")
+
+    @contextmanager
+    def reader(self):
+        """Connection for reads (each statement sees a consistent snapshot)."""
+        with self._lock:
+            yield self._get_conn()
@@ -130,6 +130,199 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Daily check-in for a challenge
+-- =====================================================
+-- Does the whole check-in in one round-trip: participation check, duplicate
+-- check, daily log, progress and streak update. The user_challenges row is
+-- locked FOR UPDATE so concurrent check-ins (double-taps) are serialised.
+-- Expected failures are returned as JSON ('success' = false with an 'error'
+-- code) rather than raised, so the caller doesn't have to parse messages.
+CREATE OR REPLACE FUNCTION checkin_challenge(
+    p_user_id INTEGER,
+    p_challenge_id INTEGER
+)
+RETURNS JSON AS $$
+DECLARE
+    v_user_challenge_id INTEGER;
+    v_log_id INTEGER;
+    v_progress_days INTEGER;
+    v_current_streak INTEGER;
+    v_longest_streak INTEGER;
+    v_today DATE;
+BEGIN
+    -- Validate input parameters
+    IF p_user_id IS NULL OR p_challenge_id IS NULL THEN
+        RAISE EXCEPTION 'User ID and Challenge ID cannot be null';
+    END IF;
+    
+    v_today := CURRENT_DATE;
+    
+    -- Lock the participation row for the rest of the transaction
+    SELECT id INTO v_user_challenge_id
+    FROM user_challenges 
+    WHERE user_id = p_user_id 
+    AND challenge_id = p_challenge_id 
+    AND status = 'active'
+    FOR UPDATE;
+    
+    IF NOT FOUND THEN
+        RETURN json_build_object(
+            'success', false,
+            'error', 'not_participating',
+            'message', 'You are not participating in this challenge or it''s not active'
+        );
+    END IF;
+    
+    -- Insert today's log; the unique constraint doubles as the duplicate check
+    INSERT INTO daily_logs (user_id, challenge_id, log_date, completed)
+    VALUES (p_user_id, p_challenge_id, v_today, TRUE)
+    ON CONFLICT (user_id, challenge_id, log_date) DO NOTHING
+    RETURNING id INTO v_log_id;
+    
+    IF v_log_id IS NULL THEN
+        RETURN json_build_object(
+            'success', false,
+            'error', 'already_checked_in',
+            'message', 'You have already checked in for this challenge today'
+        );
+    END IF;
+    
+    -- Update progress
+    UPDATE user_challenges 
+    SET progress_days = progress_days + 1
+    WHERE id = v_user_challenge_id
+    RETURNING progress_days INTO v_progress_days;
+    
+    -- Create or update the streak: consecutive day increments, otherwise reset to 1
+    INSERT INTO streaks (user_id, challenge_id, current_streak, longest_streak, last_active)
+    VALUES (p_user_id, p_challenge_id, 1, 1, v_today)
+    ON CONFLICT (user_id, challenge_id) DO UPDATE
+    SET 
+        current_streak = CASE WHEN streaks.last_active = v_today - 1
+                              THEN streaks.current_streak + 1 ELSE 1 END,
+        longest_streak = GREATEST(streaks.longest_streak,
+                                  CASE WHEN streaks.last_active = v_today - 1
+                                       THEN streaks.current_streak + 1 ELSE 1 END),
+        last_active = v_today
+    RETURNING current_streak, longest_streak INTO v_current_streak, v_longest_streak;
+    
+    RETURN json_build_object(
+        'success', true,
+        'user_challenge_id', v_user_challenge_id,
+        'log_id', v_log_id,
+        'progress_days', v_progress_days,
+        'current_streak', v_current_streak,
+        'longest_streak', v_longest_streak
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Check in to several challenges at once (set-based)
+-- =====================================================
+-- Same rules as checkin_challenge(), applied to a whole list in one
+-- statement: one locking read, one INSERT into daily_logs, one UPDATE of
+-- user_challenges and one streak upsert, however many challenges are given.
+-- Returns a JSON array with one result per distinct challenge id, in the
+-- order given.
+CREATE OR REPLACE FUNCTION checkin_challenges(
+    p_user_id INTEGER,
+    p_challenge_ids INTEGER[]
+)
+RETURNS JSON AS $$
+DECLARE
+    v_today DATE;
+    v_result JSON;
+BEGIN
+    -- Validate input parameters
+    IF p_user_id IS NULL OR p_challenge_ids IS NULL THEN
+        RAISE EXCEPTION 'User ID and Challenge IDs cannot be null';
+    END IF;
+    
+    v_today := CURRENT_DATE;
+    
+    WITH requested AS (
+        SELECT challenge_id, MIN(ord) as ord
+        FROM unnest(p_challenge_ids) WITH ORDINALITY as r(challenge_id, ord)
+        WHERE challenge_id IS NOT NULL
+        GROUP BY challenge_id
+    ),
+    -- Lock the participation rows (in id order, like concurrent single check-ins)
+    participating AS (
+        SELECT uc.id, uc.challenge_id
+        FROM user_challenges uc
+        JOIN requested r ON r.challenge_id = uc.challenge_id
+        WHERE uc.user_id = p_user_id AND uc.status = 'active'
+        ORDER BY uc.id
+        FOR UPDATE OF uc
+    ),
+    -- The unique constraint doubles as the duplicate check
+    logged AS (
+        INSERT INTO daily_logs (user_id, challenge_id, log_date, completed)
+        SELECT p_user_id, challenge_id, v_today, TRUE
+        FROM participating
+        ORDER BY challenge_id
+        ON CONFLICT (user_id, challenge_id, log_date) DO NOTHING
+        RETURNING id, challenge_id
+    ),
+    progressed AS (
+        UPDATE user_challenges uc
+        SET progress_days = uc.progress_days + 1
+        FROM participating p
+        JOIN logged l ON l.challenge_id = p.challenge_id
+        WHERE uc.id = p.id
+        RETURNING uc.id, uc.challenge_id, uc.progress_days
+    ),
+    streaked AS (
+        INSERT INTO streaks (user_id, challenge_id, current_streak, longest_streak, last_active)
+        SELECT p_user_id, challenge_id, 1, 1, v_today
+        FROM logged
+        ORDER BY challenge_id
+        ON CONFLICT (user_id, challenge_id) DO UPDATE
+        SET 
+            current_streak = CASE WHEN streaks.last_active = v_today - 1
+                                  THEN streaks.current_streak + 1 ELSE 1 END,
+            longest_streak = GREATEST(streaks.longest_streak,
+                                      CASE WHEN streaks.last_active = v_today - 1
+                                           THEN streaks.current_streak + 1 ELSE 1 END),
+            last_active = v_today
+        RETURNING challenge_id, current_streak, longest_streak
+    )
+    SELECT json_agg(
+        CASE
+            WHEN l.id IS NOT NULL THEN json_build_object(
+                'challenge_id', r.challenge_id,
+                'success', true,
+                'user_challenge_id', pr.id,
+                'log_id', l.id,
+                'progress_days', pr.progress_days,
+                'current_streak', s.current_streak,
+                'longest_streak', s.longest_streak
+            )
+            WHEN p.id IS NULL THEN json_build_object(
+                'challenge_id', r.challenge_id,
+                'success', false,
+                'error', 'not_participating',
+                'message', 'You are not participating in this challenge or it''s not active'
+            )
+            ELSE json_build_object(
+                'challenge_id', r.challenge_id,
+                'success', false,
+                'error', 'already_checked_in',
+                'message', 'You have already checked in for this challenge today'
+            )
+        END
+        ORDER BY r.ord
+    ) INTO v_result
+    FROM requested r
+    LEFT JOIN participating p ON p.challenge_id = r.challenge_id
+    LEFT JOIN logged l ON l.challenge_id = r.challenge_id
+    LEFT JOIN progressed pr ON pr.challenge_id = r.challenge_id
+    LEFT JOIN streaked s ON s.challenge_id = r.challenge_id;
+    
+    RETURN COALESCE(v_result, '[]'::JSON);
+END;
+$$ LANGUAGE plpgsql;
+
 CREATE OR REPLACE FUNCTION create_user(
     p_username TEXT,
     p_password_hash TEXT,
@@ -139,71 +332,98 @@ CREATE OR REPLACE FUNCTION create_user(
 )
 RETURNS JSON AS $$
 DECLARE
-    v_user_id INTEGER;
-    v_result JSON;
+    v_user users%ROWTYPE;
 BEGIN
-    -- Validate required parameters
+    -- Validation and duplicate failures are returned (success = false, with
+    -- an 'error' code) rather than raised, so callers never parse messages
     IF p_username IS NULL OR p_password_hash IS NULL OR p_email IS NULL THEN
-        RAISE EXCEPTION 'Username, password_hash, and email are required';
+        RETURN json_build_object('success', false, 'error', 'invalid',
+            'message', 'Username, password and email are required');
     END IF;
     
     -- Validate username length
     IF LENGTH(p_username) < 3 THEN
-        RAISE EXCEPTION 'Username must be at least 3 characters long';
+        RETURN json_build_object('success', false, 'error', 'invalid',
+            'message', 'Username must be at least 3 characters long');
     END IF;
     
     -- Validate email format (basic check)
     IF p_email !~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$' THEN
-        RAISE EXCEPTION 'Invalid email format';
+        RETURN json_build_object('success', false, 'error', 'invalid',
+            'message', 'Invalid email format');
     END IF;
     
-    BEGIN
-        -- Insert new user
-        -- SECURITY DEFINER allows this to bypass RLS when creating users
-        INSERT INTO users (username, password_hash, email, first_name, last_name)
-        VALUES (p_username, p_password_hash, p_email, p_first_name, p_last_name)
-        RETURNING id INTO v_user_id;
-        
-        -- Create result JSON
-        v_result := json_build_object(
-            'success', true,
-            'user_id', v_user_id,
-            'username', p_username,
-            'message', 'User created successfully'
-        );
-        
-        RETURN v_result;
-        
-    EXCEPTION
-        WHEN unique_violation THEN
-            -- Handle unique constraint violations
-            IF SQLERRM LIKE '%username%' OR SQLERRM LIKE '%users_username_key%' THEN
-                RAISE EXCEPTION 'Username already exists: %', p_username;
-            ELSIF SQLERRM LIKE '%email%' OR SQLERRM LIKE '%users_email_key%' THEN
-                RAISE EXCEPTION 'Email already exists: %', p_email;
-            ELSE
-                RAISE EXCEPTION 'User with this information already exists';
-            END IF;
-        WHEN check_violation THEN
-            -- Handle check constraint violations
-            RAISE EXCEPTION 'Invalid user data: %', SQLERRM;
-        WHEN OTHERS THEN
-            -- Handle any other errors
-            RAISE EXCEPTION 'Error creating user: %', SQLERRM;
-    END;
+    -- Insert new user; a taken username or email inserts nothing
+    -- SECURITY DEFINER allows this to bypass RLS when creating users
+    INSERT INTO users (username, password_hash, email, first_name, last_name)
+    VALUES (p_username, p_password_hash, p_email, p_first_name, p_last_name)
+    ON CONFLICT DO NOTHING
+    RETURNING * INTO v_user;
+    
+    IF v_user.id IS NULL THEN
+        IF EXISTS (SELECT 1 FROM users WHERE username = p_username) THEN
+            RETURN json_build_object('success', false, 'error', 'username_taken',
+                'message', 'Username already exists');
+        END IF;
+        RETURN json_build_object('success', false, 'error', 'email_taken',
+            'message', 'Email already exists');
+    END IF;
+    
+    -- Everything the signup response needs, so it takes one round trip
+    RETURN json_build_object(
+        'success', true,
+        'user_id', v_user.id,
+        'username', v_user.username,
+        'email', v_user.email,
+        'first_name', v_user.first_name,
+        'last_name', v_user.last_name,
+        'created_at', v_user.created_at,
+        'message', 'User created successfully'
+    );
 END;
 $$ LANGUAGE plpgsql
 SECURITY DEFINER
 SET search_path = public;
 
+-- Every username and email hash, for warming the signup availability filter
+-- (SECURITY DEFINER: RLS only lets reclaim_app see the current user's row,
+-- so emails leave the database only as SHA-256 hex of the lowercased address)
+CREATE OR REPLACE FUNCTION user_identities()
+RETURNS TABLE (username TEXT, email_hash TEXT) AS $$
+    SELECT u.username::TEXT,
+           encode(sha256(convert_to(lower(u.email), 'UTF8')), 'hex')
+    FROM users u;
+$$ LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public;
+
+-- Authoritative check behind the availability filter; NULL arguments are skipped
+CREATE OR REPLACE FUNCTION identity_taken(p_username TEXT, p_email TEXT)
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'username', p_username IS NOT NULL
+            AND EXISTS (SELECT 1 FROM users u WHERE u.username = p_username),
+        'email', p_email IS NOT NULL
+            AND EXISTS (SELECT 1 FROM users u WHERE u.email = lower(p_email))
+    );
+$$ LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public;
+
 
 CREATE OR REPLACE FUNCTION get_user_stats(p_user_id INTEGER)
 RETURNS JSON AS $$
 DECLARE
     v_user users%ROWTYPE;
-    v_total_challenges INTEGER;
-    v_completed_challenges INTEGER;
-    v_total_badges INTEGER;
+    v_total_challenges INTEGER := 0;
+    v_active_challenges INTEGER := 0;
+    v_completed_challenges INTEGER := 0;
+    v_total_badges INTEGER := 0;
+    v_current_streak INTEGER := 0;
+    v_longest_streak INTEGER := 0;
+    v_recent_activity INTEGER;
     v_result JSON;
 BEGIN
     -- Get user information
@@ -213,19 +433,20 @@ BEGIN
         RAISE EXCEPTION 'User not found: %', p_user_id;
     END IF;
     
-    -- Get challenge statistics
-    SELECT COUNT(*) INTO v_total_challenges
-    FROM user_challenges 
+    -- Challenge, badge and streak counters (maintained by triggers)
+    SELECT total_challenges, active_challenges, completed_challenges,
+           badges_earned, current_streak, longest_streak
+    INTO v_total_challenges, v_active_challenges, v_completed_challenges,
+         v_total_badges, v_current_streak, v_longest_streak
+    FROM user_stats 
     WHERE user_id = p_user_id;
     
-    SELECT COUNT(*) INTO v_completed_challenges
-    FROM user_challenges 
-    WHERE user_id = p_user_id AND status = 'completed';
-    
-    -- Get badge count
-    SELECT COUNT(*) INTO v_total_badges
-    FROM user_badges 
-    WHERE user_id = p_user_id;
+    -- Completed check-ins in the last 7 days
+    SELECT COUNT(*) INTO v_recent_activity
+    FROM daily_logs
+    WHERE user_id = p_user_id
+    AND log_date >= CURRENT_DATE - INTERVAL '7 days'
+    AND completed = true;
     
     -- Build result JSON
     v_result := json_build_object(
@@ -236,9 +457,13 @@ BEGIN
         'last_name', v_user.last_name,
         'xp', v_user.xp,
         'level', v_user.level,
-        'total_challenges', v_total_challenges,
-        'completed_challenges', v_completed_challenges,
-        'total_badges', v_total_badges,
+        'total_challenges', COALESCE(v_total_challenges, 0),
+        'active_challenges', COALESCE(v_active_challenges, 0),
+        'completed_challenges', COALESCE(v_completed_challenges, 0),
+        'total_badges', COALESCE(v_total_badges, 0),
+        'current_streak', COALESCE(v_current_streak, 0),
+        'longest_streak', COALESCE(v_longest_streak, 0),
+        'recent_activity', v_recent_activity,
         'created_at', v_user.created_at,
         'last_active', v_user.last_active
     );
@@ -247,5 +472,197 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- A user's active challenges, as served by /api/challenges/active
+-- =====================================================
+-- One set-based query: streaks and today's log are LEFT JOINed instead of
+-- looked up per challenge. Also the dashboard's active_challenges section.
+CREATE OR REPLACE FUNCTION get_active_challenges(p_user_id INTEGER)
+RETURNS JSON AS $$
+BEGIN
+    RETURN COALESCE((
+        SELECT json_agg(json_build_object(
+            'user_challenge_id', uc.id,
+            'challenge_id', c.id,
+            'title', c.title,
+            'description', c.description,
+            'difficulty', c.difficulty,
+            'xp_reward', c.xp_reward,
+            'progress_days', uc.progress_days,
+            'total_days', c.duration_days,
+            'progress_percentage', CASE WHEN c.duration_days > 0
+                THEN ROUND(uc.progress_days::NUMERIC / c.duration_days * 100, 1)
+                ELSE 0 END,
+            'started_at', uc.started_at,
+            'checked_in_today', dl.id IS NOT NULL,
+            'current_streak', COALESCE(s.current_streak, 0),
+            'longest_streak', COALESCE(s.longest_streak, 0),
+            'category', c.category
+        ) ORDER BY uc.started_at DESC)
+        FROM user_challenges uc
+        JOIN challenges c ON uc.challenge_id = c.id
+        LEFT JOIN streaks s
+               ON s.user_id = uc.user_id AND s.challenge_id = uc.challenge_id
+        LEFT JOIN daily_logs dl
+               ON dl.user_id = uc.user_id AND dl.challenge_id = uc.challenge_id
+              AND dl.log_date = CURRENT_DATE
+        WHERE uc.user_id = p_user_id AND uc.status = 'active'
+    ), '[]'::JSON);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Activity analytics, as served by /api/analytics
+-- =====================================================
+-- One bucket per day/week/month over the last p_days days (empty buckets
+-- included) from daily_activity_rollup, plus totals. Day buckets also get
+-- the dashboard charts' weeklyActivity (the last 7 days). Also the
+-- dashboard's analytics section (with the defaults: 7 days by day).
+CREATE OR REPLACE FUNCTION get_analytics(
+    p_user_id INTEGER,
+    p_days INTEGER DEFAULT 7,
+    p_bucket TEXT DEFAULT 'day'
+)
+RETURNS JSON AS $$
+DECLARE
+    v_from DATE := CURRENT_DATE - (p_days - 1);
+    v_step INTERVAL;
+    v_activity JSON;
+    v_totals JSON;
+    v_weekly JSON;
+    v_result JSONB;
+BEGIN
+    v_step := CASE p_bucket
+        WHEN 'day' THEN INTERVAL '1 day'
+        WHEN 'week' THEN INTERVAL '1 week'
+        WHEN 'month' THEN INTERVAL '1 month'
+    END;
+    IF v_step IS NULL OR p_days < 1 THEN
+        RAISE EXCEPTION 'Invalid analytics range % or bucket %', p_days, p_bucket;
+    END IF;
+    
+    WITH buckets AS (
+        SELECT 
+            GREATEST(b.bucket_start::DATE, v_from) as start,
+            LOWER(LEFT(TO_CHAR(b.bucket_start, 'Dy'), 3)) as day_name,
+            COALESCE(SUM(r.checkins), 0) as checkins,
+            COALESCE(SUM(r.completions), 0) as completed,
+            COALESCE(SUM(r.mood_terrible), 0) as terrible,
+            COALESCE(SUM(r.mood_bad), 0) as bad,
+            COALESCE(SUM(r.mood_okay), 0) as okay,
+            COALESCE(SUM(r.mood_good), 0) as good,
+            COALESCE(SUM(r.mood_excellent), 0) as excellent
+        FROM generate_series(
+            date_trunc(p_bucket, v_from::TIMESTAMP),
+            CURRENT_DATE::TIMESTAMP,
+            v_step
+        ) as b(bucket_start)
+        LEFT JOIN daily_activity_rollup r 
+            ON r.user_id = p_user_id
+            AND r.day >= GREATEST(b.bucket_start::DATE, v_from)
+            AND r.day < b.bucket_start + v_step
+        GROUP BY b.bucket_start
+    )
+    SELECT
+        json_agg(json_build_object(
+            'start', start,
+            'day', day_name,
+            'checkins', checkins,
+            'completed', completed,
+            'moods', json_build_object(
+                'terrible', terrible, 'bad', bad, 'okay', okay,
+                'good', good, 'excellent', excellent
+            )
+        ) ORDER BY start),
+        json_build_object(
+            'checkins', COALESCE(SUM(checkins), 0),
+            'completed', COALESCE(SUM(completed), 0),
+            'moods', json_build_object(
+                'terrible', COALESCE(SUM(terrible), 0), 'bad', COALESCE(SUM(bad), 0),
+                'okay', COALESCE(SUM(okay), 0), 'good', COALESCE(SUM(good), 0),
+                'excellent', COALESCE(SUM(excellent), 0)
+            )
+        ),
+        json_agg(json_build_object(
+            'day', day_name,
+            'checkins', checkins,
+            'completed', completed
+        ) ORDER BY start) FILTER (WHERE start > CURRENT_DATE - 7)
+    INTO v_activity, v_totals, v_weekly
+    FROM buckets;
+    
+    v_result := jsonb_build_object(
+        'range', p_days,
+        'bucket', p_bucket,
+        'activity', COALESCE(v_activity, '[]'::JSON),
+        'totals', v_totals
+    );
+    IF p_bucket = 'day' THEN
+        -- Shape used by the dashboard charts
+        v_result := v_result || jsonb_build_object('weeklyActivity', COALESCE(v_weekly, '[]'::JSON));
+    END IF;
+    
+    RETURN v_result::JSON;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Everything the dashboard renders, in one call
+-- =====================================================
+-- Sections: profile, active_challenges, analytics, badges, settings. Each
+-- has the same shape as the matching endpoint's payload, built by the same
+-- function where there is one (analytics with its defaults: 7 days by day).
+-- Pass p_fields to build only some of them (NULL = all). Runs with the
+-- caller's RLS context.
+CREATE OR REPLACE FUNCTION get_dashboard(
+    p_user_id INTEGER,
+    p_fields TEXT[] DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_result JSONB := '{}'::JSONB;
+BEGIN
+    IF p_fields IS NULL OR 'profile' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('profile', get_user_stats(p_user_id));
+    END IF;
+    
+    IF p_fields IS NULL OR 'active_challenges' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('active_challenges', get_active_challenges(p_user_id));
+    END IF;
+    
+    IF p_fields IS NULL OR 'analytics' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('analytics', get_analytics(p_user_id));
+    END IF;
+    
+    IF p_fields IS NULL OR 'badges' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('badges', COALESCE((
+            SELECT json_agg(json_build_object(
+                'id', b.id,
+                'name', b.name,
+                'description', b.description,
+                'icon', b.icon,
+                'category', b.category,
+                'earned_at', ub.earned_at
+            ) ORDER BY ub.earned_at DESC)
+            FROM user_badges ub
+            JOIN badges b ON ub.badge_id = b.id
+            WHERE ub.user_id = p_user_id
+        ), '[]'::JSON));
+    END IF;
+    
+    IF p_fields IS NULL OR 'settings' = ANY(p_fields) THEN
+        -- Defaults when the user has never saved settings
+        v_result := v_result || jsonb_build_object('settings', COALESCE((
+            SELECT json_build_object(
+                'notifications', notifications,
+                'email_updates', email_updates,
+                'show_badges', show_badges
+            )
+            FROM user_settings
+            WHERE user_id = p_user_id
+        ), json_build_object('notifications', true, 'email_updates', true, 'show_badges', true)));
+    END IF;
+    
+    RETURN v_result::JSON;
+END;
+$$ LANGUAGE plpgsql;
+
 
 -- Note: set_user_context and clear_user_context are defined in roles_and_grants.sql
\ No newline at end of file
@@ -0,0 +1,84 @@
+-- Migration: Per-user activity bitmaps for the profile heatmap
+-- Run this if your database already exists (same definitions as
+-- views_and_indexes.sql and roles_and_grants.sql)
+-- Requires migration_daily_activity_rollup.sql.
+
+DROP TRIGGER IF EXISTS trigger_sync_activity_bitmap ON daily_activity_rollup;
+DROP TABLE IF EXISTS activity_bitmaps;
+
+-- Activity bitmaps: one bit per day per user per year
+-- =====================================================
+-- Bit (day of year - 1) is set when the user completed at least one
+-- check-in that day, stored LSB-first in 46 bytes (368 bits >= 366 days), so
+-- a year-long heatmap is one or two primary-key reads. Kept in step with
+-- daily_activity_rollup, which is itself maintained from daily_logs.
+CREATE TABLE activity_bitmaps (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year SMALLINT NOT NULL,
+    days BYTEA NOT NULL DEFAULT decode(repeat('00', 46), 'hex'),
+    PRIMARY KEY (user_id, year)
+);
+
+-- Activity bitmap maintenance trigger
+-- =====================================================
+-- A day's bit follows whether its rollup row has any completions
+CREATE OR REPLACE FUNCTION sync_activity_bitmap()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+    v_day DATE;
+    v_active BOOLEAN;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_user_id := OLD.user_id;
+        v_day := OLD.day;
+        v_active := false;
+    ELSE
+        v_user_id := NEW.user_id;
+        v_day := NEW.day;
+        v_active := NEW.completions > 0;
+        IF TG_OP = 'UPDATE' AND (OLD.completions > 0) = v_active THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    
+    INSERT INTO activity_bitmaps (user_id, year)
+    VALUES (v_user_id, EXTRACT(YEAR FROM v_day))
+    ON CONFLICT (user_id, year) DO NOTHING;
+    
+    UPDATE activity_bitmaps
+    SET days = set_bit(days, EXTRACT(DOY FROM v_day)::INTEGER - 1, v_active::INTEGER)
+    WHERE user_id = v_user_id AND year = EXTRACT(YEAR FROM v_day);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_activity_bitmap
+    AFTER INSERT OR DELETE OR UPDATE OF completions ON daily_activity_rollup
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_activity_bitmap();
+
+-- Backfill: rebuilding the rollup re-fires the bitmap trigger for every day
+SELECT rebuild_daily_activity_rollup();
+
+-- Permissions
+GRANT SELECT ON activity_bitmaps TO reclaim_app;
+
+-- Enable RLS on activity_bitmaps table (written only by SECURITY DEFINER triggers)
+ALTER TABLE activity_bitmaps ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own heatmap (when logged in)
+CREATE POLICY user_own_activity_bitmaps ON activity_bitmaps
+    FOR SELECT TO reclaim_app
+    USING (
+        current_setting('user.current_user_id', true) IS NOT NULL 
+        AND current_setting('user.current_user_id', true) != ''
+        AND user_id = current_setting('user.current_user_id', true)::INTEGER
+    );
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
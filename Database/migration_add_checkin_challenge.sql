@@ -0,0 +1,96 @@
+-- Migration: Add checkin_challenge() for the daily check-in write path
+-- Run this if your database already exists (same definition as functions.sql)
+
+-- Daily check-in for a challenge
+-- =====================================================
+-- Does the whole check-in in one round-trip: participation check, duplicate
+-- check, daily log, progress and streak update. The user_challenges row is
+-- locked FOR UPDATE so concurrent check-ins (double-taps) are serialised.
+-- Expected failures are returned as JSON ('success' = false with an 'error'
+-- code) rather than raised, so the caller doesn't have to parse messages.
+CREATE OR REPLACE FUNCTION checkin_challenge(
+    p_user_id INTEGER,
+    p_challenge_id INTEGER
+)
+RETURNS JSON AS $$
+DECLARE
+    v_user_challenge_id INTEGER;
+    v_log_id INTEGER;
+    v_progress_days INTEGER;
+    v_current_streak INTEGER;
+    v_longest_streak INTEGER;
+    v_today DATE;
+BEGIN
+    -- Validate input parameters
+    IF p_user_id IS NULL OR p_challenge_id IS NULL THEN
+        RAISE EXCEPTION 'User ID and Challenge ID cannot be null';
+    END IF;
+    
+    v_today := CURRENT_DATE;
+    
+    -- Lock the participation row for the rest of the transaction
+    SELECT id INTO v_user_challenge_id
+    FROM user_challenges 
+    WHERE user_id = p_user_id 
+    AND challenge_id = p_challenge_id 
+    AND status = 'active'
+    FOR UPDATE;
+    
+    IF NOT FOUND THEN
+        RETURN json_build_object(
+            'success', false,
+            'error', 'not_participating',
+            'message', 'You are not participating in this challenge or it''s not active'
+        );
+    END IF;
+    
+    -- Insert today's log; the unique constraint doubles as the duplicate check
+    INSERT INTO daily_logs (user_id, challenge_id, log_date, completed)
+    VALUES (p_user_id, p_challenge_id, v_today, TRUE)
+    ON CONFLICT (user_id, challenge_id, log_date) DO NOTHING
+    RETURNING id INTO v_log_id;
+    
+    IF v_log_id IS NULL THEN
+        RETURN json_build_object(
+            'success', false,
+            'error', 'already_checked_in',
+            'message', 'You have already checked in for this challenge today'
+        );
+    END IF;
+    
+    -- Update progress
+    UPDATE user_challenges 
+    SET progress_days = progress_days + 1
+    WHERE id = v_user_challenge_id
+    RETURNING progress_days INTO v_progress_days;
+    
+    -- Create or update the streak: consecutive day increments, otherwise reset to 1
+    INSERT INTO streaks (user_id, challenge_id, current_streak, longest_streak, last_active)
+    VALUES (p_user_id, p_challenge_id, 1, 1, v_today)
+    ON CONFLICT (user_id, challenge_id) DO UPDATE
+    SET 
+        current_streak = CASE WHEN streaks.last_active = v_today - 1
+                              THEN streaks.current_streak + 1 ELSE 1 END,
+        longest_streak = GREATEST(streaks.longest_streak,
+                                  CASE WHEN streaks.last_active = v_today - 1
+                                       THEN streaks.current_streak + 1 ELSE 1 END),
+        last_active = v_today
+    RETURNING current_streak, longest_streak INTO v_current_streak, v_longest_streak;
+    
+    RETURN json_build_object(
+        'success', true,
+        'user_challenge_id', v_user_challenge_id,
+        'log_id', v_log_id,
+        'progress_days', v_progress_days,
+        'current_streak', v_current_streak,
+        'longest_streak', v_longest_streak
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION checkin_challenge(INTEGER, INTEGER) TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -0,0 +1,115 @@
+-- Migration: Add checkin_challenges() for the batch check-in endpoint
+-- Run this if your database already exists (same definition as functions.sql)
+
+-- Check in to several challenges at once (set-based)
+-- =====================================================
+-- Same rules as checkin_challenge(), applied to a whole list in one
+-- statement: one locking read, one INSERT into daily_logs, one UPDATE of
+-- user_challenges and one streak upsert, however many challenges are given.
+-- Returns a JSON array with one result per distinct challenge id, in the
+-- order given.
+CREATE OR REPLACE FUNCTION checkin_challenges(
+    p_user_id INTEGER,
+    p_challenge_ids INTEGER[]
+)
+RETURNS JSON AS $$
+DECLARE
+    v_today DATE;
+    v_result JSON;
+BEGIN
+    -- Validate input parameters
+    IF p_user_id IS NULL OR p_challenge_ids IS NULL THEN
+        RAISE EXCEPTION 'User ID and Challenge IDs cannot be null';
+    END IF;
+    
+    v_today := CURRENT_DATE;
+    
+    WITH requested AS (
+        SELECT challenge_id, MIN(ord) as ord
+        FROM unnest(p_challenge_ids) WITH ORDINALITY as r(challenge_id, ord)
+        WHERE challenge_id IS NOT NULL
+        GROUP BY challenge_id
+    ),
+    -- Lock the participation rows (in id order, like concurrent single check-ins)
+    participating AS (
+        SELECT uc.id, uc.challenge_id
+        FROM user_challenges uc
+        JOIN requested r ON r.challenge_id = uc.challenge_id
+        WHERE uc.user_id = p_user_id AND uc.status = 'active'
+        ORDER BY uc.id
+        FOR UPDATE OF uc
+    ),
+    -- The unique constraint doubles as the duplicate check
+    logged AS (
+        INSERT INTO daily_logs (user_id, challenge_id, log_date, completed)
+        SELECT p_user_id, challenge_id, v_today, TRUE
+        FROM participating
+        ORDER BY challenge_id
+        ON CONFLICT (user_id, challenge_id, log_date) DO NOTHING
+        RETURNING id, challenge_id
+    ),
+    progressed AS (
+        UPDATE user_challenges uc
+        SET progress_days = uc.progress_days + 1
+        FROM participating p
+        JOIN logged l ON l.challenge_id = p.challenge_id
+        WHERE uc.id = p.id
+        RETURNING uc.id, uc.challenge_id, uc.progress_days
+    ),
+    streaked AS (
+        INSERT INTO streaks (user_id, challenge_id, current_streak, longest_streak, last_active)
+        SELECT p_user_id, challenge_id, 1, 1, v_today
+        FROM logged
+        ORDER BY challenge_id
+        ON CONFLICT (user_id, challenge_id) DO UPDATE
+        SET 
+            current_streak = CASE WHEN streaks.last_active = v_today - 1
+                                  THEN streaks.current_streak + 1 ELSE 1 END,
+            longest_streak = GREATEST(streaks.longest_streak,
+                                      CASE WHEN streaks.last_active = v_today - 1
+                                           THEN streaks.current_streak + 1 ELSE 1 END),
+            last_active = v_today
+        RETURNING challenge_id, current_streak, longest_streak
+    )
+    SELECT json_agg(
+        CASE
+            WHEN l.id IS NOT NULL THEN json_build_object(
+                'challenge_id', r.challenge_id,
+                'success', true,
+                'user_challenge_id', pr.id,
+                'log_id', l.id,
+                'progress_days', pr.progress_days,
+                'current_streak', s.current_streak,
+                'longest_streak', s.longest_streak
+            )
+            WHEN p.id IS NULL THEN json_build_object(
+                'challenge_id', r.challenge_id,
+                'success', false,
+                'error', 'not_participating',
+                'message', 'You are not participating in this challenge or it''s not active'
+            )
+            ELSE json_build_object(
+                'challenge_id', r.challenge_id,
+                'success', false,
+                'error', 'already_checked_in',
+                'message', 'You have already checked in for this challenge today'
+            )
+        END
+        ORDER BY r.ord
+    ) INTO v_result
+    FROM requested r
+    LEFT JOIN participating p ON p.challenge_id = r.challenge_id
+    LEFT JOIN logged l ON l.challenge_id = r.challenge_id
+    LEFT JOIN progressed pr ON pr.challenge_id = r.challenge_id
+    LEFT JOIN streaked s ON s.challenge_id = r.challenge_id;
+    
+    RETURN COALESCE(v_result, '[]'::JSON);
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION checkin_challenges(INTEGER, INTEGER[]) TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -0,0 +1,206 @@
+-- Migration: Add get_dashboard() for the aggregated /api/dashboard endpoint
+-- (with get_active_challenges() and get_analytics(), which also back
+-- /api/challenges/active and /api/analytics)
+-- Run this if your database already exists (same definitions as functions.sql)
+-- Requires migration_user_stats.sql and migration_daily_activity_rollup.sql.
+
+-- A user's active challenges, as served by /api/challenges/active
+-- =====================================================
+-- One set-based query: streaks and today's log are LEFT JOINed instead of
+-- looked up per challenge. Also the dashboard's active_challenges section.
+CREATE OR REPLACE FUNCTION get_active_challenges(p_user_id INTEGER)
+RETURNS JSON AS $$
+BEGIN
+    RETURN COALESCE((
+        SELECT json_agg(json_build_object(
+            'user_challenge_id', uc.id,
+            'challenge_id', c.id,
+            'title', c.title,
+            'description', c.description,
+            'difficulty', c.difficulty,
+            'xp_reward', c.xp_reward,
+            'progress_days', uc.progress_days,
+            'total_days', c.duration_days,
+            'progress_percentage', CASE WHEN c.duration_days > 0
+                THEN ROUND(uc.progress_days::NUMERIC / c.duration_days * 100, 1)
+                ELSE 0 END,
+            'started_at', uc.started_at,
+            'checked_in_today', dl.id IS NOT NULL,
+            'current_streak', COALESCE(s.current_streak, 0),
+            'longest_streak', COALESCE(s.longest_streak, 0),
+            'category', c.category
+        ) ORDER BY uc.started_at DESC)
+        FROM user_challenges uc
+        JOIN challenges c ON uc.challenge_id = c.id
+        LEFT JOIN streaks s
+               ON s.user_id = uc.user_id AND s.challenge_id = uc.challenge_id
+        LEFT JOIN daily_logs dl
+               ON dl.user_id = uc.user_id AND dl.challenge_id = uc.challenge_id
+              AND dl.log_date = CURRENT_DATE
+        WHERE uc.user_id = p_user_id AND uc.status = 'active'
+    ), '[]'::JSON);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Activity analytics, as served by /api/analytics
+-- =====================================================
+-- One bucket per day/week/month over the last p_days days (empty buckets
+-- included) from daily_activity_rollup, plus totals. Day buckets also get
+-- the dashboard charts' weeklyActivity (the last 7 days). Also the
+-- dashboard's analytics section (with the defaults: 7 days by day).
+CREATE OR REPLACE FUNCTION get_analytics(
+    p_user_id INTEGER,
+    p_days INTEGER DEFAULT 7,
+    p_bucket TEXT DEFAULT 'day'
+)
+RETURNS JSON AS $$
+DECLARE
+    v_from DATE := CURRENT_DATE - (p_days - 1);
+    v_step INTERVAL;
+    v_activity JSON;
+    v_totals JSON;
+    v_weekly JSON;
+    v_result JSONB;
+BEGIN
+    v_step := CASE p_bucket
+        WHEN 'day' THEN INTERVAL '1 day'
+        WHEN 'week' THEN INTERVAL '1 week'
+        WHEN 'month' THEN INTERVAL '1 month'
+    END;
+    IF v_step IS NULL OR p_days < 1 THEN
+        RAISE EXCEPTION 'Invalid analytics range % or bucket %', p_days, p_bucket;
+    END IF;
+    
+    WITH buckets AS (
+        SELECT 
+            GREATEST(b.bucket_start::DATE, v_from) as start,
+            LOWER(LEFT(TO_CHAR(b.bucket_start, 'Dy'), 3)) as day_name,
+            COALESCE(SUM(r.checkins), 0) as checkins,
+            COALESCE(SUM(r.completions), 0) as completed,
+            COALESCE(SUM(r.mood_terrible), 0) as terrible,
+            COALESCE(SUM(r.mood_bad), 0) as bad,
+            COALESCE(SUM(r.mood_okay), 0) as okay,
+            COALESCE(SUM(r.mood_good), 0) as good,
+            COALESCE(SUM(r.mood_excellent), 0) as excellent
+        FROM generate_series(
+            date_trunc(p_bucket, v_from::TIMESTAMP),
+            CURRENT_DATE::TIMESTAMP,
+            v_step
+        ) as b(bucket_start)
+        LEFT JOIN daily_activity_rollup r 
+            ON r.user_id = p_user_id
+            AND r.day >= GREATEST(b.bucket_start::DATE, v_from)
+            AND r.day < b.bucket_start + v_step
+        GROUP BY b.bucket_start
+    )
+    SELECT
+        json_agg(json_build_object(
+            'start', start,
+            'day', day_name,
+            'checkins', checkins,
+            'completed', completed,
+            'moods', json_build_object(
+                'terrible', terrible, 'bad', bad, 'okay', okay,
+                'good', good, 'excellent', excellent
+            )
+        ) ORDER BY start),
+        json_build_object(
+            'checkins', COALESCE(SUM(checkins), 0),
+            'completed', COALESCE(SUM(completed), 0),
+            'moods', json_build_object(
+                'terrible', COALESCE(SUM(terrible), 0), 'bad', COALESCE(SUM(bad), 0),
+                'okay', COALESCE(SUM(okay), 0), 'good', COALESCE(SUM(good), 0),
+                'excellent', COALESCE(SUM(excellent), 0)
+            )
+        ),
+        json_agg(json_build_object(
+            'day', day_name,
+            'checkins', checkins,
+            'completed', completed
+        ) ORDER BY start) FILTER (WHERE start > CURRENT_DATE - 7)
+    INTO v_activity, v_totals, v_weekly
+    FROM buckets;
+    
+    v_result := jsonb_build_object(
+        'range', p_days,
+        'bucket', p_bucket,
+        'activity', COALESCE(v_activity, '[]'::JSON),
+        'totals', v_totals
+    );
+    IF p_bucket = 'day' THEN
+        -- Shape used by the dashboard charts
+        v_result := v_result || jsonb_build_object('weeklyActivity', COALESCE(v_weekly, '[]'::JSON));
+    END IF;
+    
+    RETURN v_result::JSON;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Everything the dashboard renders, in one call
+-- =====================================================
+-- Sections: profile, active_challenges, analytics, badges, settings. Each
+-- has the same shape as the matching endpoint's payload, built by the same
+-- function where there is one (analytics with its defaults: 7 days by day).
+-- Pass p_fields to build only some of them (NULL = all). Runs with the
+-- caller's RLS context.
+CREATE OR REPLACE FUNCTION get_dashboard(
+    p_user_id INTEGER,
+    p_fields TEXT[] DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_result JSONB := '{}'::JSONB;
+BEGIN
+    IF p_fields IS NULL OR 'profile' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('profile', get_user_stats(p_user_id));
+    END IF;
+    
+    IF p_fields IS NULL OR 'active_challenges' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('active_challenges', get_active_challenges(p_user_id));
+    END IF;
+    
+    IF p_fields IS NULL OR 'analytics' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('analytics', get_analytics(p_user_id));
+    END IF;
+    
+    IF p_fields IS NULL OR 'badges' = ANY(p_fields) THEN
+        v_result := v_result || jsonb_build_object('badges', COALESCE((
+            SELECT json_agg(json_build_object(
+                'id', b.id,
+                'name', b.name,
+                'description', b.description,
+                'icon', b.icon,
+                'category', b.category,
+                'earned_at', ub.earned_at
+            ) ORDER BY ub.earned_at DESC)
+            FROM user_badges ub
+            JOIN badges b ON ub.badge_id = b.id
+            WHERE ub.user_id = p_user_id
+        ), '[]'::JSON));
+    END IF;
+    
+    IF p_fields IS NULL OR 'settings' = ANY(p_fields) THEN
+        -- Defaults when the user has never saved settings
+        v_result := v_result || jsonb_build_object('settings', COALESCE((
+            SELECT json_build_object(
+                'notifications', notifications,
+                'email_updates', email_updates,
+                'show_badges', show_badges
+            )
+            FROM user_settings
+            WHERE user_id = p_user_id
+        ), json_build_object('notifications', true, 'email_updates', true, 'show_badges', true)));
+    END IF;
+    
+    RETURN v_result::JSON;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION get_active_challenges(INTEGER) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION get_analytics(INTEGER, INTEGER, TEXT) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION get_dashboard(INTEGER, TEXT[]) TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -0,0 +1,60 @@
+-- Migration: Version the challenge/badge catalog for backend caching
+-- Run this if your database already exists (same definitions as schema.sql)
+--
+-- /api/challenges and /api/badges are served from a per-worker cache that is
+-- invalidated by the 'catalog_changes' notification.
+--
+-- Safe to re-run: an existing catalog_version row is kept, because running
+-- workers compare cached versions against it and a reset to 1 would leave
+-- them missing the cache until restarted.
+
+DROP TRIGGER IF EXISTS trigger_catalog_version_challenges ON challenges;
+DROP TRIGGER IF EXISTS trigger_catalog_version_badges ON badges;
+
+-- Catalog version (challenges + badges)
+-- =====================================================
+-- Single-row counter bumped by any change to the challenge or badge catalog
+-- (seed_challenges.py, add_challenges.py, cleanup_old_challenges.py, manual
+-- edits) and published on the 'catalog_changes' channel. Backend workers
+-- cache the serialised catalog and only reload it when this moves.
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_catalog_version()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_version BIGINT;
+BEGIN
+    UPDATE catalog_version
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    RETURNING version INTO v_version;
+    
+    PERFORM pg_notify('catalog_changes', v_version::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Statement-level, so a bulk seed bumps the version once per statement
+CREATE TRIGGER trigger_catalog_version_challenges
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON challenges
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_catalog_version();
+
+CREATE TRIGGER trigger_catalog_version_badges
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON badges
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_catalog_version();
+
+GRANT SELECT ON catalog_version TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -0,0 +1,138 @@
+-- Migration: Per-user daily activity rollups for the analytics API
+-- Run this if your database already exists (same definitions as
+-- views_and_indexes.sql and roles_and_grants.sql)
+--
+-- /api/analytics reads ranges of up to a year from daily_activity_rollup.
+
+DROP TRIGGER IF EXISTS trigger_sync_daily_activity_rollup ON daily_logs;
+DROP TABLE IF EXISTS daily_activity_rollup;
+
+-- Daily activity rollup: one row per user per day, maintained by triggers
+-- =====================================================
+-- Check-in, completion and mood counts from daily_logs, so analytics over
+-- long ranges read at most one row per day instead of rescanning raw logs.
+CREATE TABLE daily_activity_rollup (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    checkins INTEGER NOT NULL DEFAULT 0,
+    completions INTEGER NOT NULL DEFAULT 0,
+    mood_terrible INTEGER NOT NULL DEFAULT 0,
+    mood_bad INTEGER NOT NULL DEFAULT 0,
+    mood_okay INTEGER NOT NULL DEFAULT 0,
+    mood_good INTEGER NOT NULL DEFAULT 0,
+    mood_excellent INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+-- Daily activity rollup maintenance triggers
+-- =====================================================
+-- Add (p_sign = 1) or remove (p_sign = -1) one log from its day's rollup
+CREATE OR REPLACE FUNCTION bump_daily_activity(
+    p_user_id INTEGER,
+    p_day DATE,
+    p_completed BOOLEAN,
+    p_mood mood_type,
+    p_sign INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO daily_activity_rollup (
+        user_id, day, checkins, completions,
+        mood_terrible, mood_bad, mood_okay, mood_good, mood_excellent
+    )
+    VALUES (
+        p_user_id, p_day, p_sign,
+        p_sign * COALESCE(p_completed, false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'terrible', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'bad', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'okay', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'good', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'excellent', false)::INTEGER
+    )
+    ON CONFLICT (user_id, day) DO UPDATE
+    SET 
+        checkins = daily_activity_rollup.checkins + EXCLUDED.checkins,
+        completions = daily_activity_rollup.completions + EXCLUDED.completions,
+        mood_terrible = daily_activity_rollup.mood_terrible + EXCLUDED.mood_terrible,
+        mood_bad = daily_activity_rollup.mood_bad + EXCLUDED.mood_bad,
+        mood_okay = daily_activity_rollup.mood_okay + EXCLUDED.mood_okay,
+        mood_good = daily_activity_rollup.mood_good + EXCLUDED.mood_good,
+        mood_excellent = daily_activity_rollup.mood_excellent + EXCLUDED.mood_excellent;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE OR REPLACE FUNCTION sync_daily_activity_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_daily_activity(OLD.user_id, OLD.log_date, OLD.completed, OLD.mood, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_daily_activity(NEW.user_id, NEW.log_date, NEW.completed, NEW.mood, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_daily_activity_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, log_date, completed, mood ON daily_logs
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_daily_activity_rollup();
+
+-- Rebuild daily_activity_rollup from daily_logs (backfill / drift repair)
+-- =====================================================
+CREATE OR REPLACE FUNCTION rebuild_daily_activity_rollup()
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    DELETE FROM daily_activity_rollup;
+    
+    INSERT INTO daily_activity_rollup (
+        user_id, day, checkins, completions,
+        mood_terrible, mood_bad, mood_okay, mood_good, mood_excellent
+    )
+    SELECT 
+        user_id, log_date, COUNT(*),
+        COUNT(*) FILTER (WHERE completed),
+        COUNT(*) FILTER (WHERE mood = 'terrible'),
+        COUNT(*) FILTER (WHERE mood = 'bad'),
+        COUNT(*) FILTER (WHERE mood = 'okay'),
+        COUNT(*) FILTER (WHERE mood = 'good'),
+        COUNT(*) FILTER (WHERE mood = 'excellent')
+    FROM daily_logs
+    GROUP BY user_id, log_date;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Backfill
+SELECT rebuild_daily_activity_rollup();
+
+-- Permissions
+GRANT SELECT ON daily_activity_rollup TO reclaim_app;
+
+-- Enable RLS on daily_activity_rollup table (written only by SECURITY DEFINER triggers)
+ALTER TABLE daily_activity_rollup ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own activity (when logged in)
+CREATE POLICY user_own_activity ON daily_activity_rollup
+    FOR SELECT TO reclaim_app
+    USING (
+        current_setting('user.current_user_id', true) IS NOT NULL 
+        AND current_setting('user.current_user_id', true) != ''
+        AND user_id = current_setting('user.current_user_id', true)::INTEGER
+    );
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
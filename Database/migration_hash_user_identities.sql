@@ -0,0 +1,44 @@
+-- Migration: Keep plaintext emails out of the signup availability filter
+-- Run this if your database already exists (same definitions as schema.sql and functions.sql)
+--
+-- user_identities() and the 'user_identities' notification now carry a
+-- SHA-256 hash of the lowercased email instead of the address itself, so
+-- backend workers no longer hold every user's email and signups/email changes
+-- are not broadcast in cleartext. identity_taken() is unchanged.
+
+-- The result column is renamed, which CREATE OR REPLACE can't do
+DROP FUNCTION IF EXISTS user_identities();
+
+-- Every username and email hash, for warming the signup availability filter
+-- (SECURITY DEFINER: RLS only lets reclaim_app see the current user's row,
+-- so emails leave the database only as SHA-256 hex of the lowercased address)
+CREATE OR REPLACE FUNCTION user_identities()
+RETURNS TABLE (username TEXT, email_hash TEXT) AS $$
+    SELECT u.username::TEXT,
+           encode(sha256(convert_to(lower(u.email), 'UTF8')), 'hex')
+    FROM users u;
+$$ LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public;
+
+-- New or changed usernames/emails are published on the 'user_identities'
+-- channel, so each backend worker's availability filter stays current.
+-- The email is sent only as a hash (as in user_identities()).
+CREATE OR REPLACE FUNCTION notify_user_identity()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('user_identities', json_build_object(
+        'username', NEW.username,
+        'email_hash', encode(sha256(convert_to(lower(NEW.email), 'UTF8')), 'hex')
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION user_identities() TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -0,0 +1,235 @@
+-- Migration: Replace the leaderboard materialized view with leaderboard_stats
+-- Run this if your database already exists (same definitions as views_and_indexes.sql)
+--
+-- leaderboard_stats is updated by triggers for just the user whose XP,
+-- completions, badges or streak changed, so the periodic full refresh (and
+-- its refresh_leaderboard_if_stale() bookkeeping) goes away; this also
+-- cleans up databases that ran the earlier debounced-refresh migration.
+
+DROP FUNCTION IF EXISTS refresh_leaderboard_if_stale(TIMESTAMP WITH TIME ZONE, INTEGER);
+DROP FUNCTION IF EXISTS refresh_leaderboard();
+DROP TABLE IF EXISTS leaderboard_refresh_state;
+DROP MATERIALIZED VIEW IF EXISTS leaderboard_view;
+
+-- Leaderboard stats: one row per user, maintained incrementally by triggers
+-- =====================================================
+-- Replaces the old full-recompute materialized view. Each write to users,
+-- user_challenges, user_badges or streaks only touches the affected user's
+-- row, so the cost is proportional to activity, not to the number of users.
+-- Rank is computed on read from idx_leaderboard_stats_rank.
+CREATE TABLE leaderboard_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    username VARCHAR(50) NOT NULL,
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_active TIMESTAMP WITH TIME ZONE,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    completed_challenges INTEGER NOT NULL DEFAULT 0,
+    badges_earned INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0  -- longest current streak across all challenges
+);
+
+-- Leaderboard order: xp DESC, then earliest signup, then id as a tie-breaker
+CREATE INDEX idx_leaderboard_stats_rank ON leaderboard_stats (xp DESC, created_at ASC, user_id ASC) WHERE is_active = true;
+
+-- Compatibility view with the same columns as the old materialized view.
+-- Fine for ad-hoc queries; the API reads leaderboard_stats directly so that
+-- top-N and rank lookups can stop early on the index.
+CREATE VIEW leaderboard_view AS
+SELECT 
+    ls.user_id as id,
+    ls.username,
+    ls.xp,
+    ls.level,
+    ls.created_at,
+    ls.last_active,
+    ROW_NUMBER() OVER (ORDER BY ls.xp DESC, ls.created_at ASC, ls.user_id ASC) as rank,
+    ls.completed_challenges,
+    ls.badges_earned,
+    ls.current_streak
+FROM leaderboard_stats ls
+WHERE ls.is_active = true;
+
+
+-- Leaderboard maintenance triggers
+-- =====================================================
+-- SECURITY DEFINER so the counts ignore RLS and the app role doesn't need
+-- write access to leaderboard_stats.
+
+-- Mirror user columns (insert or update of username/xp/level/activity)
+CREATE OR REPLACE FUNCTION sync_leaderboard_user()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO leaderboard_stats (user_id, username, xp, level, created_at, last_active, is_active)
+    VALUES (NEW.id, NEW.username, COALESCE(NEW.xp, 0), COALESCE(NEW.level, 1),
+            COALESCE(NEW.created_at, CURRENT_TIMESTAMP), NEW.last_active, COALESCE(NEW.is_active, true))
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        username = EXCLUDED.username,
+        xp = EXCLUDED.xp,
+        level = EXCLUDED.level,
+        created_at = EXCLUDED.created_at,
+        last_active = EXCLUDED.last_active,
+        is_active = EXCLUDED.is_active;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_user
+    AFTER INSERT OR UPDATE OF username, xp, level, created_at, last_active, is_active ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_user();
+
+-- Recount completed challenges for the affected user only
+CREATE OR REPLACE FUNCTION sync_leaderboard_completed()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    UPDATE leaderboard_stats
+    SET completed_challenges = (
+        SELECT COUNT(*) FROM user_challenges 
+        WHERE user_id = v_user_id AND status = 'completed'
+    )
+    WHERE user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_completed
+    AFTER INSERT OR DELETE OR UPDATE OF status ON user_challenges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_completed();
+
+-- Recount badges for the affected user only
+CREATE OR REPLACE FUNCTION sync_leaderboard_badges()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    UPDATE leaderboard_stats
+    SET badges_earned = (SELECT COUNT(*) FROM user_badges WHERE user_id = v_user_id)
+    WHERE user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_badges
+    AFTER INSERT OR DELETE ON user_badges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_badges();
+
+-- Recompute the best current streak for the affected user only
+CREATE OR REPLACE FUNCTION sync_leaderboard_streak()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    UPDATE leaderboard_stats
+    SET current_streak = (
+        SELECT COALESCE(MAX(current_streak), 0) FROM streaks WHERE user_id = v_user_id
+    )
+    WHERE user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_streak
+    AFTER INSERT OR DELETE OR UPDATE OF current_streak ON streaks
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_streak();
+
+-- Rebuild leaderboard_stats from scratch (backfill / drift repair)
+-- =====================================================
+CREATE OR REPLACE FUNCTION rebuild_leaderboard_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO leaderboard_stats (
+        user_id, username, xp, level, created_at, last_active, is_active,
+        completed_challenges, badges_earned, current_streak
+    )
+    SELECT 
+        u.id, u.username, COALESCE(u.xp, 0), COALESCE(u.level, 1), u.created_at, u.last_active,
+        COALESCE(u.is_active, true),
+        (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'completed'),
+        (SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.id),
+        (SELECT COALESCE(MAX(s.current_streak), 0) FROM streaks s WHERE s.user_id = u.id)
+    FROM users u
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        username = EXCLUDED.username,
+        xp = EXCLUDED.xp,
+        level = EXCLUDED.level,
+        created_at = EXCLUDED.created_at,
+        last_active = EXCLUDED.last_active,
+        is_active = EXCLUDED.is_active,
+        completed_challenges = EXCLUDED.completed_challenges,
+        badges_earned = EXCLUDED.badges_earned,
+        current_streak = EXCLUDED.current_streak;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Function to get user's rank in leaderboard
+-- =====================================================
+-- 1 + number of active users ahead in (xp DESC, created_at, id) order;
+-- an index range scan on idx_leaderboard_stats_rank. Returns 0 if the user
+-- is not on the leaderboard.
+CREATE OR REPLACE FUNCTION get_user_rank(p_user_id INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    v_me leaderboard_stats%ROWTYPE;
+    v_rank INTEGER;
+BEGIN
+    SELECT * INTO v_me
+    FROM leaderboard_stats
+    WHERE user_id = p_user_id AND is_active = true;
+    
+    IF NOT FOUND THEN
+        RETURN 0;
+    END IF;
+    
+    SELECT COUNT(*) + 1 INTO v_rank
+    FROM leaderboard_stats ls
+    WHERE ls.is_active = true
+    AND (
+        ls.xp > v_me.xp
+        OR (ls.xp = v_me.xp AND (ls.created_at, ls.user_id) < (v_me.created_at, v_me.user_id))
+    );
+    
+    RETURN v_rank;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill from existing data
+SELECT rebuild_leaderboard_stats();
+
+GRANT SELECT ON leaderboard_view TO reclaim_app;
+GRANT SELECT ON leaderboard_stats TO reclaim_app;
+GRANT EXECUTE ON FUNCTION get_user_rank(INTEGER) TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
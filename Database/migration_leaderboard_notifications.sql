@@ -0,0 +1,69 @@
+-- Migration: Publish leaderboard_stats changes on the 'leaderboard_changes' channel
+-- Run this if your database already exists (same definitions as views_and_indexes.sql)
+--
+-- Backend workers keep an in-memory ranking warm from these notifications.
+
+ALTER TABLE leaderboard_stats ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+DROP TRIGGER IF EXISTS trigger_bump_leaderboard_version ON leaderboard_stats;
+DROP TRIGGER IF EXISTS trigger_notify_leaderboard_change ON leaderboard_stats;
+
+-- Leaderboard change notifications
+-- =====================================================
+-- Every real change to a leaderboard_stats row bumps its version and is
+-- published on the 'leaderboard_changes' channel, so backend workers can keep
+-- an in-memory ranking current without polling. No-op updates (e.g. a
+-- recount that didn't change anything) are skipped entirely.
+CREATE OR REPLACE FUNCTION bump_leaderboard_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NULL;
+    END IF;
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_bump_leaderboard_version
+    BEFORE UPDATE ON leaderboard_stats
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_leaderboard_version();
+
+CREATE OR REPLACE FUNCTION notify_leaderboard_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('leaderboard_changes', json_build_object(
+            'user_id', OLD.user_id,
+            'version', OLD.version + 1,
+            'deleted', true
+        )::TEXT);
+        RETURN NULL;
+    END IF;
+    
+    PERFORM pg_notify('leaderboard_changes', json_build_object(
+        'user_id', NEW.user_id,
+        'version', NEW.version,
+        'username', NEW.username,
+        'xp', NEW.xp,
+        'level', NEW.level,
+        'created_us', (EXTRACT(EPOCH FROM NEW.created_at) * 1000000)::BIGINT,
+        'is_active', NEW.is_active,
+        'completed_challenges', NEW.completed_challenges,
+        'badges_earned', NEW.badges_earned,
+        'current_streak', NEW.current_streak
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_notify_leaderboard_change
+    AFTER INSERT OR UPDATE OR DELETE ON leaderboard_stats
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_leaderboard_change();
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
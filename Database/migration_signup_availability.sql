@@ -0,0 +1,124 @@
+-- Migration: Single-round-trip signup and the signup availability check
+-- Run this if your database already exists (same definitions as schema.sql and functions.sql)
+--
+-- create_user() now detects duplicates with ON CONFLICT and returns every
+-- field the signup response needs. /api/signup/availability is served from
+-- a per-worker Bloom filter warmed by user_identities() and kept current by
+-- the 'user_identities' notification.
+
+DROP TRIGGER IF EXISTS trigger_notify_user_identity ON users;
+
+-- User identities (signup availability)
+-- =====================================================
+-- New or changed usernames/emails are published on the 'user_identities'
+-- channel, so each backend worker's availability filter stays current.
+CREATE OR REPLACE FUNCTION notify_user_identity()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('user_identities', json_build_object(
+        'username', NEW.username,
+        'email', lower(NEW.email)
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_notify_user_identity
+    AFTER INSERT OR UPDATE OF username, email ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_user_identity();
+
+CREATE OR REPLACE FUNCTION create_user(
+    p_username TEXT,
+    p_password_hash TEXT,
+    p_email TEXT,
+    p_first_name TEXT DEFAULT NULL,
+    p_last_name TEXT DEFAULT NULL
+)
+RETURNS JSON AS $$
+DECLARE
+    v_user users%ROWTYPE;
+BEGIN
+    -- Validation and duplicate failures are returned (success = false, with
+    -- an 'error' code) rather than raised, so callers never parse messages
+    IF p_username IS NULL OR p_password_hash IS NULL OR p_email IS NULL THEN
+        RETURN json_build_object('success', false, 'error', 'invalid',
+            'message', 'Username, password and email are required');
+    END IF;
+    
+    -- Validate username length
+    IF LENGTH(p_username) < 3 THEN
+        RETURN json_build_object('success', false, 'error', 'invalid',
+            'message', 'Username must be at least 3 characters long');
+    END IF;
+    
+    -- Validate email format (basic check)
+    IF p_email !~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$' THEN
+        RETURN json_build_object('success', false, 'error', 'invalid',
+            'message', 'Invalid email format');
+    END IF;
+    
+    -- Insert new user; a taken username or email inserts nothing
+    -- SECURITY DEFINER allows this to bypass RLS when creating users
+    INSERT INTO users (username, password_hash, email, first_name, last_name)
+    VALUES (p_username, p_password_hash, p_email, p_first_name, p_last_name)
+    ON CONFLICT DO NOTHING
+    RETURNING * INTO v_user;
+    
+    IF v_user.id IS NULL THEN
+        IF EXISTS (SELECT 1 FROM users WHERE username = p_username) THEN
+            RETURN json_build_object('success', false, 'error', 'username_taken',
+                'message', 'Username already exists');
+        END IF;
+        RETURN json_build_object('success', false, 'error', 'email_taken',
+            'message', 'Email already exists');
+    END IF;
+    
+    -- Everything the signup response needs, so it takes one round trip
+    RETURN json_build_object(
+        'success', true,
+        'user_id', v_user.id,
+        'username', v_user.username,
+        'email', v_user.email,
+        'first_name', v_user.first_name,
+        'last_name', v_user.last_name,
+        'created_at', v_user.created_at,
+        'message', 'User created successfully'
+    );
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Every username and email, for warming the signup availability filter
+-- (SECURITY DEFINER: RLS only lets reclaim_app see the current user's row)
+CREATE OR REPLACE FUNCTION user_identities()
+RETURNS TABLE (username TEXT, email TEXT) AS $$
+    SELECT u.username::TEXT, lower(u.email)::TEXT FROM users u;
+$$ LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public;
+
+-- Authoritative check behind the availability filter; NULL arguments are skipped
+CREATE OR REPLACE FUNCTION identity_taken(p_username TEXT, p_email TEXT)
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'username', p_username IS NOT NULL
+            AND EXISTS (SELECT 1 FROM users u WHERE u.username = p_username),
+        'email', p_email IS NOT NULL
+            AND EXISTS (SELECT 1 FROM users u WHERE u.email = lower(p_email))
+    );
+$$ LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public;
+
+GRANT EXECUTE ON FUNCTION create_user(TEXT, TEXT, TEXT, TEXT, TEXT) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION user_identities() TO reclaim_app;
+GRANT EXECUTE ON FUNCTION identity_taken(TEXT, TEXT) TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -0,0 +1,31 @@
+-- Migration: Make the RLS user context transaction-scoped
+-- Run this on existing databases before deploying the pooled backend.
+--
+-- set_user_context() used set_config(..., false), which keeps the setting for
+-- the whole session. With pooled connections that would leak one user's
+-- context into the next request, so both functions now use is_local = true
+-- and the setting is cleared automatically at COMMIT/ROLLBACK.
+
+CREATE OR REPLACE FUNCTION set_user_context(p_user_id INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    PERFORM set_config('user.current_user_id', p_user_id::TEXT, true);
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE OR REPLACE FUNCTION clear_user_context()
+RETURNS VOID AS $$
+BEGIN
+    PERFORM set_config('user.current_user_id', '', true);
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION set_user_context(INTEGER) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION clear_user_context() TO reclaim_app;
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
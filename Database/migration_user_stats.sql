@@ -0,0 +1,320 @@
+-- Migration: Denormalised per-user stats for profile and dashboard reads
+-- Run this if your database already exists (same definitions as
+-- views_and_indexes.sql, functions.sql and roles_and_grants.sql)
+--
+-- get_user_stats(), user_dashboard_view and the AI chat context read
+-- counters from user_stats instead of counting rows on every request.
+-- Run SELECT reconcile_user_stats(); (or Backend/reconcile_user_stats.py)
+-- periodically to repair any drift.
+
+DROP TRIGGER IF EXISTS trigger_init_user_stats ON users;
+DROP TRIGGER IF EXISTS trigger_sync_user_stats_challenges ON user_challenges;
+DROP TRIGGER IF EXISTS trigger_sync_user_stats_badges ON user_badges;
+DROP TRIGGER IF EXISTS trigger_sync_user_stats_streaks ON streaks;
+DROP VIEW IF EXISTS user_dashboard_view;
+DROP TABLE IF EXISTS user_stats;
+
+-- User stats: per-user profile counters, maintained incrementally by triggers
+-- =====================================================
+-- Replaces the COUNT(*) scans in get_user_stats() and the correlated
+-- subqueries in user_dashboard_view. Counters are adjusted by +/-1 on each
+-- write; streak maxima are recomputed from the user's own streak rows.
+-- reconcile_user_stats() repairs any drift.
+CREATE TABLE user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_challenges INTEGER NOT NULL DEFAULT 0,
+    active_challenges INTEGER NOT NULL DEFAULT 0,
+    completed_challenges INTEGER NOT NULL DEFAULT 0,
+    badges_earned INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,  -- best current streak across challenges
+    longest_streak INTEGER NOT NULL DEFAULT 0,  -- best longest streak across challenges
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE VIEW user_dashboard_view AS
+SELECT 
+    u.id as user_id,
+    u.username,
+    u.email,
+    u.first_name,
+    u.last_name,
+    u.xp,
+    u.level,
+    u.created_at,
+    u.last_active,
+    u.timezone,
+    -- Challenge statistics
+    COALESCE(us.total_challenges, 0) as total_challenges,
+    COALESCE(us.completed_challenges, 0) as completed_challenges,
+    COALESCE(us.active_challenges, 0) as active_challenges,
+    -- Streak information
+    us.current_streak,
+    us.longest_streak,
+    -- Badge information
+    COALESCE(us.badges_earned, 0) as badges_earned,
+    -- Recent activity (last 7 days); date-relative, so read from
+    -- idx_daily_logs_completed_user_date rather than stored
+    (SELECT COUNT(*) FROM daily_logs dl 
+     WHERE dl.user_id = u.id 
+     AND dl.log_date >= CURRENT_DATE - INTERVAL '7 days' 
+     AND dl.completed = true) as recent_activity
+FROM users u
+LEFT JOIN user_stats us ON us.user_id = u.id
+WHERE u.is_active = true;
+
+-- User stats maintenance triggers
+-- =====================================================
+-- SECURITY DEFINER for the same reasons as the leaderboard triggers.
+
+-- Apply counter deltas to one user's row (creating it if missing)
+CREATE OR REPLACE FUNCTION bump_user_stats(
+    p_user_id INTEGER,
+    p_total INTEGER,
+    p_active INTEGER,
+    p_completed INTEGER,
+    p_badges INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO user_stats (user_id, total_challenges, active_challenges, completed_challenges, badges_earned)
+    VALUES (p_user_id, GREATEST(p_total, 0), GREATEST(p_active, 0), GREATEST(p_completed, 0), GREATEST(p_badges, 0))
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        total_challenges = user_stats.total_challenges + p_total,
+        active_challenges = user_stats.active_challenges + p_active,
+        completed_challenges = user_stats.completed_challenges + p_completed,
+        badges_earned = user_stats.badges_earned + p_badges,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Every user starts with an empty stats row
+CREATE OR REPLACE FUNCTION init_user_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_stats (user_id) VALUES (NEW.id)
+    ON CONFLICT (user_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_init_user_stats
+    AFTER INSERT ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION init_user_stats();
+
+-- Challenge counters: +1/-1 per row and per status transition
+CREATE OR REPLACE FUNCTION sync_user_stats_challenges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_user_stats(
+            OLD.user_id, -1,
+            -(OLD.status = 'active')::INTEGER,
+            -(OLD.status = 'completed')::INTEGER,
+            0
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_user_stats(
+            NEW.user_id, 1,
+            (NEW.status = 'active')::INTEGER,
+            (NEW.status = 'completed')::INTEGER,
+            0
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_user_stats_challenges
+    AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON user_challenges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_user_stats_challenges();
+
+CREATE OR REPLACE FUNCTION sync_user_stats_badges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM bump_user_stats(OLD.user_id, 0, 0, 0, -1);
+    ELSE
+        PERFORM bump_user_stats(NEW.user_id, 0, 0, 0, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_user_stats_badges
+    AFTER INSERT OR DELETE ON user_badges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_user_stats_badges();
+
+-- Streak maxima can go down (a streak resets), so recompute them from the
+-- user's own streak rows (one per challenge, via idx_streaks_user_id)
+CREATE OR REPLACE FUNCTION sync_user_stats_streaks()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    PERFORM bump_user_stats(v_user_id, 0, 0, 0, 0);
+    UPDATE user_stats
+    SET 
+        current_streak = s.current_streak,
+        longest_streak = s.longest_streak,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT COALESCE(MAX(current_streak), 0) as current_streak,
+               COALESCE(MAX(longest_streak), 0) as longest_streak
+        FROM streaks WHERE user_id = v_user_id
+    ) s
+    WHERE user_stats.user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_user_stats_streaks
+    AFTER INSERT OR DELETE OR UPDATE OF current_streak, longest_streak ON streaks
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_user_stats_streaks();
+
+-- Reconcile user_stats with the source tables (backfill / drift repair)
+-- =====================================================
+-- Recomputes every user's counters and rewrites only the rows that differ.
+-- Returns the number of rows inserted or repaired.
+CREATE OR REPLACE FUNCTION reconcile_user_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH actual AS (
+        SELECT 
+            u.id as user_id,
+            (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id)::INTEGER as total_challenges,
+            (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'active')::INTEGER as active_challenges,
+            (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'completed')::INTEGER as completed_challenges,
+            (SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.id)::INTEGER as badges_earned,
+            (SELECT COALESCE(MAX(s.current_streak), 0) FROM streaks s WHERE s.user_id = u.id) as current_streak,
+            (SELECT COALESCE(MAX(s.longest_streak), 0) FROM streaks s WHERE s.user_id = u.id) as longest_streak
+        FROM users u
+    )
+    INSERT INTO user_stats (
+        user_id, total_challenges, active_challenges, completed_challenges,
+        badges_earned, current_streak, longest_streak
+    )
+    SELECT a.* FROM actual a
+    LEFT JOIN user_stats us ON us.user_id = a.user_id
+    WHERE us.user_id IS NULL
+       OR (us.total_challenges, us.active_challenges, us.completed_challenges,
+           us.badges_earned, us.current_streak, us.longest_streak)
+          IS DISTINCT FROM
+          (a.total_challenges, a.active_challenges, a.completed_challenges,
+           a.badges_earned, a.current_streak, a.longest_streak)
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        total_challenges = EXCLUDED.total_challenges,
+        active_challenges = EXCLUDED.active_challenges,
+        completed_challenges = EXCLUDED.completed_challenges,
+        badges_earned = EXCLUDED.badges_earned,
+        current_streak = EXCLUDED.current_streak,
+        longest_streak = EXCLUDED.longest_streak,
+        updated_at = CURRENT_TIMESTAMP;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE OR REPLACE FUNCTION get_user_stats(p_user_id INTEGER)
+RETURNS JSON AS $$
+DECLARE
+    v_user users%ROWTYPE;
+    v_total_challenges INTEGER := 0;
+    v_active_challenges INTEGER := 0;
+    v_completed_challenges INTEGER := 0;
+    v_total_badges INTEGER := 0;
+    v_current_streak INTEGER := 0;
+    v_longest_streak INTEGER := 0;
+    v_recent_activity INTEGER;
+    v_result JSON;
+BEGIN
+    -- Get user information
+    SELECT * INTO v_user FROM users WHERE id = p_user_id;
+    
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'User not found: %', p_user_id;
+    END IF;
+    
+    -- Challenge, badge and streak counters (maintained by triggers)
+    SELECT total_challenges, active_challenges, completed_challenges,
+           badges_earned, current_streak, longest_streak
+    INTO v_total_challenges, v_active_challenges, v_completed_challenges,
+         v_total_badges, v_current_streak, v_longest_streak
+    FROM user_stats 
+    WHERE user_id = p_user_id;
+    
+    -- Completed check-ins in the last 7 days
+    SELECT COUNT(*) INTO v_recent_activity
+    FROM daily_logs
+    WHERE user_id = p_user_id
+    AND log_date >= CURRENT_DATE - INTERVAL '7 days'
+    AND completed = true;
+    
+    -- Build result JSON
+    v_result := json_build_object(
+        'user_id', v_user.id,
+        'username', v_user.username,
+        'email', v_user.email,
+        'first_name', v_user.first_name,
+        'last_name', v_user.last_name,
+        'xp', v_user.xp,
+        'level', v_user.level,
+        'total_challenges', COALESCE(v_total_challenges, 0),
+        'active_challenges', COALESCE(v_active_challenges, 0),
+        'completed_challenges', COALESCE(v_completed_challenges, 0),
+        'total_badges', COALESCE(v_total_badges, 0),
+        'current_streak', COALESCE(v_current_streak, 0),
+        'longest_streak', COALESCE(v_longest_streak, 0),
+        'recent_activity', v_recent_activity,
+        'created_at', v_user.created_at,
+        'last_active', v_user.last_active
+    );
+    
+    RETURN v_result;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill
+SELECT reconcile_user_stats();
+
+-- Permissions
+GRANT SELECT ON user_stats TO reclaim_app;
+GRANT SELECT ON user_dashboard_view TO reclaim_app;
+
+ALTER TABLE user_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY user_own_stats ON user_stats
+    FOR SELECT TO reclaim_app
+    USING (
+        current_setting('user.current_user_id', true) IS NOT NULL 
+        AND current_setting('user.current_user_id', true) != ''
+        AND user_id = current_setting('user.current_user_id', true)::INTEGER
+    );
+
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration completed successfully';
+END $$;
@@ -28,6 +28,9 @@ GRANT USAGE, SELECT ON SEQUENCE streaks_id_seq TO reclaim_app;
 GRANT SELECT ON badges TO reclaim_app;
 -- Note: INSERT/UPDATE/DELETE on badges should be admin-only in production
 
+-- Catalog version (read by the backend's catalog cache)
+GRANT SELECT ON catalog_version TO reclaim_app;
+
 -- User badges table permissions
 GRANT SELECT, INSERT ON user_badges TO reclaim_app;
 GRANT USAGE, SELECT ON SEQUENCE user_badges_id_seq TO reclaim_app;
@@ -38,14 +41,24 @@ GRANT SELECT ON user_dashboard_view TO reclaim_app;
 GRANT SELECT ON challenge_progress_view TO reclaim_app;
 GRANT SELECT ON daily_activity_view TO reclaim_app;
 GRANT SELECT ON leaderboard_view TO reclaim_app;
+GRANT SELECT ON leaderboard_stats TO reclaim_app;
+GRANT SELECT ON user_stats TO reclaim_app;
+GRANT SELECT ON daily_activity_rollup TO reclaim_app;
+GRANT SELECT ON activity_bitmaps TO reclaim_app;
 
 
 
 -- Grant execute permissions on custom functions
 GRANT EXECUTE ON FUNCTION complete_challenge(INTEGER, INTEGER) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION checkin_challenge(INTEGER, INTEGER) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION checkin_challenges(INTEGER, INTEGER[]) TO reclaim_app;
 GRANT EXECUTE ON FUNCTION create_user(TEXT, TEXT, TEXT, TEXT, TEXT) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION user_identities() TO reclaim_app;
+GRANT EXECUTE ON FUNCTION identity_taken(TEXT, TEXT) TO reclaim_app;
 GRANT EXECUTE ON FUNCTION get_user_stats(INTEGER) TO reclaim_app;
-GRANT EXECUTE ON FUNCTION refresh_leaderboard() TO reclaim_app;
+GRANT EXECUTE ON FUNCTION get_active_challenges(INTEGER) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION get_analytics(INTEGER, INTEGER, TEXT) TO reclaim_app;
+GRANT EXECUTE ON FUNCTION get_dashboard(INTEGER, TEXT[]) TO reclaim_app;
 GRANT EXECUTE ON FUNCTION get_user_rank(INTEGER) TO reclaim_app;
 
 
@@ -163,10 +176,52 @@ CREATE POLICY user_own_badges ON user_badges
     );
 
 
+-- Enable RLS on user_stats table (written only by SECURITY DEFINER triggers)
+ALTER TABLE user_stats ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own stats (when logged in)
+CREATE POLICY user_own_stats ON user_stats
+    FOR SELECT TO reclaim_app
+    USING (
+        current_setting('user.current_user_id', true) IS NOT NULL 
+        AND current_setting('user.current_user_id', true) != ''
+        AND user_id = current_setting('user.current_user_id', true)::INTEGER
+    );
+
+-- Enable RLS on daily_activity_rollup table (written only by SECURITY DEFINER triggers)
+ALTER TABLE daily_activity_rollup ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own activity (when logged in)
+CREATE POLICY user_own_activity ON daily_activity_rollup
+    FOR SELECT TO reclaim_app
+    USING (
+        current_setting('user.current_user_id', true) IS NOT NULL 
+        AND current_setting('user.current_user_id', true) != ''
+        AND user_id = current_setting('user.current_user_id', true)::INTEGER
+    );
+
+-- Enable RLS on activity_bitmaps table (written only by SECURITY DEFINER triggers)
+ALTER TABLE activity_bitmaps ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own heatmap (when logged in)
+CREATE POLICY user_own_activity_bitmaps ON activity_bitmaps
+    FOR SELECT TO reclaim_app
+    USING (
+        current_setting('user.current_user_id', true) IS NOT NULL 
+        AND current_setting('user.current_user_id', true) != ''
+        AND user_id = current_setting('user.current_user_id', true)::INTEGER
+    );
+
+-- Function to set the RLS user context
+-- =====================================================
+-- Transaction-scoped (is_local = true): the setting is cleared automatically
+-- at COMMIT/ROLLBACK, so it can never leak to the next request that reuses a
+-- pooled connection. The backend sends it in the same batch as the first
+-- query of each transaction.
 CREATE OR REPLACE FUNCTION set_user_context(p_user_id INTEGER)
 RETURNS VOID AS $$
 BEGIN
-    PERFORM set_config('user.current_user_id', p_user_id::TEXT, false);
+    PERFORM set_config('user.current_user_id', p_user_id::TEXT, true);
 END;
 $$ LANGUAGE plpgsql
 SECURITY DEFINER
@@ -175,12 +230,12 @@ SET search_path = public;
 -- Grant execute permission to application role
 GRANT EXECUTE ON FUNCTION set_user_context(INTEGER) TO reclaim_app;
 
--- Function to clear user context (for logout)
+-- Function to clear user context within the current transaction
 -- =====================================================
 CREATE OR REPLACE FUNCTION clear_user_context()
 RETURNS VOID AS $$
 BEGIN
-    PERFORM set_config('user.current_user_id', '', false);
+    PERFORM set_config('user.current_user_id', '', true);
 END;
 $$ LANGUAGE plpgsql;
 
@@ -206,3 +206,65 @@ CREATE TRIGGER trigger_update_user_last_active
     EXECUTE FUNCTION update_user_last_active();
 
 
+
+-- Catalog version (challenges + badges)
+-- =====================================================
+-- Single-row counter bumped by any change to the challenge or badge catalog
+-- (seed_challenges.py, add_challenges.py, cleanup_old_challenges.py, manual
+-- edits) and published on the 'catalog_changes' channel. Backend workers
+-- cache the serialised catalog and only reload it when this moves.
+CREATE TABLE catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_version (id) VALUES (TRUE);
+
+CREATE OR REPLACE FUNCTION bump_catalog_version()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_version BIGINT;
+BEGIN
+    UPDATE catalog_version
+    SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+    RETURNING version INTO v_version;
+    
+    PERFORM pg_notify('catalog_changes', v_version::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Statement-level, so a bulk seed bumps the version once per statement
+CREATE TRIGGER trigger_catalog_version_challenges
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON challenges
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_catalog_version();
+
+CREATE TRIGGER trigger_catalog_version_badges
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON badges
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_catalog_version();
+
+-- User identities (signup availability)
+-- =====================================================
+-- New or changed usernames/emails are published on the 'user_identities'
+-- channel, so each backend worker's availability filter stays current.
+-- The email is sent only as a hash (as in user_identities()).
+CREATE OR REPLACE FUNCTION notify_user_identity()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('user_identities', json_build_object(
+        'username', NEW.username,
+        'email_hash', encode(sha256(convert_to(lower(NEW.email), 'UTF8')), 'hex')
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_notify_user_identity
+    AFTER INSERT OR UPDATE OF username, email ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_user_identity();
@@ -283,13 +283,7 @@ INSERT INTO user_badges (user_id, badge_id, earned_at) VALUES
 -- Mike's badges (beginner user)
 ((SELECT id FROM users WHERE username = 'mike_beginner'), (SELECT id FROM badges WHERE name = 'First Steps'), '2024-01-25 10:00:00+00');  -- First Steps
 
--- =====================================================
--- REFRESH MATERIALIZED VIEWS
--- =====================================================
-
--- Refresh the leaderboard view with the new data
--- =====================================================
-REFRESH MATERIALIZED VIEW leaderboard_view;
+-- Note: leaderboard_stats is kept up to date by triggers, no refresh needed
 
 -- =====================================================
 -- VERIFICATION QUERIES
@@ -1,13 +1,18 @@
--- Update get_user_stats function to include first_name and last_name
+-- Update get_user_stats function (profile fields + counters from user_stats)
+-- Requires the user_stats table (migration_user_stats.sql)
 -- Run this script to update the database function
 
 CREATE OR REPLACE FUNCTION get_user_stats(p_user_id INTEGER)
 RETURNS JSON AS $$
 DECLARE
     v_user users%ROWTYPE;
-    v_total_challenges INTEGER;
-    v_completed_challenges INTEGER;
-    v_total_badges INTEGER;
+    v_total_challenges INTEGER := 0;
+    v_active_challenges INTEGER := 0;
+    v_completed_challenges INTEGER := 0;
+    v_total_badges INTEGER := 0;
+    v_current_streak INTEGER := 0;
+    v_longest_streak INTEGER := 0;
+    v_recent_activity INTEGER;
     v_result JSON;
 BEGIN
     -- Get user information
@@ -17,21 +22,22 @@ BEGIN
         RAISE EXCEPTION 'User not found: %', p_user_id;
     END IF;
     
-    -- Get challenge statistics
-    SELECT COUNT(*) INTO v_total_challenges
-    FROM user_challenges 
+    -- Challenge, badge and streak counters (maintained by triggers)
+    SELECT total_challenges, active_challenges, completed_challenges,
+           badges_earned, current_streak, longest_streak
+    INTO v_total_challenges, v_active_challenges, v_completed_challenges,
+         v_total_badges, v_current_streak, v_longest_streak
+    FROM user_stats 
     WHERE user_id = p_user_id;
     
-    SELECT COUNT(*) INTO v_completed_challenges
-    FROM user_challenges 
-    WHERE user_id = p_user_id AND status = 'completed';
+    -- Completed check-ins in the last 7 days
+    SELECT COUNT(*) INTO v_recent_activity
+    FROM daily_logs
+    WHERE user_id = p_user_id
+    AND log_date >= CURRENT_DATE - INTERVAL '7 days'
+    AND completed = true;
     
-    -- Get badge count
-    SELECT COUNT(*) INTO v_total_badges
-    FROM user_badges 
-    WHERE user_id = p_user_id;
-    
-    -- Build result JSON (including first_name and last_name)
+    -- Build result JSON
     v_result := json_build_object(
         'user_id', v_user.id,
         'username', v_user.username,
@@ -40,9 +46,13 @@ BEGIN
         'last_name', v_user.last_name,
         'xp', v_user.xp,
         'level', v_user.level,
-        'total_challenges', v_total_challenges,
-        'completed_challenges', v_completed_challenges,
-        'total_badges', v_total_badges,
+        'total_challenges', COALESCE(v_total_challenges, 0),
+        'active_challenges', COALESCE(v_active_challenges, 0),
+        'completed_challenges', COALESCE(v_completed_challenges, 0),
+        'total_badges', COALESCE(v_total_badges, 0),
+        'current_streak', COALESCE(v_current_streak, 0),
+        'longest_streak', COALESCE(v_longest_streak, 0),
+        'recent_activity', v_recent_activity,
         'created_at', v_user.created_at,
         'last_active', v_user.last_active
     );
@@ -1,28 +1,62 @@
 
-CREATE MATERIALIZED VIEW leaderboard_view AS
+-- Leaderboard stats: one row per user, maintained incrementally by triggers
+-- =====================================================
+-- Replaces the old full-recompute materialized view. Each write to users,
+-- user_challenges, user_badges or streaks only touches the affected user's
+-- row, so the cost is proportional to activity, not to the number of users.
+-- Rank is computed on read from idx_leaderboard_stats_rank.
+CREATE TABLE leaderboard_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    username VARCHAR(50) NOT NULL,
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_active TIMESTAMP WITH TIME ZONE,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    completed_challenges INTEGER NOT NULL DEFAULT 0,
+    badges_earned INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0, -- longest current streak across all challenges
+    version BIGINT NOT NULL DEFAULT 0          -- bumped on every change, see notify_leaderboard_change()
+);
+
+-- Leaderboard order: xp DESC, then earliest signup, then id as a tie-breaker
+CREATE INDEX idx_leaderboard_stats_rank ON leaderboard_stats (xp DESC, created_at ASC, user_id ASC) WHERE is_active = true;
+
+-- Compatibility view with the same columns as the old materialized view.
+-- Fine for ad-hoc queries; the API reads leaderboard_stats directly so that
+-- top-N and rank lookups can stop early on the index.
+CREATE VIEW leaderboard_view AS
 SELECT 
-    u.id,
-    u.username,
-    u.xp,
-    u.level,
-    u.created_at,
-    u.last_active,
-    -- Calculate rank using window function
-    ROW_NUMBER() OVER (ORDER BY u.xp DESC, u.created_at ASC) as rank,
-    -- Additional stats for display
-    (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'completed') as completed_challenges,
-    (SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.id) as badges_earned,
-    -- Current active streak (longest current streak across all challenges)
-    (SELECT MAX(s.current_streak) FROM streaks s WHERE s.user_id = u.id) as current_streak
-FROM users u
-WHERE u.is_active = true
-ORDER BY u.xp DESC, u.created_at ASC;
+    ls.user_id as id,
+    ls.username,
+    ls.xp,
+    ls.level,
+    ls.created_at,
+    ls.last_active,
+    ROW_NUMBER() OVER (ORDER BY ls.xp DESC, ls.created_at ASC, ls.user_id ASC) as rank,
+    ls.completed_challenges,
+    ls.badges_earned,
+    ls.current_streak
+FROM leaderboard_stats ls
+WHERE ls.is_active = true;
 
--- Create unique index on the materialized view for fast lookups
-CREATE UNIQUE INDEX idx_leaderboard_user_id ON leaderboard_view (id);
-CREATE INDEX idx_leaderboard_rank ON leaderboard_view (rank);
-CREATE INDEX idx_leaderboard_xp ON leaderboard_view (xp DESC);
 
+-- User stats: per-user profile counters, maintained incrementally by triggers
+-- =====================================================
+-- Replaces the COUNT(*) scans in get_user_stats() and the correlated
+-- subqueries in user_dashboard_view. Counters are adjusted by +/-1 on each
+-- write; streak maxima are recomputed from the user's own streak rows.
+-- reconcile_user_stats() repairs any drift.
+CREATE TABLE user_stats (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_challenges INTEGER NOT NULL DEFAULT 0,
+    active_challenges INTEGER NOT NULL DEFAULT 0,
+    completed_challenges INTEGER NOT NULL DEFAULT 0,
+    badges_earned INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,  -- best current streak across challenges
+    longest_streak INTEGER NOT NULL DEFAULT 0,  -- best longest streak across challenges
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
 
 CREATE VIEW user_dashboard_view AS
 SELECT 
@@ -37,23 +71,55 @@ SELECT
     u.last_active,
     u.timezone,
     -- Challenge statistics
-    (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id) as total_challenges,
-    (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'completed') as completed_challenges,
-    (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'active') as active_challenges,
+    COALESCE(us.total_challenges, 0) as total_challenges,
+    COALESCE(us.completed_challenges, 0) as completed_challenges,
+    COALESCE(us.active_challenges, 0) as active_challenges,
     -- Streak information
-    (SELECT MAX(s.current_streak) FROM streaks s WHERE s.user_id = u.id) as current_streak,
-    (SELECT MAX(s.longest_streak) FROM streaks s WHERE s.user_id = u.id) as longest_streak,
+    us.current_streak,
+    us.longest_streak,
     -- Badge information
-    (SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.id) as badges_earned,
-    -- Recent activity (last 7 days)
+    COALESCE(us.badges_earned, 0) as badges_earned,
+    -- Recent activity (last 7 days); date-relative, so read from
+    -- idx_daily_logs_completed_user_date rather than stored
     (SELECT COUNT(*) FROM daily_logs dl 
      WHERE dl.user_id = u.id 
      AND dl.log_date >= CURRENT_DATE - INTERVAL '7 days' 
      AND dl.completed = true) as recent_activity
 FROM users u
+LEFT JOIN user_stats us ON us.user_id = u.id
 WHERE u.is_active = true;
 
 
+-- Daily activity rollup: one row per user per day, maintained by triggers
+-- =====================================================
+-- Check-in, completion and mood counts from daily_logs, so analytics over
+-- long ranges read at most one row per day instead of rescanning raw logs.
+CREATE TABLE daily_activity_rollup (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    checkins INTEGER NOT NULL DEFAULT 0,
+    completions INTEGER NOT NULL DEFAULT 0,
+    mood_terrible INTEGER NOT NULL DEFAULT 0,
+    mood_bad INTEGER NOT NULL DEFAULT 0,
+    mood_okay INTEGER NOT NULL DEFAULT 0,
+    mood_good INTEGER NOT NULL DEFAULT 0,
+    mood_excellent INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+-- Activity bitmaps: one bit per day per user per year
+-- =====================================================
+-- Bit (day of year - 1) is set when the user completed at least one
+-- check-in that day, stored LSB-first in 46 bytes (368 bits >= 366 days), so
+-- a year-long heatmap is one or two primary-key reads. Kept in step with
+-- daily_activity_rollup, which is itself maintained from daily_logs.
+CREATE TABLE activity_bitmaps (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    year SMALLINT NOT NULL,
+    days BYTEA NOT NULL DEFAULT decode(repeat('00', 46), 'hex'),
+    PRIMARY KEY (user_id, year)
+);
+
 CREATE VIEW challenge_progress_view AS
 SELECT 
     uc.id as user_challenge_id,
@@ -173,25 +239,535 @@ CREATE INDEX idx_user_challenges_completed_user ON user_challenges (user_id, com
 CREATE INDEX idx_daily_logs_completed_user_date ON daily_logs (user_id, log_date DESC) WHERE completed = true;
 
 
-CREATE OR REPLACE FUNCTION refresh_leaderboard()
+-- Leaderboard maintenance triggers
+-- =====================================================
+-- SECURITY DEFINER so the counts ignore RLS and the app role doesn't need
+-- write access to leaderboard_stats.
+
+-- Mirror user columns (insert or update of username/xp/level/activity)
+CREATE OR REPLACE FUNCTION sync_leaderboard_user()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO leaderboard_stats (user_id, username, xp, level, created_at, last_active, is_active)
+    VALUES (NEW.id, NEW.username, COALESCE(NEW.xp, 0), COALESCE(NEW.level, 1),
+            COALESCE(NEW.created_at, CURRENT_TIMESTAMP), NEW.last_active, COALESCE(NEW.is_active, true))
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        username = EXCLUDED.username,
+        xp = EXCLUDED.xp,
+        level = EXCLUDED.level,
+        created_at = EXCLUDED.created_at,
+        last_active = EXCLUDED.last_active,
+        is_active = EXCLUDED.is_active;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_user
+    AFTER INSERT OR UPDATE OF username, xp, level, created_at, last_active, is_active ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_user();
+
+-- Recount completed challenges for the affected user only
+CREATE OR REPLACE FUNCTION sync_leaderboard_completed()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    UPDATE leaderboard_stats
+    SET completed_challenges = (
+        SELECT COUNT(*) FROM user_challenges 
+        WHERE user_id = v_user_id AND status = 'completed'
+    )
+    WHERE user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_completed
+    AFTER INSERT OR DELETE OR UPDATE OF status ON user_challenges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_completed();
+
+-- Recount badges for the affected user only
+CREATE OR REPLACE FUNCTION sync_leaderboard_badges()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    UPDATE leaderboard_stats
+    SET badges_earned = (SELECT COUNT(*) FROM user_badges WHERE user_id = v_user_id)
+    WHERE user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_badges
+    AFTER INSERT OR DELETE ON user_badges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_badges();
+
+-- Recompute the best current streak for the affected user only
+CREATE OR REPLACE FUNCTION sync_leaderboard_streak()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    UPDATE leaderboard_stats
+    SET current_streak = (
+        SELECT COALESCE(MAX(current_streak), 0) FROM streaks WHERE user_id = v_user_id
+    )
+    WHERE user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_leaderboard_streak
+    AFTER INSERT OR DELETE OR UPDATE OF current_streak ON streaks
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_leaderboard_streak();
+
+-- User stats maintenance triggers
+-- =====================================================
+-- SECURITY DEFINER for the same reasons as the leaderboard triggers.
+
+-- Apply counter deltas to one user's row (creating it if missing)
+CREATE OR REPLACE FUNCTION bump_user_stats(
+    p_user_id INTEGER,
+    p_total INTEGER,
+    p_active INTEGER,
+    p_completed INTEGER,
+    p_badges INTEGER
+)
 RETURNS VOID AS $$
 BEGIN
-    REFRESH MATERIALIZED VIEW CONCURRENTLY leaderboard_view;
+    INSERT INTO user_stats (user_id, total_challenges, active_challenges, completed_challenges, badges_earned)
+    VALUES (p_user_id, GREATEST(p_total, 0), GREATEST(p_active, 0), GREATEST(p_completed, 0), GREATEST(p_badges, 0))
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        total_challenges = user_stats.total_challenges + p_total,
+        active_challenges = user_stats.active_challenges + p_active,
+        completed_challenges = user_stats.completed_challenges + p_completed,
+        badges_earned = user_stats.badges_earned + p_badges,
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Every user starts with an empty stats row
+CREATE OR REPLACE FUNCTION init_user_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO user_stats (user_id) VALUES (NEW.id)
+    ON CONFLICT (user_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_init_user_stats
+    AFTER INSERT ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION init_user_stats();
+
+-- Challenge counters: +1/-1 per row and per status transition
+CREATE OR REPLACE FUNCTION sync_user_stats_challenges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_user_stats(
+            OLD.user_id, -1,
+            -(OLD.status = 'active')::INTEGER,
+            -(OLD.status = 'completed')::INTEGER,
+            0
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_user_stats(
+            NEW.user_id, 1,
+            (NEW.status = 'active')::INTEGER,
+            (NEW.status = 'completed')::INTEGER,
+            0
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_user_stats_challenges
+    AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON user_challenges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_user_stats_challenges();
+
+CREATE OR REPLACE FUNCTION sync_user_stats_badges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM bump_user_stats(OLD.user_id, 0, 0, 0, -1);
+    ELSE
+        PERFORM bump_user_stats(NEW.user_id, 0, 0, 0, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_user_stats_badges
+    AFTER INSERT OR DELETE ON user_badges
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_user_stats_badges();
+
+-- Streak maxima can go down (a streak resets), so recompute them from the
+-- user's own streak rows (one per challenge, via idx_streaks_user_id)
+CREATE OR REPLACE FUNCTION sync_user_stats_streaks()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+BEGIN
+    v_user_id := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+    
+    PERFORM bump_user_stats(v_user_id, 0, 0, 0, 0);
+    UPDATE user_stats
+    SET 
+        current_streak = s.current_streak,
+        longest_streak = s.longest_streak,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (
+        SELECT COALESCE(MAX(current_streak), 0) as current_streak,
+               COALESCE(MAX(longest_streak), 0) as longest_streak
+        FROM streaks WHERE user_id = v_user_id
+    ) s
+    WHERE user_stats.user_id = v_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_user_stats_streaks
+    AFTER INSERT OR DELETE OR UPDATE OF current_streak, longest_streak ON streaks
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_user_stats_streaks();
+
+-- Daily activity rollup maintenance triggers
+-- =====================================================
+-- Add (p_sign = 1) or remove (p_sign = -1) one log from its day's rollup
+CREATE OR REPLACE FUNCTION bump_daily_activity(
+    p_user_id INTEGER,
+    p_day DATE,
+    p_completed BOOLEAN,
+    p_mood mood_type,
+    p_sign INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO daily_activity_rollup (
+        user_id, day, checkins, completions,
+        mood_terrible, mood_bad, mood_okay, mood_good, mood_excellent
+    )
+    VALUES (
+        p_user_id, p_day, p_sign,
+        p_sign * COALESCE(p_completed, false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'terrible', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'bad', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'okay', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'good', false)::INTEGER,
+        p_sign * COALESCE(p_mood = 'excellent', false)::INTEGER
+    )
+    ON CONFLICT (user_id, day) DO UPDATE
+    SET 
+        checkins = daily_activity_rollup.checkins + EXCLUDED.checkins,
+        completions = daily_activity_rollup.completions + EXCLUDED.completions,
+        mood_terrible = daily_activity_rollup.mood_terrible + EXCLUDED.mood_terrible,
+        mood_bad = daily_activity_rollup.mood_bad + EXCLUDED.mood_bad,
+        mood_okay = daily_activity_rollup.mood_okay + EXCLUDED.mood_okay,
+        mood_good = daily_activity_rollup.mood_good + EXCLUDED.mood_good,
+        mood_excellent = daily_activity_rollup.mood_excellent + EXCLUDED.mood_excellent;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE OR REPLACE FUNCTION sync_daily_activity_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_daily_activity(OLD.user_id, OLD.log_date, OLD.completed, OLD.mood, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_daily_activity(NEW.user_id, NEW.log_date, NEW.completed, NEW.mood, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_daily_activity_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, log_date, completed, mood ON daily_logs
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_daily_activity_rollup();
+
+-- Activity bitmap maintenance trigger
+-- =====================================================
+-- A day's bit follows whether its rollup row has any completions
+CREATE OR REPLACE FUNCTION sync_activity_bitmap()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_user_id INTEGER;
+    v_day DATE;
+    v_active BOOLEAN;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_user_id := OLD.user_id;
+        v_day := OLD.day;
+        v_active := false;
+    ELSE
+        v_user_id := NEW.user_id;
+        v_day := NEW.day;
+        v_active := NEW.completions > 0;
+        IF TG_OP = 'UPDATE' AND (OLD.completions > 0) = v_active THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    
+    INSERT INTO activity_bitmaps (user_id, year)
+    VALUES (v_user_id, EXTRACT(YEAR FROM v_day))
+    ON CONFLICT (user_id, year) DO NOTHING;
+    
+    UPDATE activity_bitmaps
+    SET days = set_bit(days, EXTRACT(DOY FROM v_day)::INTEGER - 1, v_active::INTEGER)
+    WHERE user_id = v_user_id AND year = EXTRACT(YEAR FROM v_day);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+CREATE TRIGGER trigger_sync_activity_bitmap
+    AFTER INSERT OR DELETE OR UPDATE OF completions ON daily_activity_rollup
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_activity_bitmap();
+
+-- Leaderboard change notifications
+-- =====================================================
+-- Every real change to a leaderboard_stats row bumps its version and is
+-- published on the 'leaderboard_changes' channel, so backend workers can keep
+-- an in-memory ranking current without polling. No-op updates (e.g. a
+-- recount that didn't change anything) are skipped entirely.
+CREATE OR REPLACE FUNCTION bump_leaderboard_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NULL;
+    END IF;
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
+CREATE TRIGGER trigger_bump_leaderboard_version
+    BEFORE UPDATE ON leaderboard_stats
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_leaderboard_version();
+
+CREATE OR REPLACE FUNCTION notify_leaderboard_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('leaderboard_changes', json_build_object(
+            'user_id', OLD.user_id,
+            'version', OLD.version + 1,
+            'deleted', true
+        )::TEXT);
+        RETURN NULL;
+    END IF;
+    
+    PERFORM pg_notify('leaderboard_changes', json_build_object(
+        'user_id', NEW.user_id,
+        'version', NEW.version,
+        'username', NEW.username,
+        'xp', NEW.xp,
+        'level', NEW.level,
+        'created_us', (EXTRACT(EPOCH FROM NEW.created_at) * 1000000)::BIGINT,
+        'is_active', NEW.is_active,
+        'completed_challenges', NEW.completed_challenges,
+        'badges_earned', NEW.badges_earned,
+        'current_streak', NEW.current_streak
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_notify_leaderboard_change
+    AFTER INSERT OR UPDATE OR DELETE ON leaderboard_stats
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_leaderboard_change();
+
+-- Rebuild leaderboard_stats from scratch (backfill / drift repair)
+-- =====================================================
+CREATE OR REPLACE FUNCTION rebuild_leaderboard_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    INSERT INTO leaderboard_stats (
+        user_id, username, xp, level, created_at, last_active, is_active,
+        completed_challenges, badges_earned, current_streak
+    )
+    SELECT 
+        u.id, u.username, COALESCE(u.xp, 0), COALESCE(u.level, 1), u.created_at, u.last_active,
+        COALESCE(u.is_active, true),
+        (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'completed'),
+        (SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.id),
+        (SELECT COALESCE(MAX(s.current_streak), 0) FROM streaks s WHERE s.user_id = u.id)
+    FROM users u
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        username = EXCLUDED.username,
+        xp = EXCLUDED.xp,
+        level = EXCLUDED.level,
+        created_at = EXCLUDED.created_at,
+        last_active = EXCLUDED.last_active,
+        is_active = EXCLUDED.is_active,
+        completed_challenges = EXCLUDED.completed_challenges,
+        badges_earned = EXCLUDED.badges_earned,
+        current_streak = EXCLUDED.current_streak;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Reconcile user_stats with the source tables (backfill / drift repair)
+-- =====================================================
+-- Recomputes every user's counters and rewrites only the rows that differ.
+-- Returns the number of rows inserted or repaired.
+CREATE OR REPLACE FUNCTION reconcile_user_stats()
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH actual AS (
+        SELECT 
+            u.id as user_id,
+            (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id)::INTEGER as total_challenges,
+            (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'active')::INTEGER as active_challenges,
+            (SELECT COUNT(*) FROM user_challenges uc WHERE uc.user_id = u.id AND uc.status = 'completed')::INTEGER as completed_challenges,
+            (SELECT COUNT(*) FROM user_badges ub WHERE ub.user_id = u.id)::INTEGER as badges_earned,
+            (SELECT COALESCE(MAX(s.current_streak), 0) FROM streaks s WHERE s.user_id = u.id) as current_streak,
+            (SELECT COALESCE(MAX(s.longest_streak), 0) FROM streaks s WHERE s.user_id = u.id) as longest_streak
+        FROM users u
+    )
+    INSERT INTO user_stats (
+        user_id, total_challenges, active_challenges, completed_challenges,
+        badges_earned, current_streak, longest_streak
+    )
+    SELECT a.* FROM actual a
+    LEFT JOIN user_stats us ON us.user_id = a.user_id
+    WHERE us.user_id IS NULL
+       OR (us.total_challenges, us.active_challenges, us.completed_challenges,
+           us.badges_earned, us.current_streak, us.longest_streak)
+          IS DISTINCT FROM
+          (a.total_challenges, a.active_challenges, a.completed_challenges,
+           a.badges_earned, a.current_streak, a.longest_streak)
+    ON CONFLICT (user_id) DO UPDATE
+    SET 
+        total_challenges = EXCLUDED.total_challenges,
+        active_challenges = EXCLUDED.active_challenges,
+        completed_challenges = EXCLUDED.completed_challenges,
+        badges_earned = EXCLUDED.badges_earned,
+        current_streak = EXCLUDED.current_streak,
+        longest_streak = EXCLUDED.longest_streak,
+        updated_at = CURRENT_TIMESTAMP;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
+-- Rebuild daily_activity_rollup from daily_logs (backfill / drift repair)
+-- =====================================================
+-- Also rebuilds activity_bitmaps, through trigger_sync_activity_bitmap.
+CREATE OR REPLACE FUNCTION rebuild_daily_activity_rollup()
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    DELETE FROM daily_activity_rollup;
+    
+    INSERT INTO daily_activity_rollup (
+        user_id, day, checkins, completions,
+        mood_terrible, mood_bad, mood_okay, mood_good, mood_excellent
+    )
+    SELECT 
+        user_id, log_date, COUNT(*),
+        COUNT(*) FILTER (WHERE completed),
+        COUNT(*) FILTER (WHERE mood = 'terrible'),
+        COUNT(*) FILTER (WHERE mood = 'bad'),
+        COUNT(*) FILTER (WHERE mood = 'okay'),
+        COUNT(*) FILTER (WHERE mood = 'good'),
+        COUNT(*) FILTER (WHERE mood = 'excellent')
+    FROM daily_logs
+    GROUP BY user_id, log_date;
+    
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public;
+
 -- Function to get user's rank in leaderboard
 -- =====================================================
+-- 1 + number of active users ahead in (xp DESC, created_at, id) order;
+-- an index range scan on idx_leaderboard_stats_rank. Returns 0 if the user
+-- is not on the leaderboard.
 CREATE OR REPLACE FUNCTION get_user_rank(p_user_id INTEGER)
 RETURNS INTEGER AS $$
 DECLARE
+    v_me leaderboard_stats%ROWTYPE;
     v_rank INTEGER;
 BEGIN
-    SELECT rank INTO v_rank
-    FROM leaderboard_view
-    WHERE id = p_user_id;
+    SELECT * INTO v_me
+    FROM leaderboard_stats
+    WHERE user_id = p_user_id AND is_active = true;
     
-    RETURN COALESCE(v_rank, 0);
+    IF NOT FOUND THEN
+        RETURN 0;
+    END IF;
+    
+    SELECT COUNT(*) + 1 INTO v_rank
+    FROM leaderboard_stats ls
+    WHERE ls.is_active = true
+    AND (
+        ls.xp > v_me.xp
+        OR (ls.xp = v_me.xp AND (ls.created_at, ls.user_id) < (v_me.created_at, v_me.user_id))
+    );
+    
+    RETURN v_rank;
 END;
 $$ LANGUAGE plpgsql;
-
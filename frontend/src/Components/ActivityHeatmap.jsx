@@ -0,0 +1,62 @@
+import React, { useMemo } from 'react';
+
+// Decode the API's base64 bitmap: bit i (LSB-first per byte) = day start + i
+const decodeBitmap = (bitmap, days) => {
+  const bytes = Uint8Array.from(atob(bitmap), (c) => c.charCodeAt(0));
+  const active = [];
+  for (let i = 0; i < days; i++) {
+    active.push(((bytes[i >> 3] >> (i & 7)) & 1) === 1);
+  }
+  return active;
+};
+
+const ActivityHeatmap = ({ heatmap }) => {
+  // Columns are weeks (Sunday first), padded so the first column starts on Sunday
+  const weeks = useMemo(() => {
+    if (!heatmap) return [];
+    const active = decodeBitmap(heatmap.bitmap, heatmap.days);
+    const start = new Date(`${heatmap.start}T00:00:00`);
+    const cells = Array(start.getDay()).fill(null);
+    active.forEach((isActive, i) => {
+      const date = new Date(start);
+      date.setDate(start.getDate() + i);
+      cells.push({ date, isActive });
+    });
+    const columns = [];
+    for (let i = 0; i < cells.length; i += 7) {
+      columns.push(cells.slice(i, i + 7));
+    }
+    return columns;
+  }, [heatmap]);
+
+  if (!heatmap) return null;
+
+  return (
+    <div className="w-full">
+      <div className="overflow-x-auto pb-2">
+        <div className="flex gap-[3px] min-w-max">
+          {weeks.map((week, w) => (
+            <div key={w} className="flex flex-col gap-[3px]">
+              {week.map((cell, d) => (
+                <div
+                  key={d}
+                  title={cell ? `${cell.date.toDateString()}${cell.isActive ? ' - checked in' : ''}` : ''}
+                  className={`w-3 h-3 rounded-sm ${
+                    !cell ? 'bg-transparent' : cell.isActive ? 'bg-gold' : 'bg-soft-gray'
+                  }`}
+                />
+              ))}
+            </div>
+          ))}
+        </div>
+      </div>
+      <div className="flex flex-wrap gap-4 mt-3 text-xs text-muted-gray">
+        <span><span className="font-mono text-pure-white">{heatmap.total_days}</span> active days</span>
+        <span><span className="font-mono text-pure-white">{heatmap.current_streak}</span> day current streak</span>
+        <span><span className="font-mono text-pure-white">{heatmap.longest_streak}</span> day longest streak</span>
+      </div>
+    </div>
+  );
+};
+
+export default ActivityHeatmap;
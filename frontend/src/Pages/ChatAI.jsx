@@ -3,7 +3,7 @@ import ScreenContainer from '../Components/ScreenContainer';
 import GlassPanel from '../Components/GlassPanel';
 import Button from '../Components/Button';
 import MessageBubble from '../Components/MessageBubble';
-import { chatWithAI } from '../api/ai';
+import { chatWithAI, streamChatWithAI } from '../api/ai';
 
 const ChatAI = () => {
   const [messages, setMessages] = useState([
@@ -17,6 +17,7 @@ const ChatAI = () => {
   const [inputMessage, setInputMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const messagesEndRef = useRef(null);
+  const streamRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -26,6 +27,9 @@ const ChatAI = () => {
     scrollToBottom();
   }, [messages]);
 
+  // Stop an in-flight reply when leaving the page
+  useEffect(() => () => streamRef.current?.abort(), []);
+
   const handleSend = async (e) => {
     e.preventDefault();
     if (!inputMessage.trim() || loading) return;
@@ -41,27 +45,51 @@ const ChatAI = () => {
     setInputMessage('');
     setLoading(true);
 
-    try {
-      const response = await chatWithAI(inputMessage);
-      
-      const aiMessage = {
-        id: Date.now() + 1,
-        text: response.response || response.message || "I'm here to help!",
-        sender: 'ai',
-        timestamp: new Date(),
-      };
+    // The reply bubble appears with the first token and grows as text arrives
+    const aiMessageId = Date.now() + 1;
+    const updateAiMessage = (text) => {
+      setMessages((prev) => {
+        if (prev.some((m) => m.id === aiMessageId)) {
+          return prev.map((m) => (m.id === aiMessageId ? { ...m, text } : m));
+        }
+        return [...prev, { id: aiMessageId, text, sender: 'ai', timestamp: new Date() }];
+      });
+    };
 
-      setMessages((prev) => [...prev, aiMessage]);
+    const controller = new AbortController();
+    streamRef.current = controller;
+    let received = '';
+
+    try {
+      const reply = await streamChatWithAI(inputMessage, {
+        signal: controller.signal,
+        onToken: (text) => {
+          received += text;
+          updateAiMessage(received);
+        },
+      });
+      updateAiMessage(reply || received || "I'm here to help!");
     } catch (error) {
+      if (error.name === 'AbortError') return;
+      if (error.status === 503) {
+        // Streaming slots are full: queue the message instead
+        try {
+          const response = await chatWithAI(inputMessage);
+          updateAiMessage(response.response || response.message || "I'm here to help!");
+        } catch (jobError) {
+          console.error('Chat error:', jobError);
+          updateAiMessage(jobError.response?.data?.message || 'Sorry, I encountered an error. Please try again.');
+        }
+        return;
+      }
       console.error('Chat error:', error);
-      const errorMessage = {
-        id: Date.now() + 1,
-        text: 'Sorry, I encountered an error. Please try again.',
-        sender: 'ai',
-        timestamp: new Date(),
-      };
-      setMessages((prev) => [...prev, errorMessage]);
+      updateAiMessage(
+        error instanceof TypeError // network failure
+          ? 'Sorry, I encountered an error. Please try again.'
+          : error.message
+      );
     } finally {
+      streamRef.current = null;
       setLoading(false);
     }
   };
@@ -82,7 +110,7 @@ const ChatAI = () => {
           {messages.map((message) => (
             <MessageBubble key={message.id} message={message} />
           ))}
-          {loading && (
+          {loading && messages[messages.length - 1]?.sender === 'user' && (
             <div className="flex items-center gap-2 text-muted-gray">
               <div className="w-2 h-2 bg-gold rounded-full animate-pulse"></div>
               <div className="w-2 h-2 bg-gold rounded-full animate-pulse delay-75"></div>
@@ -2,9 +2,8 @@ import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useUser } from '../context/UserContext';
 import { useToastContext } from '../context/ToastContext';
-import { getActiveChallenges, checkinChallenge } from '../api/challenges';
-import { getUserBadges } from '../api/badges';
-import { getAnalytics } from '../api/user';
+import { checkinChallenge, checkinChallenges } from '../api/challenges';
+import { getDashboard } from '../api/user';
 import ScreenContainer from '../Components/ScreenContainer';
 import GlassPanel from '../Components/GlassPanel';
 import XPBar from '../Components/XPBar';
@@ -21,6 +20,7 @@ const Dashboard = () => {
   const [analytics, setAnalytics] = useState(null);
   const [loading, setLoading] = useState(true);
   const [checkingIn, setCheckingIn] = useState({});
+  const [checkingInAll, setCheckingInAll] = useState(false);
   const navigate = useNavigate();
   const toast = useToastContext();
 
@@ -34,21 +34,13 @@ const Dashboard = () => {
 
   const loadData = async () => {
     try {
-      const [challengesResponse, badgesResponse, analyticsResponse] = await Promise.all([
-        getActiveChallenges(),
-        getUserBadges().catch(() => ({ success: false, badges: [] })),
-        getAnalytics().catch(() => ({ success: false, analytics: null })),
-      ]);
+      // One request for every section this page renders
+      const response = await getDashboard(['active_challenges', 'badges', 'analytics']);
       
-      if (challengesResponse.success) {
-        const challenges = challengesResponse.active_challenges || [];
-        setActiveChallenges(challenges);
-      }
-      if (badgesResponse.success) {
-        setUserBadges(badgesResponse.badges || []);
-      }
-      if (analyticsResponse.success && analyticsResponse.analytics) {
-        setAnalytics(analyticsResponse.analytics);
+      if (response.success) {
+        setActiveChallenges(response.dashboard.active_challenges || []);
+        setUserBadges(response.dashboard.badges || []);
+        setAnalytics(response.dashboard.analytics || null);
       }
       await refreshUser();
     } catch (error) {
@@ -80,6 +72,27 @@ const Dashboard = () => {
     }
   };
 
+  // Check in to every challenge not yet checked in today, in one request
+  const handleCheckInAll = async () => {
+    const pendingIds = activeChallenges.filter(c => !c.checked_in_today).map(c => c.challenge_id);
+    if (pendingIds.length === 0) return;
+    setCheckingInAll(true);
+    try {
+      const response = await checkinChallenges(pendingIds);
+      if (response.success) {
+        toast.success(`✅ Checked in to ${response.checked_in} challenge${response.checked_in === 1 ? '' : 's'}!`);
+        await loadData();
+        await refreshUser();
+      }
+    } catch (error) {
+      console.error('Error checking in:', error);
+      const errorMessage = error.response?.data?.message || 'Failed to check in. Please try again.';
+      toast.error(errorMessage);
+    } finally {
+      setCheckingInAll(false);
+    }
+  };
+
   const nextLevelXP = (level + 1) * 100;
 
   // Calculate additional stats
@@ -410,15 +423,27 @@ const Dashboard = () => {
           <div>
             <div className="flex justify-between items-center mb-6">
               <h2 className="font-body text-xl font-semibold text-pure-white">Active Challenges</h2>
-          <Button
-            variant="outline"
-            size="sm"
-            onClick={() => navigate('/challenges')}
-                className="text-purple hover:text-purple/80"
-          >
-                View All
-          </Button>
-        </div>
+              <div className="flex items-center gap-2">
+                {activeChallenges.filter(c => !c.checked_in_today).length > 1 && (
+                  <Button
+                    variant="primary"
+                    size="sm"
+                    onClick={handleCheckInAll}
+                    loading={checkingInAll}
+                  >
+                    Check In All
+                  </Button>
+                )}
+                <Button
+                  variant="outline"
+                  size="sm"
+                  onClick={() => navigate('/challenges')}
+                  className="text-purple hover:text-purple/80"
+                >
+                  View All
+                </Button>
+              </div>
+            </div>
             <div className="space-y-4">
 
             {loading ? (
@@ -2,9 +2,8 @@ import React, { useEffect, useState } from 'react';
 import { Link, useLocation, useNavigate } from 'react-router-dom';
 import { useUser } from '../context/UserContext';
 import { useToastContext } from '../context/ToastContext';
-import { getAllChallenges, getActiveChallenges, checkinChallenge } from '../api/challenges';
-import { getUserBadges } from '../api/badges';
-import { getAnalytics } from '../api/user';
+import { checkinChallenge } from '../api/challenges';
+import { batchGet } from '../api/batch';
 import ScreenContainer from '../Components/ScreenContainer';
 import { SkeletonCard } from '../Components/LoadingSkeleton';
 import { 
@@ -78,12 +77,18 @@ const Homepage = () => {
   const loadUserData = async () => {
     setLoading(true);
     try {
-      const [challengesResponse, activeResponse, badgesResponse, analyticsResponse] = await Promise.all([
-        getAllChallenges(),
-        getActiveChallenges().catch(() => ({ success: false, active_challenges: [] })),
-        getUserBadges().catch(() => ({ success: false, badges: [] })),
-        getAnalytics().catch(() => ({ success: false, analytics: null })),
+      // One round-trip instead of four parallel GETs
+      const results = await batchGet([
+        { id: 'challenges', path: '/api/challenges' },
+        { id: 'active', path: '/api/challenges/active' },
+        { id: 'badges', path: '/api/badges/user' },
+        { id: 'analytics', path: '/api/analytics' },
       ]);
+      const bodyOf = (id) => (results[id]?.status === 200 && results[id].body) || { success: false };
+      const challengesResponse = bodyOf('challenges');
+      const activeResponse = bodyOf('active');
+      const badgesResponse = bodyOf('badges');
+      const analyticsResponse = bodyOf('analytics');
       
       if (challengesResponse.success) {
         setFeaturedChallenges(challengesResponse.challenges?.slice(0, 6) || []);
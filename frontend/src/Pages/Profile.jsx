@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useUser } from '../context/UserContext';
 import { useToastContext } from '../context/ToastContext';
-import { getProfile } from '../api/user';
+import { getProfile, getActivityHeatmap } from '../api/user';
 import { getUserBadges } from '../api/badges';
 import ScreenContainer from '../Components/ScreenContainer';
 import GlassPanel from '../Components/GlassPanel';
@@ -9,12 +9,14 @@ import XPBar from '../Components/XPBar';
 import Button from '../Components/Button';
 import ErrorDisplay from '../Components/ErrorDisplay';
 import BadgeCard from '../Components/BadgeCard';
+import ActivityHeatmap from '../Components/ActivityHeatmap';
 import { Trophy as TrophyIcon, Target as TargetIcon, Award as AwardIcon, Calendar as CalendarIcon, TrendingUp as TrendingUpIcon, User as UserIcon, LogOut as LogOutIcon } from 'lucide-react';
 
 const Profile = () => {
   const { username, xp, level, logout } = useUser();
   const [profile, setProfile] = useState(null);
   const [badges, setBadges] = useState([]);
+  const [heatmap, setHeatmap] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const toast = useToastContext();
@@ -22,6 +24,7 @@ const Profile = () => {
   useEffect(() => {
     loadProfile();
     loadBadges();
+    loadHeatmap();
   }, []);
 
   const loadProfile = async () => {
@@ -54,6 +57,17 @@ const Profile = () => {
     }
   };
 
+  const loadHeatmap = async () => {
+    try {
+      const response = await getActivityHeatmap();
+      if (response.success) {
+        setHeatmap(response.heatmap);
+      }
+    } catch (error) {
+      console.error('Error loading activity heatmap:', error);
+    }
+  };
+
   const nextLevelXP = (level + 1) * 100;
 
   if (loading) {
@@ -141,6 +155,17 @@ const Profile = () => {
           </GlassPanel>
         </div>
 
+        {/* Activity Heatmap */}
+        {heatmap && (
+          <GlassPanel className="p-6">
+            <h3 className="font-heading font-semibold mb-4 text-pure-white flex items-center gap-2">
+              <CalendarIcon className="w-5 h-5 text-gold" />
+              Activity (last 365 days)
+            </h3>
+            <ActivityHeatmap heatmap={heatmap} />
+          </GlassPanel>
+        )}
+
         {/* Badges Section */}
         <GlassPanel className="p-6">
           <h3 className="font-heading font-semibold mb-4 text-pure-white flex items-center gap-2">
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { useUser } from '../context/UserContext';
 import { useToastContext } from '../context/ToastContext';
+import { checkAvailability } from '../api/auth';
 import Input from '../Components/Input';
 import Button from '../Components/Button';
 import ScreenContainer from '../Components/ScreenContainer';
@@ -16,6 +17,7 @@ const Signup = () => {
   });
   const [error, setError] = useState('');
   const [loading, setLoading] = useState(false);
+  const [taken, setTaken] = useState({ username: false, email: false });
   const { signup, isAuthenticated } = useUser();
   const navigate = useNavigate();
   const toast = useToastContext();
@@ -26,6 +28,41 @@ const Signup = () => {
     }
   }, [isAuthenticated, navigate]);
 
+  // Live availability check, debounced so typing doesn't send a request per keystroke
+  useEffect(() => {
+    const username = formData.username.trim();
+    const email = formData.email.trim();
+    const checkUsername = username.length >= 3;
+    const checkEmail = /^[^@\s]+@[^@\s]+\.[^@\s]+$/.test(email);
+    if (!checkUsername && !checkEmail) {
+      setTaken({ username: false, email: false });
+      return undefined;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const result = await checkAvailability({
+          username: checkUsername ? username : undefined,
+          email: checkEmail ? email : undefined,
+        });
+        if (!cancelled && result.success) {
+          setTaken({
+            username: checkUsername && result.username === false,
+            email: checkEmail && result.email === false,
+          });
+        }
+      } catch {
+        // Signup itself still reports duplicates
+      }
+    }, 300);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [formData.username, formData.email]);
+
   const handleChange = (e) => {
     setFormData({
       ...formData,
@@ -142,6 +179,7 @@ const Signup = () => {
                     placeholder="Choose a username"
                     required
                     autoFocus
+                    error={taken.username ? 'Username is already taken' : undefined}
                     className="bg-dark-gray/60 border-purple/25 focus:border-purple/60 focus:ring-2 focus:ring-purple/20"
                   />
                 </div>
@@ -159,6 +197,7 @@ const Signup = () => {
                     onChange={handleChange}
                     placeholder="you@example.com"
                     required
+                    error={taken.email ? 'An account with this email already exists' : undefined}
                     className="bg-dark-gray/60 border-purple/25 focus:border-purple/60 focus:ring-2 focus:ring-purple/20"
                   />
                 </div>
@@ -1,7 +1,85 @@
 import api from './axios';
 
-export const chatWithAI = async (message) => {
-  const response = await api.post('/ai/chat', { message });
-  return response.data;
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Queues the message as a job and polls until the reply is ready, so the
+// request never holds a server worker while OpenAI is thinking.
+export const chatWithAI = async (message, { timeoutMs = 60000 } = {}) => {
+  const { data } = await api.post('/ai/chat/jobs', { message });
+  const deadline = Date.now() + timeoutMs;
+  let delay = 400;
+
+  while (Date.now() < deadline) {
+    await sleep(delay);
+    const response = await api.get(`/ai/chat/jobs/${data.job_id}`, {
+      validateStatus: (status) => status < 600,
+    });
+    const job = response.data;
+    if (job.status === 'done' || job.status === 'failed') {
+      return job;
+    }
+    delay = Math.min(delay * 1.5, 2000);
+  }
+  return { success: false, message: 'The AI coach is taking too long. Please try again.' };
 };
 
+// Streams the coach's reply over Server-Sent Events. axios can't read a
+// response incrementally in the browser, so this uses fetch directly.
+// onToken(text) is called for each fragment; resolves with the full reply.
+// Errors carry a message that can be shown to the user.
+const STREAM_ERROR = 'Sorry, I encountered an error. Please try again.';
+
+export const streamChatWithAI = async (message, { onToken, signal } = {}) => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${api.defaults.baseURL}/ai/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ message }),
+    signal,
+  });
+
+  if (response.status === 401) {
+    localStorage.removeItem('token');
+    localStorage.removeItem('user');
+    window.location.href = '/login';
+  }
+  if (!response.ok || !response.body) {
+    const body = await response.json().catch(() => ({}));
+    const error = new Error(body.message || STREAM_ERROR);
+    error.status = response.status;
+    throw error;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Frames are separated by a blank line: "event: <name>\ndata: <json>"
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      frame.split('\n').forEach((line) => {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === 'token') onToken?.(payload.text);
+      else if (event === 'done') return payload.message;
+      else if (event === 'error') throw new Error(payload.message);
+    }
+  }
+  throw new Error(STREAM_ERROR);
+};
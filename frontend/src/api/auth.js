@@ -5,6 +5,13 @@ export const signup = async (userData) => {
   return response.data;
 };
 
+export const checkAvailability = async ({ username, email }) => {
+  const response = await api.get('/signup/availability', {
+    params: { username: username || undefined, email: email || undefined },
+  });
+  return response.data;
+};
+
 export const login = async (credentials) => {
   const response = await api.post('/login', credentials);
   return response.data;
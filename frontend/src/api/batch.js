@@ -0,0 +1,13 @@
+import api from './axios';
+
+// Run several GETs in one round-trip.
+// requests: [{ id: 'profile', path: '/api/profile' }, ...]
+// Resolves to { [id]: { status, body, etag } }
+export const batchGet = async (requests) => {
+  const response = await api.post('/batch', { requests });
+  const results = {};
+  (response.data.responses || []).forEach((item) => {
+    results[item.id] = item;
+  });
+  return results;
+};
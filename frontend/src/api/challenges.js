@@ -25,3 +25,8 @@ export const checkinChallenge = async (challengeId) => {
   return response.data;
 };
 
+
+export const checkinChallenges = async (challengeIds) => {
+  const response = await api.post('/challenges/checkin/batch', { challenge_ids: challengeIds });
+  return response.data;
+};
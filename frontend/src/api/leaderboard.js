@@ -1,7 +1,7 @@
 import api from './axios';
 
-export const getLeaderboard = async () => {
-  const response = await api.get('/leaderboard');
+// params: { limit, after, before } for paging, or { around: 'me', k }
+export const getLeaderboard = async (params = {}) => {
+  const response = await api.get('/leaderboard', { params });
   return response.data;
 };
-
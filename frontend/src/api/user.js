@@ -5,8 +5,21 @@ export const getProfile = async () => {
   return response.data;
 };
 
-export const getAnalytics = async () => {
-  const response = await api.get('/analytics');
+// fields: optional subset of ['profile', 'active_challenges', 'analytics', 'badges', 'settings']
+export const getDashboard = async (fields) => {
+  const params = fields ? { fields: fields.join(',') } : {};
+  const response = await api.get('/dashboard', { params });
+  return response.data;
+};
+
+// params: { range: 7 | 30 | 90 | 365, bucket: 'day' | 'week' | 'month' }
+export const getAnalytics = async (params = {}) => {
+  const response = await api.get('/analytics', { params });
+  return response.data;
+};
+
+export const getActivityHeatmap = async () => {
+  const response = await api.get('/analytics/heatmap');
   return response.data;
 };
 